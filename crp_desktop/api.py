@@ -0,0 +1,241 @@
+"""
+Local read-only HTTP/JSON API over the results database.
+
+    GET /health
+    GET /results?start=YYYY-MM-DD&end=YYYY-MM-DD&patient=&instrument=&limit=&cursor=&direction=next|prev
+    GET /results/<id>
+    GET /results/wait?after_id=N&timeout=30     long-poll for rows with id > N
+    GET /results/stream?after_id=N              server-sent events (honours Last-Event-ID)
+
+List responses carry `next_cursor`/`prev_cursor` for keyset pagination and an ETag;
+send it back as If-None-Match to get 304 when nothing changed.
+
+    python -m crp_desktop.api --db crp_results.db --port 8765
+"""
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from crp_desktop.db import (
+    ReadPool, get_read_db, query_results, get_result, results_after, max_result_id,
+)
+from crp_desktop.resources import (
+    DB_PATH, API_HOST, API_PORT, API_POLL_INTERVAL, API_LONG_POLL_TIMEOUT,
+    API_SSE_HEARTBEAT, PAGE_SIZE_DEFAULT,
+)
+
+log = logging.getLogger("crp_desktop.api")
+
+def row_to_json(row, include_raw: bool = False) -> dict:
+    d = dict(row)
+    raw = d.pop("raw_payload", None)
+    if include_raw and raw:
+        try:
+            d["payload"] = json.loads(raw)
+        except ValueError:
+            d["payload"] = raw
+    return d
+
+class ChangeWatcher(threading.Thread):
+    """
+    One connection polls PRAGMA data_version and wakes waiting clients
+    when new rows arrive, so long-poll/SSE clients do not each hold a
+    pooled connection or re-query the table.
+    """
+    def __init__(self, path: str = DB_PATH, interval: float = API_POLL_INTERVAL):
+        super().__init__(daemon=True, name="api-change-watcher")
+        self.path = path
+        self.interval = interval
+        self.cond = threading.Condition()
+        self.stop_event = threading.Event()
+        self.last_id = 0
+
+    def run(self):
+        conn = get_read_db(self.path)
+        version = None
+        try:
+            while True:
+                v = conn.execute("PRAGMA data_version").fetchone()[0]
+                if v != version:
+                    version = v
+                    new_max = max_result_id(conn)
+                    if new_max != self.last_id:
+                        with self.cond:
+                            self.last_id = new_max
+                            self.cond.notify_all()
+                if self.stop_event.wait(self.interval):
+                    break
+        finally:
+            conn.close()
+            with self.cond:
+                self.cond.notify_all()
+
+    def wait_for(self, after_id: int, timeout: float) -> bool:
+        with self.cond:
+            return self.cond.wait_for(
+                lambda: self.last_id > after_id or self.stop_event.is_set(), timeout
+            ) and self.last_id > after_id
+
+    def stop(self):
+        self.stop_event.set()
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, db_path: str = DB_PATH):
+        super().__init__(address, ApiHandler)
+        self.db_path = db_path
+        self.pool = ReadPool(db_path)
+        self.watcher = ChangeWatcher(db_path)
+        self.watcher.start()
+
+    def server_close(self):
+        self.watcher.stop()
+        super().server_close()
+        self.pool.close()
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "CRPDesktopAPI/1"
+
+    def log_message(self, fmt, *args):
+        log.debug("%s - " + fmt, self.address_string(), *args)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        qs = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        path = parts.path.rstrip("/")
+        try:
+            if path == "/health":
+                self.send_json({"ok": True, "last_id": self.server.watcher.last_id})
+            elif path == "/results":
+                self.list_results(qs)
+            elif path == "/results/wait":
+                self.wait_results(qs)
+            elif path == "/results/stream":
+                self.stream_results(qs)
+            elif path.startswith("/results/"):
+                self.one_result(path[len("/results/"):], qs)
+            else:
+                self.send_error_json(HTTPStatus.NOT_FOUND, "unknown endpoint")
+        except ValueError as e:
+            self.send_error_json(HTTPStatus.BAD_REQUEST, str(e))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    # --- endpoints
+    def list_results(self, qs: dict):
+        with self.server.pool.connection() as conn:
+            page = query_results(
+                conn,
+                start=qs.get("start"),
+                end=qs.get("end"),
+                patient=qs.get("patient"),
+                instrument=qs.get("instrument"),
+                cursor=qs.get("cursor"),
+                direction=qs.get("direction", "next"),
+                limit=int(qs.get("limit", PAGE_SIZE_DEFAULT)),
+            )
+        include_raw = qs.get("raw") == "1"
+        self.send_json({
+            "results": [row_to_json(r, include_raw) for r in page.rows],
+            "next_cursor": page.next_cursor,
+            "prev_cursor": page.prev_cursor,
+        })
+
+    def one_result(self, id_text: str, qs: dict):
+        with self.server.pool.connection() as conn:
+            row = get_result(conn, int(id_text))
+        if row is None:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "no such result")
+            return
+        self.send_json(row_to_json(row, include_raw=True))
+
+    def wait_results(self, qs: dict):
+        after_id = int(qs.get("after_id", 0))
+        timeout = min(float(qs.get("timeout", API_LONG_POLL_TIMEOUT)), API_LONG_POLL_TIMEOUT)
+        rows = []
+        if self.server.watcher.wait_for(after_id, timeout):
+            with self.server.pool.connection() as conn:
+                rows = results_after(conn, after_id)
+        self.send_json({
+            "results": [row_to_json(r) for r in rows],
+            "last_id": rows[-1]["id"] if rows else after_id,
+        }, etag=False)
+
+    def stream_results(self, qs: dict):
+        after_id = int(self.headers.get("Last-Event-ID") or qs.get("after_id", 0))
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        last_beat = time.monotonic()
+        watcher = self.server.watcher
+        while not watcher.stop_event.is_set():
+            if watcher.wait_for(after_id, API_SSE_HEARTBEAT):
+                with self.server.pool.connection() as conn:
+                    rows = results_after(conn, after_id)
+                for r in rows:
+                    data = json.dumps(row_to_json(r), ensure_ascii=False)
+                    self.wfile.write(f"id: {r['id']}\nevent: result\ndata: {data}\n\n".encode("utf-8"))
+                    after_id = r["id"]
+                self.wfile.flush()
+            if time.monotonic() - last_beat >= API_SSE_HEARTBEAT:
+                self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+                last_beat = time.monotonic()
+
+    # --- helpers
+    def send_json(self, obj, status=HTTPStatus.OK, etag: bool = True):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        tag = None
+        if etag:
+            tag = 'W/"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+            if self.headers.get("If-None-Match") == tag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", tag)
+                self.end_headers()
+                return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        if tag:
+            self.send_header("ETag", tag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message: str):
+        self.send_json({"error": message}, status=status, etag=False)
+
+def start_api_server(host: str = API_HOST, port: int = API_PORT, db_path: str = DB_PATH):
+    """Start the API in a background thread; returns the server (call shutdown() to stop)."""
+    server = ApiServer((host, port), db_path)
+    threading.Thread(target=server.serve_forever, daemon=True, name="api-server").start()
+    return server
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve CRP results over local HTTP")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--host", default=API_HOST)
+    ap.add_argument("--port", type=int, default=API_PORT)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    server = ApiServer((args.host, args.port), args.db)
+    log.info("Serving %s on http://%s:%d", args.db, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import os
+import gzip
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from crp_desktop.resources import (
+    DB_PATH, BACKUP_PAGES_PER_STEP, BACKUP_STEP_PAUSE, BACKUP_MAX_RESTARTS,
+)
+
+class BackupRestarted(Exception):
+    pass
+
+class BackupCancelled(Exception):
+    pass
+
+# quick_check VM steps between looks at the cancel event
+CANCEL_CHECK_OPS = 10000
+
+def backup_database(dest_path: str, src_path: str = DB_PATH, pages: int = BACKUP_PAGES_PER_STEP,
+                    compress: bool = False, pause: float = BACKUP_STEP_PAUSE,
+                    cancel: threading.Event = None) -> dict:
+    """
+    Copy a live database with sqlite3's online backup API, a few pages at a time,
+    then verify the copy with PRAGMA quick_check.
+    Setting `cancel` stops the copy, check or compression at its next step with
+    BackupCancelled; nothing is left behind.
+    Returns a dict with path, bytes, seconds, mb_per_s and integrity.
+    """
+    cancel = cancel or threading.Event()
+    start = time.perf_counter()
+    part_path = dest_path + ".part"
+    if os.path.exists(part_path):
+        os.remove(part_path)
+    src = sqlite3.connect(src_path, check_same_thread=False)
+    state = {"remaining": None, "restarts": 0, "steps": 0}
+
+    def on_progress(status, remaining, total):
+        # the source was written to by another connection: sqlite restarts the copy
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > BACKUP_MAX_RESTARTS:
+                raise BackupRestarted()
+        state["remaining"] = remaining
+        state["steps"] += 1
+        if pause:
+            cancel.wait(pause)
+        if cancel.is_set():
+            raise BackupCancelled()
+
+    gz_path = None
+    try:
+        dst = sqlite3.connect(part_path)
+        try:
+            try:
+                src.backup(dst, pages=pages, progress=on_progress)
+            except BackupRestarted:
+                # ingestion is too busy for stepped copying; in WAL mode a single
+                # step only holds a read snapshot, so it still does not block writers
+                src.backup(dst, pages=-1)
+            dst.set_progress_handler(cancel.is_set, CANCEL_CHECK_OPS)
+            try:
+                row = dst.execute("PRAGMA quick_check").fetchone()
+            except sqlite3.OperationalError:
+                if cancel.is_set():
+                    raise BackupCancelled() from None
+                raise
+            integrity = row[0] if row else "unknown"
+        finally:
+            dst.close()
+            src.close()
+
+        if integrity != "ok":
+            raise sqlite3.DatabaseError(f"Backup failed quick_check: {integrity}")
+
+        if compress:
+            gz_path = dest_path if dest_path.endswith(".gz") else dest_path + ".gz"
+            with open(part_path, "rb") as f_in, gzip.open(gz_path, "wb", compresslevel=6) as f_out:
+                for block in iter(lambda: f_in.read(1024 * 1024), b""):
+                    if cancel.is_set():
+                        raise BackupCancelled()
+                    f_out.write(block)
+            dest_path = gz_path
+            db_bytes = os.path.getsize(part_path)
+            os.remove(part_path)
+        else:
+            os.replace(part_path, dest_path)
+            db_bytes = os.path.getsize(dest_path)
+    except BaseException:
+        src.close()
+        # never leave a half-written copy behind, whatever failed
+        for path in (part_path, gz_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+        raise
+
+    seconds = time.perf_counter() - start
+    return {
+        "path": dest_path,
+        "bytes": db_bytes,
+        "stored_bytes": os.path.getsize(dest_path),
+        "seconds": seconds,
+        "mb_per_s": (db_bytes / (1024 * 1024)) / seconds if seconds > 0 else 0.0,
+        "steps": state["steps"],
+        "restarts": state["restarts"],
+        "integrity": integrity,
+    }
+
+def format_backup_report(info: dict) -> str:
+    return (
+        f"Backup saved to {info['path']} "
+        f"({info['bytes'] / (1024 * 1024):.1f} MB in {info['seconds']:.2f}s, "
+        f"{info['mb_per_s']:.1f} MB/s, quick_check {info['integrity']})"
+    )
+
+def prune_backups(backup_dir: str, keep: int, prefix: str = "crp_results-"):
+    if keep <= 0:
+        return
+    names = sorted(
+        n for n in os.listdir(backup_dir)
+        if n.startswith(prefix) and (n.endswith(".db") or n.endswith(".db.gz"))
+    )
+    for n in names[:-keep]:
+        try:
+            os.remove(os.path.join(backup_dir, n))
+        except OSError:
+            pass
+
+class BackupService(threading.Thread):
+    """
+    Background thread that backs up the database every `interval` seconds.
+    Reports each result through `report` (e.g. signals.status.emit).
+    """
+    def __init__(self, backup_dir: str, interval: float, src_path: str = DB_PATH,
+                 compress: bool = False, keep: int = 0, report=None):
+        super().__init__(daemon=True)
+        self.backup_dir = backup_dir
+        self.interval = interval
+        self.src_path = src_path
+        self.compress = compress
+        self.keep = keep
+        self.report = report
+        self.stop_event = threading.Event()
+        self.run_now = threading.Event()
+        self.last_info = None
+
+    def backup_once(self) -> dict:
+        os.makedirs(self.backup_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        dest = os.path.join(self.backup_dir, f"crp_results-{stamp}.db")
+        info = backup_database(dest, self.src_path, compress=self.compress, cancel=self.stop_event)
+        prune_backups(self.backup_dir, self.keep)
+        self.last_info = info
+        return info
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.run_now.wait(self.interval)
+            if self.stop_event.is_set():
+                break
+            self.run_now.clear()
+            try:
+                msg = "Backup: " + format_backup_report(self.backup_once())
+            except BackupCancelled:
+                break
+            except Exception as e:
+                msg = "Backup failed: " + str(e)
+            if self.report:
+                self.report(msg)
+
+    def trigger(self):
+        self.run_now.set()
+
+    def stop(self):
+        # also cancels a backup in progress (see backup_database's `cancel`)
+        self.stop_event.set()
+        self.run_now.set()
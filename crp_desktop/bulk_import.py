@@ -0,0 +1,219 @@
+"""
+Bulk import of historical analyzer printouts / serial capture dumps.
+
+Files are streamed through parser.iter_frames (STX/ETX packets; form-feed
+separated pages for plain printouts), parsed in a process pool in chunks,
+and written by this process in large transactions. Progress per file is
+committed in the same transaction as its rows, so an interrupted import
+resumes where it stopped. A file that grew since the last run (a capture
+log still being written) continues after the frames already imported, as
+long as that prefix is unchanged; a file that was rewritten has its earlier
+rows removed and is imported again.
+
+    python -m crp_desktop.bulk_import --db crp_results.db captures/ old_printouts/*.txt
+"""
+import os
+import sys
+import time
+import hashlib
+import sqlite3
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from crp_desktop.db import init_db, insert_results, _add_missing_columns
+from crp_desktop.parser import extract_fields_from_block, iter_frames, read_chunks
+from crp_desktop.resources import DB_PATH, BULK_CHUNK_FRAMES, BULK_BATCH_ROWS
+
+def init_import_db(conn: sqlite3.Connection):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS import_progress (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL,
+            frames_total INTEGER,
+            frames_done INTEGER,
+            finished INTEGER DEFAULT 0
+        )
+        """
+    )
+    # hash of the frames imported so far, to tell an appended file from a rewritten one
+    _add_missing_columns(conn.cursor(), "import_progress", {"prefix_hash": "TEXT"})
+    # which rows came from which file, so a rewritten file's rows can be removed
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS import_results (
+            path TEXT NOT NULL,
+            result_id INTEGER NOT NULL,
+            PRIMARY KEY (path, result_id)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.commit()
+
+def read_frames(path: str) -> list:
+    """Frames of one file, in order, framed exactly like the live serial stream."""
+    with open(path, "rb") as f:
+        return list(iter_frames(read_chunks(f)))
+
+def parse_frames(frames: list) -> list:
+    """Worker entry point: parse one chunk of frames (runs in a child process)."""
+    out = []
+    for frame in frames:
+        parsed = extract_fields_from_block(frame)
+        if parsed:
+            out.append(parsed)
+    return out
+
+def collect_files(paths: list) -> list:
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, _, names in os.walk(p):
+                files.extend(os.path.join(root, n) for n in sorted(names))
+        else:
+            files.append(p)
+    return [os.path.abspath(f) for f in files]
+
+def _progress_row(conn, path: str):
+    return conn.execute(
+        "SELECT size, mtime, frames_done, finished, prefix_hash FROM import_progress WHERE path = ?",
+        (path,),
+    ).fetchone()
+
+def _hash_frames(digest, frames: list):
+    for frame in frames:
+        digest.update(frame.encode("utf-8", "surrogatepass"))
+        digest.update(b"\0")
+
+def forget_file(conn, path: str):
+    """Delete the rows an earlier import took from `path` (change_log records them as 'D')."""
+    ids = "SELECT result_id FROM import_results WHERE path = ?"
+    with conn:
+        conn.execute(f"DELETE FROM result_flags WHERE result_id IN ({ids})", (path,))
+        conn.execute(f"DELETE FROM crp_results WHERE id IN ({ids})", (path,))
+        conn.execute("DELETE FROM import_results WHERE path = ?", (path,))
+
+class BulkImporter:
+    def __init__(self, db_path: str = DB_PATH, workers: int = None,
+                 chunk_frames: int = BULK_CHUNK_FRAMES, batch_rows: int = BULK_BATCH_ROWS,
+                 progress=None):
+        self.db_path = db_path
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_frames = chunk_frames
+        self.batch_rows = batch_rows
+        self.progress = progress
+        self.rows_written = 0
+        self.frames_done = 0
+        self.started = None
+
+    def run(self, paths: list) -> int:
+        init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        init_import_db(conn)
+        self.started = time.perf_counter()
+        files = collect_files(paths)
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                for i, path in enumerate(files, 1):
+                    self.import_file(pool, conn, path, i, len(files))
+        finally:
+            conn.close()
+        return self.rows_written
+
+    def import_file(self, pool, conn, path: str, index: int, total_files: int):
+        st = os.stat(path)
+        prev = _progress_row(conn, path)
+        unchanged = prev is not None and (prev[0], prev[1]) == (st.st_size, st.st_mtime)
+        if unchanged and prev[3]:
+            self.report(index, total_files, path, prev[2], prev[2], skipped=True)
+            return
+        frames = read_frames(path)
+        done = 0
+        digest = hashlib.sha1()
+        if prev is not None and prev[2]:
+            _hash_frames(digest, frames[:prev[2]])
+            same_prefix = prev[2] <= len(frames) and (
+                digest.hexdigest() == prev[4] if prev[4] else unchanged
+            )
+            if same_prefix:
+                done = prev[2]
+            else:
+                forget_file(conn, path)
+                digest = hashlib.sha1()
+        with conn:
+            conn.execute(
+                "INSERT INTO import_progress (path,size,mtime,frames_total,frames_done,finished,prefix_hash) "
+                "VALUES (?,?,?,?,?,0,?) ON CONFLICT(path) DO UPDATE SET "
+                "size=excluded.size, mtime=excluded.mtime, frames_total=excluded.frames_total, "
+                "frames_done=excluded.frames_done, finished=0, prefix_hash=excluded.prefix_hash",
+                (path, st.st_size, st.st_mtime, len(frames), done, digest.hexdigest()),
+            )
+        # keep a bounded number of chunks in flight and consume them in order,
+        # so frames_done always marks a contiguous prefix of the file
+        pending = deque()
+        batch = []
+        batch_frames = 0
+        pos = done
+        while pos < len(frames) or pending:
+            while pos < len(frames) and len(pending) < self.workers * 2:
+                chunk = frames[pos:pos + self.chunk_frames]
+                pending.append((len(chunk), pool.submit(parse_frames, chunk)))
+                pos += len(chunk)
+            n_frames, fut = pending.popleft()
+            batch.extend(fut.result())
+            batch_frames += n_frames
+            if len(batch) >= self.batch_rows or not pending:
+                _hash_frames(digest, frames[done:done + batch_frames])
+                done += batch_frames
+                self.write_batch(conn, path, batch, done, digest.hexdigest(), finished=done >= len(frames))
+                batch = []
+                batch_frames = 0
+                self.report(index, total_files, path, done, len(frames))
+        if not frames:
+            with conn:
+                conn.execute("UPDATE import_progress SET finished=1 WHERE path=?", (path,))
+
+    def write_batch(self, conn, path: str, batch: list, frames_done: int, prefix_hash: str, finished: bool):
+        with conn:
+            insert_results(conn, batch)
+            conn.executemany(
+                "INSERT OR IGNORE INTO import_results (path, result_id) VALUES (?, ?)",
+                [(path, r.id) for r in batch],
+            )
+            conn.execute(
+                "UPDATE import_progress SET frames_done=?, finished=?, prefix_hash=? WHERE path=?",
+                (frames_done, 1 if finished else 0, prefix_hash, path),
+            )
+        self.rows_written += len(batch)
+
+    def report(self, index, total_files, path, done, total, skipped=False):
+        if not self.progress:
+            return
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows_written / elapsed if elapsed > 0 else 0.0
+        state = "already imported" if skipped else f"{done}/{total} frames"
+        self.progress(
+            f"[{index}/{total_files}] {os.path.basename(path)}: {state} | "
+            f"{self.rows_written} rows, {rate:.0f} rows/s"
+        )
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import historical analyzer output into the results database")
+    ap.add_argument("paths", nargs="+", help="files or folders to import")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    ap.add_argument("--chunk", type=int, default=BULK_CHUNK_FRAMES, help="frames per worker task")
+    ap.add_argument("--batch", type=int, default=BULK_BATCH_ROWS, help="rows per transaction")
+    args = ap.parse_args(argv)
+    importer = BulkImporter(args.db, args.workers, args.chunk, args.batch, progress=print)
+    rows = importer.run(args.paths)
+    elapsed = time.perf_counter() - importer.started
+    print(f"Imported {rows} results in {elapsed:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Columnar export of results for QC statistics, next to the CSV export.
+
+Instead of strings like "6.3 10^3/uL" every analyte becomes a float64
+column (NaN when missing), the timestamp becomes epoch seconds, and
+instrument and patient IDs are dictionary-encoded (int32 codes plus one
+array of distinct values). Rows are streamed from SQLite in keyset chunks
+(db.iter_results, newest first) into per-column temporary files, so memory
+does not grow with the export size.
+
+Output formats, chosen by the destination:
+  - out.npz       one .npy member per column (numpy.load(path))
+  - out/          a directory of .npy files (numpy.load(f, mmap_mode="r"))
+  - out.parquet   Arrow dictionary/timestamp types; needs pyarrow
+
+The .npy files are written by hand (format version 1.0), so numpy is only
+needed to read them.
+
+    python -m crp_desktop.columnar qc_2024.npz --start 2024-01-01 --end 2024-12-31
+"""
+import os
+import sys
+import array
+import shutil
+import zipfile
+import functools
+import argparse
+import tempfile
+from crp_desktop.db import get_read_db, iter_results
+from crp_desktop.record import ANALYTE_SLOTS
+from crp_desktop.reference import parse_value
+from crp_desktop.timestamps import to_epoch
+from crp_desktop.resources import DB_PATH, PAGE_SIZE_MAX
+
+NAN = float("nan")
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+# typecode -> .npy descr; array.array is native-endian, .npy here is always little-endian
+NPY_DESCR = {"d": "<f8", "q": "<i8", "i": "<i4", "B": "|u1"}
+FLOAT_COLUMNS = ("ts",) + ANALYTE_SLOTS
+CODE_COLUMNS = ("instrument", "patient_id")
+
+def npy_header(descr: str, length: int) -> bytes:
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, length)
+    # magic + 2-byte length + header + newline, padded to a multiple of 64
+    pad = 64 - (len(NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = (header + " " * (pad % 64) + "\n").encode("latin-1")
+    return NPY_MAGIC + len(header).to_bytes(2, "little") + header
+
+def write_string_npy(out, values: list):
+    """Strings as a fixed-width '<U{n}' array (UTF-32-LE), loadable without allow_pickle."""
+    width = max((len(v) for v in values), default=1) or 1
+    out.write(npy_header(f"<U{width}", len(values)))
+    out.write(b"".join(v.encode("utf-32-le").ljust(width * 4, b"\0") for v in values))
+
+class ColumnSpool:
+    """One typed column, appended chunk by chunk to a temporary file."""
+    def __init__(self, typecode: str):
+        self.typecode = typecode
+        self.file = tempfile.TemporaryFile()
+        self.length = 0
+
+    def extend(self, values: list):
+        buf = array.array(self.typecode, values)
+        if sys.byteorder == "big":
+            buf.byteswap()
+        buf.tofile(self.file)
+        self.length += len(buf)
+
+    def write_npy(self, out):
+        out.write(npy_header(NPY_DESCR[self.typecode], self.length))
+        self.file.seek(0)
+        shutil.copyfileobj(self.file, out)
+
+    def values(self) -> array.array:
+        self.file.seek(0)
+        buf = array.array(self.typecode)
+        buf.frombytes(self.file.read())
+        if sys.byteorder == "big":
+            buf.byteswap()
+        return buf
+
+    def close(self):
+        self.file.close()
+
+class Dictionary:
+    """Value -> int32 code, in order of first appearance; None/'' is code -1."""
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value) -> int:
+        if value is None or value == "":
+            return -1
+        value = str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+def row_epoch(row) -> float:
+    ts = to_epoch(row["measure_datetime"])
+    if ts is None:
+        ts = to_epoch(row["created_at"], utc=True)
+    return NAN if ts is None else ts
+
+class ColumnarExport:
+    """Collects result rows column-wise; write_*() then emits one of the formats."""
+    def __init__(self):
+        self.columns = {"id": ColumnSpool("q")}
+        self.columns.update((name, ColumnSpool("d")) for name in FLOAT_COLUMNS)
+        self.columns.update((name, ColumnSpool("i")) for name in CODE_COLUMNS)
+        self.columns.update((name, ColumnSpool("B")) for name in ("abnormal", "critical"))
+        self.dictionaries = {name: Dictionary() for name in CODE_COLUMNS}
+        self.rows = 0
+
+    def add_rows(self, rows: list):
+        cols = self.columns
+        cols["id"].extend([r["id"] for r in rows])
+        cols["ts"].extend([row_epoch(r) for r in rows])
+        for slot in ANALYTE_SLOTS:
+            vals = [parse_value(r[slot]) for r in rows]
+            cols[slot].extend([NAN if v is None else v for v in vals])
+        inst = self.dictionaries["instrument"]
+        cols["instrument"].extend([inst.encode(r["instrument_no"] or r["instrument_name"]) for r in rows])
+        pats = self.dictionaries["patient_id"]
+        cols["patient_id"].extend([pats.encode(r["patient_id"]) for r in rows])
+        cols["abnormal"].extend([1 if r["abnormal"] else 0 for r in rows])
+        cols["critical"].extend([1 if r["critical"] else 0 for r in rows])
+        self.rows += len(rows)
+
+    def members(self):
+        """(file name, writer(out)) for every .npy file of the export."""
+        for name, col in self.columns.items():
+            yield name + ".npy", col.write_npy
+        for name, d in self.dictionaries.items():
+            yield f"{name}_values.npy", functools.partial(write_string_npy, values=d.values)
+
+    def write_npz(self, path: str):
+        # stored, not deflated: members can be read without decompressing
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for name, write in self.members():
+                with zf.open(name, "w", force_zip64=True) as out:
+                    write(out)
+
+    def write_npy_dir(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        for name, write in self.members():
+            with open(os.path.join(path, name), "wb") as out:
+                write(out)
+
+    def write_parquet(self, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        arrays = {"id": pa.array(self.columns["id"].values(), pa.int64())}
+        ts = self.columns["ts"].values()
+        arrays["ts"] = pa.array([None if t != t else int(t * 1000) for t in ts], pa.timestamp("ms", tz="UTC"))
+        for name in ANALYTE_SLOTS:
+            arrays[name] = pa.array(self.columns[name].values(), pa.float64(), from_pandas=True)  # NaN -> null
+        for name in CODE_COLUMNS:
+            codes = pa.array([None if c < 0 else c for c in self.columns[name].values()], pa.int32())
+            arrays[name] = pa.DictionaryArray.from_arrays(codes, pa.array(self.dictionaries[name].values, pa.string()))
+        for name in ("abnormal", "critical"):
+            arrays[name] = pa.array([bool(v) for v in self.columns[name].values()], pa.bool_())
+        pq.write_table(pa.table(arrays), path)
+
+    def close(self):
+        for col in self.columns.values():
+            col.close()
+
+def export_columnar(conn, path: str, start: str = None, end: str = None,
+                    patient: str = None, instrument: str = None, chunk: int = PAGE_SIZE_MAX) -> int:
+    """Export matching results to `path` (.npz, .parquet, or a directory of .npy); returns the row count."""
+    export = ColumnarExport()
+    try:
+        batch = []
+        for row in iter_results(conn, start, end, patient, instrument, chunk=chunk):
+            batch.append(row)
+            if len(batch) >= chunk:
+                export.add_rows(batch)
+                batch = []
+        if batch:
+            export.add_rows(batch)
+        if path.endswith(".parquet"):
+            export.write_parquet(path)
+        elif path.endswith(".npz"):
+            export.write_npz(path)
+        else:
+            export.write_npy_dir(path)
+        return export.rows
+    finally:
+        export.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export results as typed columns (.npz, .npy directory or .parquet)")
+    ap.add_argument("dest", help="out.npz, out.parquet, or a directory for .npy files")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--start", help="YYYY-MM-DD")
+    ap.add_argument("--end", help="YYYY-MM-DD")
+    ap.add_argument("--patient")
+    ap.add_argument("--instrument")
+    args = ap.parse_args(argv)
+    conn = get_read_db(args.db)
+    try:
+        n = export_columnar(conn, args.dest, args.start, args.end, args.patient, args.instrument)
+    finally:
+        conn.close()
+    print(f"Exported {n} rows to {args.dest}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,86 @@
 
+import uuid
 import sqlite3
 import json
-from datetime import datetime
-from crp_desktop.resources import DB_PATH
+import heapq
+import queue
+import base64
+import threading
+from pathlib import Path
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, timedelta
+from crp_desktop.resources import DB_PATH, READ_POOL_SIZE, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from crp_desktop.metrics import metrics
+from crp_desktop.record import Result, ROW_SLOTS
+from crp_desktop.reference import reference_ranges, init_reference_db, format_flags, CRITICAL_FLAGS, ABNORMAL_FLAGS
+from crp_desktop.timestamps import timestamps
+
+# sort key for every list query; matches idx_crp_results_ts
+TS_EXPR = "COALESCE(measure_datetime, created_at)"
 
 def get_db(path: str = DB_PATH):
     conn = sqlite3.connect(path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     return conn
 
+def get_read_db(path: str = DB_PATH):
+    """Read-only connection; in WAL mode it never blocks (or is blocked by) the writer."""
+    uri = Path(path).absolute().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only=1")
+    return conn
+
+class ReadPool:
+    """
+    Pool of read-only connections shared by API/reporting threads.
+    Connections are created on demand up to `size`; acquire() blocks when all are in use.
+    """
+    def __init__(self, path: str = DB_PATH, size: int = READ_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout: float = None) -> sqlite3.Connection:
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                try:
+                    return get_read_db(self.path)
+                except Exception:
+                    self.created -= 1
+                    raise
+        return self.idle.get(timeout=timeout)
+
+    def release(self, conn: sqlite3.Connection):
+        self.idle.put(conn)
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
 def init_db(path: str = DB_PATH):
     conn = sqlite3.connect(path)
+    # WAL lets readers (GUI, backups) run alongside the serial writer
+    conn.execute("PRAGMA journal_mode=WAL")
     cur = conn.cursor()
     cur.execute(
         """
@@ -48,10 +118,35 @@ def init_db(path: str = DB_PATH):
             packet_type TEXT,
             misc TEXT,
             raw_payload TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            flags TEXT,
+            abnormal INTEGER DEFAULT 0,
+            critical INTEGER DEFAULT 0
         )
         """
     )
+    # databases created before reference ranges existed get the flag columns here
+    added = _add_missing_columns(cur, "crp_results", FLAG_COLUMNS)
+    cur.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_crp_results_ts ON crp_results({TS_EXPR}, id)"
+    )
+    cur.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_crp_results_critical ON crp_results({TS_EXPR}, id) WHERE critical = 1"
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS result_flags (
+            result_id INTEGER NOT NULL,
+            analyte TEXT NOT NULL,
+            flag TEXT NOT NULL,
+            ts TEXT,
+            PRIMARY KEY (result_id, analyte)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_result_flags_analyte ON result_flags(analyte, flag, ts, result_id)"
+    )
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS settings (
@@ -60,109 +155,218 @@ def init_db(path: str = DB_PATH):
         )
         """
     )
+    # identifies this database file (and its backups) to followers that keep their own marks
+    cur.execute("CREATE TABLE IF NOT EXISTS db_meta (key TEXT PRIMARY KEY, value TEXT)")
+    cur.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('db_id', ?)", (uuid.uuid4().hex,))
     conn.commit()
+    init_reference_db(conn)
+    reference_ranges.load(conn)
+    if added:
+        conn.row_factory = sqlite3.Row
+        refresh_flags(conn)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        normalize_timestamps(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    # after the one-off migrations above, so they do not stamp every row as changed
+    init_change_log(conn)
     conn.close()
 
-def _safe_get(parsed: dict, key: str):
-    val = parsed.get(key)
-    if isinstance(val, list):
-        return "\n".join(val)
-    return val
+# 1: measure_datetime is always ISO or NULL
+SCHEMA_VERSION = 1
+
+FLAG_COLUMNS = {"flags": "TEXT", "abnormal": "INTEGER DEFAULT 0", "critical": "INTEGER DEFAULT 0"}
+# columns whose change makes an UPDATE worth logging
+LOGGED_COLUMNS = ROW_SLOTS + ("misc", "measure_datetime", "raw_payload") + tuple(FLAG_COLUMNS)
 
-def save_result(parsed: dict, conn: sqlite3.Connection = None):
+def init_change_log(conn: sqlite3.Connection):
+    """
+    change_log holds one entry per result: its latest change ('I', 'U', or
+    'D' once the row is deleted), stamped with the next value of the
+    change_seq counter. The counter only ever goes up, so a seq is never
+    handed out twice, whatever happens to the log. Other connections and
+    processes follow crp_results by asking for seq > last seen; the log never
+    grows beyond the number of ids ever used.
+    """
+    # the triggers are recreated below, so databases get the current bodies
+    for name in ("trg_crp_results_insert", "trg_crp_results_update", "trg_crp_results_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    # column name -> primary key position
+    pk = {r[1]: r[5] for r in conn.execute("PRAGMA table_info(change_log)")}
+    appended = bool(pk) and not pk.get("result_id")
+    if appended:
+        # first layout: one entry appended per change. Keep each row's latest
+        # seq, so followers that saved a seq carry on where they were.
+        conn.execute("ALTER TABLE change_log RENAME TO change_log_appended")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            result_id INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL UNIQUE,
+            op TEXT NOT NULL
+        )
+        """
+    )
+    if appended:
+        conn.execute(
+            "INSERT INTO change_log (result_id, seq, op) "
+            "SELECT result_id, MAX(seq), 'U' FROM change_log_appended GROUP BY result_id"
+        )
+        conn.execute("DROP TABLE change_log_appended")
+    elif not pk:
+        # rows written before the log existed are replayed as inserts
+        conn.execute("INSERT INTO change_log (result_id, seq, op) SELECT id, id, 'I' FROM crp_results")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS change_seq (id INTEGER PRIMARY KEY CHECK (id = 1), seq INTEGER NOT NULL)"
+    )
+    conn.execute("INSERT OR IGNORE INTO change_seq (id, seq) VALUES (1, 0)")
+    # never behind the log (first run, backfill, migrated layout)
+    conn.execute("UPDATE change_seq SET seq = MAX(seq, (SELECT COALESCE(MAX(seq), 0) FROM change_log))")
+
+    def log(op: str, row: str) -> str:
+        return (
+            "UPDATE change_seq SET seq = seq + 1; "
+            "INSERT OR REPLACE INTO change_log (result_id, seq, op) "
+            f"VALUES ({row}.id, (SELECT seq FROM change_seq), '{op}');"
+        )
+    conn.execute(
+        "CREATE TRIGGER trg_crp_results_insert AFTER INSERT ON crp_results BEGIN "
+        f"{log('I', 'NEW')} END"
+    )
+    changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in LOGGED_COLUMNS)
+    conn.execute(
+        f"CREATE TRIGGER trg_crp_results_update AFTER UPDATE ON crp_results WHEN {changed} BEGIN "
+        f"{log('U', 'NEW')} END"
+    )
+    conn.execute(
+        "CREATE TRIGGER trg_crp_results_delete AFTER DELETE ON crp_results BEGIN "
+        f"{log('D', 'OLD')} END"
+    )
+    conn.commit()
+
+def _add_missing_columns(cur, table: str, columns: dict) -> list:
+    have = {r[1] for r in cur.execute(f"PRAGMA table_info({table})")}
+    added = []
+    for name, decl in columns.items():
+        if name not in have:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+            added.append(name)
+    return added
+
+INSERT_RESULT_SQL = (
+    "INSERT INTO crp_results ("
+    + ",".join(ROW_SLOTS)
+    + ",misc,measure_datetime,raw_payload,flags,abnormal,critical) VALUES ("
+    + ",".join("?" * (len(ROW_SLOTS) + 6))
+    + ")"
+)
+# result_flags.ts copies the row's sort key so "flag X between dates" is one index range
+INSERT_FLAG_SQL = (
+    "INSERT OR REPLACE INTO result_flags (result_id, analyte, flag, ts) "
+    f"SELECT id, ?, ?, {TS_EXPR} FROM crp_results WHERE id = ?"
+)
+
+def _flag_params(flags: dict) -> tuple:
+    """flags, abnormal, critical column values for a {slot: flag} dict."""
+    values = flags.values()
+    return (
+        format_flags(flags),
+        1 if any(f in ABNORMAL_FLAGS for f in values) else 0,
+        1 if any(f in CRITICAL_FLAGS for f in values) else 0,
+    )
+
+def _result_row(parsed: Result, flags: dict) -> tuple:
+    """Parameters for INSERT_RESULT_SQL."""
+    measure_dt = timestamps.normalize(parsed.date, parsed.time, parsed.instrument_name or "")
+    return (parsed.as_row() + (measure_dt, json.dumps(parsed.to_dict(), ensure_ascii=False))
+            + _flag_params(flags))
+
+def _insert_result(cur, parsed) -> Result:
+    """Insert a Result (or plain label-keyed dict) with its reference-range flags."""
+    if not isinstance(parsed, Result):
+        parsed = Result.from_mapping(parsed)
+    flags = reference_ranges.evaluate(parsed)
+    cur.execute(INSERT_RESULT_SQL, _result_row(parsed, flags))
+    row_id = cur.lastrowid
+    if flags:
+        cur.executemany(INSERT_FLAG_SQL, [(slot, flag, row_id) for slot, flag in flags.items()])
+    parsed.id = row_id
+    parsed.flags = format_flags(flags)
+    return parsed
+
+def save_result(parsed, conn: sqlite3.Connection = None):
+    """Insert one Result (or label-keyed dict) and commit; sets parsed.id and parsed.flags when given a Result."""
     close_conn = False
     if conn is None:
         conn = get_db()
         close_conn = True
     cur = conn.cursor()
-    date_str = parsed.get('DATE')
-    time_str = parsed.get('TIME')
-    measure_dt = None
-    if date_str and time_str:
-        try:
-            year_part = date_str.split('/')[-1]
-            if len(year_part) == 2:
-                dt = datetime.strptime(f"{date_str} {time_str}", "%d/%m/%y %H:%M:%S")
-            else:
-                dt = datetime.strptime(f"{date_str} {time_str}", "%d/%m/%Y %H:%M:%S")
-            measure_dt = dt.isoformat(sep=' ')
-        except Exception:
-            try:
-                t = time_str.replace('h', ':').replace('mn', ':').replace('s', '')
-                year_part = date_str.split('/')[-1]
-                if len(year_part) == 2:
-                    dt = datetime.strptime(f"{date_str} {t}", "%d/%m/%y %H:%M:%S")
-                else:
-                    dt = datetime.strptime(f"{date_str} {t}", "%d/%m/%Y %H:%M:%S")
-                measure_dt = dt.isoformat(sep=' ')
-            except Exception:
-                measure_dt = f"{date_str} {time_str}"
-    row = {
-        "instrument_no": parsed.get("NO."),
-        "date": date_str,
-        "time": time_str,
-        "measure_datetime": measure_dt,
-        "patient_id": parsed.get("ID"),
-        "sid": parsed.get("SID"),
-        "pid": parsed.get("PID"),
-        "wbc": parsed.get("WBC"),
-        "rbc": parsed.get("RBC"),
-        "hgb": parsed.get("HGB"),
-        "hct": parsed.get("HCT"),
-        "mcv": parsed.get("MCV"),
-        "mch": parsed.get("MCH"),
-        "mchc": parsed.get("MCHC"),
-        "rdw": parsed.get("RDW"),
-        "plt": parsed.get("PLT"),
-        "mpv": parsed.get("MPV"),
-        "pct": parsed.get("PCT"),
-        "pdw": parsed.get("PDW"),
-        "pct_lym": parsed.get("%LYM"),
-        "pct_mon": parsed.get("%MON"),
-        "pct_gra": parsed.get("%GRA"),
-        "hash_lym": parsed.get("#LYM"),
-        "hash_mon": parsed.get("#MON"),
-        "hash_gra": parsed.get("#GRA"),
-        "crp": parsed.get("CRP"),
-        "instrument_name": parsed.get("InstrumentName"),
-        "format_version": parsed.get("FormatVersion"),
-        "checksum": parsed.get("Checksum"),
-        "packet_type": parsed.get("PacketType"),
-        "misc": _safe_get(parsed, "MISC"),
-        "raw_payload": json.dumps(parsed, ensure_ascii=False),
-    }
-    cur.execute(
-        """
-        INSERT INTO crp_results (
-            instrument_no,date,time,measure_datetime,patient_id,sid,pid,
-            wbc,rbc,hgb,hct,mcv,mch,mchc,rdw,plt,mpv,pct,pdw,
-            pct_lym,pct_mon,pct_gra,hash_lym,hash_mon,hash_gra,crp,
-            instrument_name,format_version,checksum,packet_type,misc,raw_payload
-        ) VALUES (
-            :instrument_no,:date,:time,:measure_datetime,:patient_id,:sid,:pid,
-            :wbc,:rbc,:hgb,:hct,:mcv,:mch,:mchc,:rdw,:plt,:mpv,:pct,:pdw,
-            :pct_lym,:pct_mon,:pct_gra,:hash_lym,:hash_mon,:hash_gra,:crp,
-            :instrument_name,:format_version,:checksum,:packet_type,:misc,:raw_payload
-        )
-        """,
-        row,
-    )
-    conn.commit()
+    with metrics.timer("db.save_result"):
+        _insert_result(cur, parsed)
+        conn.commit()
     if close_conn:
         conn.close()
 
+def insert_results(conn: sqlite3.Connection, parsed_list) -> int:
+    """
+    Insert many parsed results without committing; the caller owns the
+    transaction. Sets id and flags on every Result given. Rows and flag rows
+    each go in with a single executemany.
+    """
+    records = [p if isinstance(p, Result) else Result.from_mapping(p) for p in parsed_list]
+    if not records:
+        return 0
+    evaluated = [reference_ranges.evaluate(r) for r in records]
+    cur = conn.cursor()
+    if not conn.in_transaction:
+        cur.execute("BEGIN")
+    cur.executemany(INSERT_RESULT_SQL, [_result_row(r, f) for r, f in zip(records, evaluated)])
+    # the transaction holds the write lock, so AUTOINCREMENT handed out one
+    # consecutive id range ending at the last inserted rowid
+    first_id = cur.execute("SELECT last_insert_rowid()").fetchone()[0] - len(records) + 1
+    flag_rows = []
+    for row_id, (r, flags) in enumerate(zip(records, evaluated), first_id):
+        r.id = row_id
+        r.flags = format_flags(flags)
+        flag_rows.extend((slot, flag, row_id) for slot, flag in flags.items())
+    if flag_rows:
+        cur.executemany(INSERT_FLAG_SQL, flag_rows)
+    return len(records)
+
+def save_results(parsed_list, conn: sqlite3.Connection) -> int:
+    """Insert a batch of parsed results in one transaction."""
+    with metrics.timer("db.save_results"):
+        with conn:
+            return insert_results(conn, parsed_list)
+
+SETTINGS_DEFAULTS = {
+    "clinic_name": "Your Clinic Name",
+    "report_title": "CRP & CBC REPORT",
+    "footer_text": "This report is for clinical use only.",
+}
+
+def load_settings(conn: sqlite3.Connection) -> dict:
+    """Every stored setting, with SETTINGS_DEFAULTS filled in."""
+    data = dict(SETTINGS_DEFAULTS)
+    data.update({k: v for k, v in conn.execute("SELECT key,value FROM settings")})
+    return data
+
+def write_settings(conn: sqlite3.Connection, data: dict):
+    """Upsert all keys in a single transaction."""
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO settings (key,value) VALUES (?,?)
+            ON CONFLICT(key) DO UPDATE SET value=excluded.value
+            """, list(data.items())
+        )
+
 def get_settings(conn: sqlite3.Connection = None) -> dict:
+    """One-off read; long-lived code should use settings_store.SettingsStore."""
     close_conn = False
     if conn is None:
         conn = get_db()
         close_conn = True
-    cur = conn.cursor()
-    cur.execute("SELECT key,value FROM settings")
-    rows = cur.fetchall()
-    data = {r["key"]: r["value"] for r in rows}
-    data.setdefault("clinic_name", "Your Clinic Name")
-    data.setdefault("report_title", "CRP & CBC REPORT")
-    data.setdefault("footer_text", "This report is for clinical use only.")
+    data = load_settings(conn)
     if close_conn:
         conn.close()
     return data
@@ -172,14 +376,246 @@ def set_settings(data: dict, conn: sqlite3.Connection = None):
     if conn is None:
         conn = get_db()
         close_conn = True
-    cur = conn.cursor()
-    for k, v in data.items():
-        cur.execute(
-            """
-            INSERT INTO settings (key,value) VALUES (?,?)
-            ON CONFLICT(key) DO UPDATE SET value=excluded.value
-            """, (k, v)
-        )
-    conn.commit()
+    write_settings(conn, data)
     if close_conn:
         conn.close()
+
+def encode_cursor(values) -> str:
+    """Opaque page cursor from the sort key of the last row on a page."""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    pad = "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(cursor + pad).decode("utf-8"))
+
+ResultPage = namedtuple("ResultPage", "rows next_cursor prev_cursor")
+
+def _row_key(row) -> list:
+    return [row["measure_datetime"] or row["created_at"], row["id"]]
+
+def _result_filters(start: str = None, end: str = None, patient: str = None, instrument: str = None):
+    """WHERE fragments for the list filters. Dates are YYYY-MM-DD and become an index range."""
+    where = []
+    params = []
+    if start:
+        where.append(f"{TS_EXPR} >= ?")
+        params.append(start)
+    if end:
+        next_day = (date.fromisoformat(end) + timedelta(days=1)).isoformat()
+        where.append(f"{TS_EXPR} < ?")
+        params.append(next_day)
+    if patient:
+        where.append("patient_id LIKE ?")
+        params.append(f"%{patient}%")
+    if instrument:
+        where.append("instrument_no LIKE ?")
+        params.append(f"%{instrument}%")
+    return where, params
+
+def query_results(conn: sqlite3.Connection, start: str = None, end: str = None,
+                  patient: str = None, instrument: str = None,
+                  cursor: str = None, direction: str = "next",
+                  limit: int = PAGE_SIZE_DEFAULT) -> ResultPage:
+    """
+    One page of results, newest first, keyset-paginated on (timestamp, id).
+    `cursor` comes from a previous page's next_cursor (direction="next") or
+    prev_cursor (direction="prev"); the cost of a page does not depend on
+    how far into the history it is.
+    """
+    limit = max(1, min(int(limit), PAGE_SIZE_MAX))
+    where, params = _result_filters(start, end, patient, instrument)
+    backwards = direction == "prev"
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        op = ">" if backwards else "<"
+        # the plain bound on TS_EXPR lets sqlite seek the index; the row value breaks ties
+        where.append(f"{TS_EXPR} {op}= ? AND ({TS_EXPR}, id) {op} (?, ?)")
+        params.extend([ts, ts, row_id])
+    order = "ASC" if backwards else "DESC"
+    query = "SELECT * FROM crp_results"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += f" ORDER BY {TS_EXPR} {order}, id {order} LIMIT ?"
+    params.append(limit + 1)
+    rows = conn.execute(query, params).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return ResultPage(rows, None, None)
+    first, last = encode_cursor(_row_key(rows[0])), encode_cursor(_row_key(rows[-1]))
+    if backwards:
+        return ResultPage(rows, last, first if more else None)
+    return ResultPage(rows, last if more else None, first if cursor else None)
+
+def iter_results(conn: sqlite3.Connection, start: str = None, end: str = None,
+                 patient: str = None, instrument: str = None, chunk: int = PAGE_SIZE_MAX):
+    """Stream every matching row, newest first, one keyset page at a time."""
+    cursor = None
+    while True:
+        page = query_results(conn, start, end, patient, instrument, cursor=cursor, limit=chunk)
+        yield from page.rows
+        if not page.next_cursor:
+            break
+        cursor = page.next_cursor
+
+def today_results(conn: sqlite3.Connection) -> list:
+    today = date.today().isoformat()
+    return list(iter_results(conn, start=today, end=today))
+
+def result_columns(conn: sqlite3.Connection) -> list:
+    return [r[1] for r in conn.execute("PRAGMA table_info(crp_results)")]
+
+def get_result(conn: sqlite3.Connection, row_id: int):
+    return conn.execute("SELECT * FROM crp_results WHERE id = ?", (row_id,)).fetchone()
+
+def database_id(conn: sqlite3.Connection) -> str:
+    """Random id given to the database when it was created; a restored backup keeps it."""
+    row = conn.execute("SELECT value FROM db_meta WHERE key = 'db_id'").fetchone()
+    return row[0] if row else None
+
+def last_change_seq(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT seq FROM change_seq").fetchone()[0]
+
+def changes_since(conn: sqlite3.Connection, seq: int, limit: int = PAGE_SIZE_MAX) -> list:
+    """
+    Rows changed after change_log sequence `seq`, oldest change first, each
+    with its `seq`, `op` ('I' insert, 'U' update, 'D' delete) and
+    `result_id`. A row appears once, at its latest change; for a deleted row
+    every other column is NULL.
+    """
+    return conn.execute(
+        "SELECT c.seq AS seq, c.op AS op, c.result_id AS result_id, r.* FROM change_log c "
+        "LEFT JOIN crp_results r ON r.id = c.result_id "
+        "WHERE c.seq > ? ORDER BY c.seq LIMIT ?",
+        (seq, limit),
+    ).fetchall()
+
+class ChangeFeed:
+    """
+    Follows crp_results through change_log. poll() is one PRAGMA
+    data_version read while nothing changed, and otherwise fetches up to
+    `chunk` rows changed since the last poll, whichever process or
+    connection wrote them. A larger backlog is spread over later polls.
+    """
+    def __init__(self, conn: sqlite3.Connection, seq: int = None, chunk: int = PAGE_SIZE_MAX):
+        self.conn = conn
+        self.chunk = chunk
+        self.seq = last_change_seq(conn) if seq is None else seq
+        self.data_version = None
+        # data_version does not move for this connection's own commits,
+        # nor for a backlog left over from the previous poll
+        self.force = True
+
+    def poll(self) -> list:
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.data_version and not self.force:
+            return []
+        self.data_version = version
+        rows = changes_since(self.conn, self.seq, self.chunk)
+        if rows:
+            self.seq = rows[-1]["seq"]
+        self.force = len(rows) >= self.chunk
+        return rows
+
+    def wake(self):
+        """Make the next poll() query even if data_version did not change (own writes)."""
+        self.force = True
+
+def results_after(conn: sqlite3.Connection, after_id: int, limit: int = 500) -> list:
+    """Rows inserted after `after_id`, oldest first (for change streams)."""
+    return conn.execute(
+        "SELECT * FROM crp_results WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+    ).fetchall()
+
+def max_result_id(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM crp_results").fetchone()[0]
+
+def refresh_flags(conn: sqlite3.Connection, chunk: int = PAGE_SIZE_MAX) -> int:
+    """
+    Re-evaluate the stored flags of every row against the current reference
+    ranges (after editing them, or for rows written before flags existed).
+    Rows are evaluated in batches, column by column.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT * FROM crp_results WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk)
+        ).fetchall()
+        if not rows:
+            break
+        with conn:
+            ids = [r["id"] for r in rows]
+            conn.execute(
+                f"DELETE FROM result_flags WHERE result_id IN ({','.join('?' * len(ids))})", ids
+            )
+            updates = []
+            flag_rows = []
+            for row_id, flags in zip(ids, reference_ranges.evaluate_columns(rows)):
+                updates.append(_flag_params(flags) + (row_id,))
+                flag_rows.extend((slot, flag, row_id) for slot, flag in flags.items())
+            conn.executemany("UPDATE crp_results SET flags=?, abnormal=?, critical=? WHERE id=?", updates)
+            conn.executemany(INSERT_FLAG_SQL, flag_rows)
+        updated += len(rows)
+        last_id = ids[-1]
+    return updated
+
+ISO_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]"
+
+def normalize_timestamps(conn: sqlite3.Connection) -> int:
+    """
+    Rewrite measure_datetime values stored as raw printout text (older
+    versions kept them when parsing failed) as ISO, or NULL so the row
+    sorts by created_at. Returns the number of rows changed.
+    """
+    rows = conn.execute(
+        "SELECT id, date, time, instrument_name FROM crp_results "
+        "WHERE measure_datetime IS NOT NULL AND measure_datetime NOT GLOB ?", (ISO_GLOB,)
+    ).fetchall()
+    if not rows:
+        return 0
+    with conn:
+        conn.executemany(
+            "UPDATE crp_results SET measure_datetime = ? WHERE id = ?",
+            [(timestamps.normalize(r[1], r[2], r[3] or ""), r[0]) for r in rows],
+        )
+        conn.executemany(
+            f"UPDATE result_flags SET ts = (SELECT {TS_EXPR} FROM crp_results WHERE id = result_id) "
+            "WHERE result_id = ?",
+            [(r[0],) for r in rows],
+        )
+    return len(rows)
+
+def flagged_results(conn: sqlite3.Connection, analyte: str = None, flags=CRITICAL_FLAGS,
+                    start: str = None, end: str = None) -> list:
+    """
+    Rows flagged for one analyte slot ("crp") with any of `flags`, newest
+    first, via idx_result_flags_analyte. With analyte=None, every critical
+    row (partial index idx_crp_results_critical); `flags` is then ignored.
+    """
+    if analyte is None:
+        where, params = _result_filters(start, end)
+        where.insert(0, "critical = 1")
+        return conn.execute(
+            f"SELECT * FROM crp_results WHERE {' AND '.join(where)} ORDER BY {TS_EXPR} DESC, id DESC",
+            params,
+        ).fetchall()
+    # one index range per flag, merged here: an IN list would need a temp B-tree to sort
+    where = ["f.analyte = ?", "f.flag = ?"]
+    params = []
+    if start:
+        where.append("f.ts >= ?")
+        params.append(start)
+    if end:
+        where.append("f.ts < ?")
+        params.append((date.fromisoformat(end) + timedelta(days=1)).isoformat())
+    sql = (
+        "SELECT r.* FROM result_flags f JOIN crp_results r ON r.id = f.result_id "
+        f"WHERE {' AND '.join(where)} ORDER BY f.ts DESC, f.result_id DESC"
+    )
+    per_flag = [conn.execute(sql, [analyte, flag] + params).fetchall() for flag in flags]
+    if len(per_flag) == 1:
+        return per_flag[0]
+    return list(heapq.merge(*per_flag, key=_row_key, reverse=True))
@@ -0,0 +1,29 @@
+import threading
+
+class Event:
+    """Plain-Python stand-in for a Qt Signal: connect() handlers, emit() calls them in the emitting thread."""
+    def __init__(self):
+        self.handlers = []
+        self.lock = threading.Lock()
+
+    def connect(self, fn):
+        with self.lock:
+            self.handlers = self.handlers + [fn]
+
+    def disconnect(self, fn):
+        with self.lock:
+            self.handlers = [h for h in self.handlers if h != fn]
+
+    def emit(self, *args):
+        for fn in self.handlers:
+            fn(*args)
+
+class EventBus:
+    """Same attributes as signals.Signals, without needing a QApplication."""
+    def __init__(self):
+        self.new_result = Event()
+        self.status = Event()
+        self.report_ready = Event()
+        self.settings_changed = Event()
+        self.ports_listed = Event()
+        self.probe_finished = Event()
@@ -1,24 +1,44 @@
 
 import json
 import time
-import csv
+import bisect
 import threading
 from datetime import date
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget,
-    QTableWidgetItem, QLineEdit, QTextEdit, QMessageBox, QFormLayout,
-    QFileDialog, QDateEdit, QHeaderView, QComboBox, QTabWidget
+    QTableWidgetItem, QLineEdit, QTextEdit, QPlainTextEdit, QMessageBox, QFormLayout,
+    QFileDialog, QDateEdit, QHeaderView, QComboBox, QTabWidget, QCheckBox, QSpinBox
 )
-from PySide6.QtCore import QDate
-import serial.tools.list_ports
+from PySide6.QtCore import QDate, QTimer, QEvent
 
-from crp_desktop.db import get_db, get_settings, set_settings
-from crp_desktop.serial_reader import read_serial_and_store_results
-from crp_desktop.resources import BAUD_RATES
+from crp_desktop.db import (
+    get_db, query_results, iter_results, today_results, result_columns, ChangeFeed,
+)
+from crp_desktop.resources import (
+    BAUD_RATES, BACKUP_INTERVAL_MIN, BACKUP_KEEP, LOG_MAX_LINES, LOG_FLUSH_MS,
+    LOG_MAX_LINES_PER_FLUSH, RAW_VIEW_MAX_LINES, PAGE_SIZES, PAGE_SIZE_DEFAULT, LIS_PORT,
+    PROBE_MIN_SCORE, CHANGE_FEED_INTERVAL_MS, CHANGE_FEED_CHUNK,
+)
+from crp_desktop.backup import BackupService
+from crp_desktop.metrics import metrics
+from crp_desktop.result_cache import ResultCache
+from crp_desktop.settings_store import SettingsStore
+from crp_desktop.reference import parse_flags
+from crp_desktop.serial_monitor import LogBuffer, raw_tap, format_hexdump
 from crp_desktop import signals as signals_mod
 from PySide6.QtWidgets import QMainWindow
 
-from crp_desktop.report import generate_report_html, save_html_to_pdf
+# settings keys each background service is configured from
+BACKUP_SETTING_KEYS = {"backup_dir", "backup_interval_min", "backup_compress"}
+LIS_SETTING_KEYS = {"lis_host", "lis_port"}
+SERIAL_SETTING_KEYS = {"serial_port", "serial_baud"}
+
+# csv, pyserial (serial_reader, list_ports) and QtPrintSupport (report) are
+# imported where first used so they stay off the cold-start path.
+
+def today_key(row) -> tuple:
+    """Home table sort key, as in db.iter_results: (timestamp, id)."""
+    return (row["measure_datetime"] or row["created_at"], row["id"])
 
 class MainWindow(QWidget):
     def __init__(self):
@@ -29,22 +49,64 @@ class MainWindow(QWidget):
         self.win.resize(1000, 700)
 
         self.conn = get_db()
+        self.result_cache = ResultCache()
+        self.settings = SettingsStore(self.conn, bus=signals_mod.signals)
         self.stop_event = threading.Event()
         self.listener_thread = None
-
-        tabs = QTabWidget()
-        tabs.addTab(self.make_home_tab(), "Home (Today)")
-        tabs.addTab(self.make_results_tab(), "Results")
-        tabs.addTab(self.make_settings_tab(), "Settings")
-        tabs.addTab(self.make_serial_tab(), "Serial Monitor")
-        self.win.setCentralWidget(tabs)
+        self.backup_service = None
+        self.lis_sender = None
+        self.report_service = None
+        self.change_feed = None
+        # Home table rows as (timestamp, id), ascending; the table shows them newest first
+        self.today_keys = []
+        self.today_ids = {}
+        self.today_date = None
+
+        # only the Home tab is built up front; the others are built on first view
+        self.table_results = None
+        self.txt_log = None
+        self.lbl_status = None
+        # status messages are queued here and flushed to the log in batches
+        self.log_buffer = LogBuffer(maxlen=LOG_MAX_LINES)
+        self.last_status = None
+        self.lazy_tabs = {}
+        self.tabs = QTabWidget()
+        self.tabs.addTab(self.make_home_tab(), "Home (Today)")
+        self.add_lazy_tab(self.open_results_tab, "Results")
+        self.add_lazy_tab(self.make_settings_tab, "Settings")
+        self.add_lazy_tab(self.make_serial_tab, "Serial Monitor")
+        self.add_lazy_tab(self.make_diagnostics_tab, "Diagnostics")
+        self.tabs.currentChanged.connect(self.build_tab)
+        self.win.setCentralWidget(self.tabs)
 
         if signals_mod.signals:
             signals_mod.signals.new_result.connect(self.on_new_result)
             signals_mod.signals.status.connect(self.on_status)
-
+            signals_mod.signals.report_ready.connect(self.on_report_ready)
+            signals_mod.signals.settings_changed.connect(self.on_settings_changed)
+            signals_mod.signals.ports_listed.connect(self.on_ports_listed)
+            signals_mod.signals.probe_finished.connect(self.on_probe_finished)
+
+    def load_initial_data(self):
+        # the feed starts before the first load so nothing written in between is missed
+        self.start_change_feed()
         self.load_today_results()
-        self.search_results(load_all=True)  
+        self.start_backup_service()
+        self.start_lis_sender()
+        self.start_report_service()
+
+    def add_lazy_tab(self, builder, title: str):
+        holder = QWidget()
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        holder.setLayout(layout)
+        index = self.tabs.addTab(holder, title)
+        self.lazy_tabs[index] = builder
+
+    def build_tab(self, index: int):
+        builder = self.lazy_tabs.pop(index, None)
+        if builder:
+            self.tabs.widget(index).layout().addWidget(builder())
 
     # --- Home
     def make_home_tab(self):
@@ -72,6 +134,9 @@ class MainWindow(QWidget):
         export = QPushButton("Export CSV (Today)")
         export.clicked.connect(self.export_today)
         btns.addWidget(export)
+        export_cols = QPushButton("Export columns (Today)")
+        export_cols.clicked.connect(self.export_today_columnar)
+        btns.addWidget(export_cols)
         print_btn = QPushButton("Print selected (Today)")
         print_btn.clicked.connect(lambda: self.export_selected_report(from_today=True))
         btns.addWidget(print_btn)
@@ -80,65 +145,125 @@ class MainWindow(QWidget):
         return w
 
     def load_today_results(self):
-        today = date.today().strftime("%Y-%m-%d")
-        cur = self.conn.cursor()
-        cur.execute(
-            "SELECT * FROM crp_results "
-            "WHERE date(COALESCE(measure_datetime, created_at)) = ? "
-            "ORDER BY COALESCE(measure_datetime, created_at) DESC",
-            (today,)
-        )
-        rows = cur.fetchall()
+        rows = today_results(self.conn)
+        self.today_date = date.today().isoformat()
+        self.today_keys = [today_key(r) for r in reversed(rows)]
+        self.today_ids = {key[1]: key for key in self.today_keys}
         self.table_today.setRowCount(0)
         for r in rows:
             rowpos = self.table_today.rowCount()
             self.table_today.insertRow(rowpos)
+            self.fill_today_row(rowpos, r)
+
+    def fill_today_row(self, rowpos: int, r):
+        name = ""
+        try:
+            raw = r["raw_payload"]
+            if raw:
+                parsed_raw = json.loads(raw)
+                name = parsed_raw.get("NAME") or parsed_raw.get("Name") or parsed_raw.get("PatientName") or parsed_raw.get("PATIENT") or ""
+        except Exception:
             name = ""
-            try:
-                raw = r["raw_payload"]
-                if raw:
-                    parsed_raw = json.loads(raw)
-                    name = parsed_raw.get("NAME") or parsed_raw.get("Name") or parsed_raw.get("PatientName") or parsed_raw.get("PATIENT") or ""
-            except Exception:
-                name = ""
-            pid = str(r["patient_id"] or "")
-            dt = str(r["date"] or "")
-            tm = str(r["time"] or "")
-            instrument = str(r["instrument_no"] or r["instrument_name"] or "")
-            self.table_today.setItem(rowpos, 0, QTableWidgetItem(pid))
-            self.table_today.setItem(rowpos, 1, QTableWidgetItem(name))
-            self.table_today.setItem(rowpos, 2, QTableWidgetItem(dt))
-            self.table_today.setItem(rowpos, 3, QTableWidgetItem(tm))
-            self.table_today.setItem(rowpos, 4, QTableWidgetItem(instrument))
-            self.table_today.setItem(rowpos, 5, QTableWidgetItem(str(r["wbc"] or "")))
-            self.table_today.setItem(rowpos, 6, QTableWidgetItem(str(r["rbc"] or "")))
-            self.table_today.setItem(rowpos, 7, QTableWidgetItem(str(r["hgb"] or "")))
-            self.table_today.setItem(rowpos, 8, QTableWidgetItem(str(r["plt"] or "")))
-            self.table_today.setItem(rowpos, 9, QTableWidgetItem(str(r["crp"] or "")))
-            # hidden id column used for printing/detail lookup
-            self.table_today.setItem(rowpos, 10, QTableWidgetItem(str(r["id"])))
+        pid = str(r["patient_id"] or "")
+        dt = str(r["date"] or "")
+        tm = str(r["time"] or "")
+        instrument = str(r["instrument_no"] or r["instrument_name"] or "")
+        self.table_today.setItem(rowpos, 0, QTableWidgetItem(pid))
+        self.table_today.setItem(rowpos, 1, QTableWidgetItem(name))
+        self.table_today.setItem(rowpos, 2, QTableWidgetItem(dt))
+        self.table_today.setItem(rowpos, 3, QTableWidgetItem(tm))
+        self.table_today.setItem(rowpos, 4, QTableWidgetItem(instrument))
+        self.table_today.setItem(rowpos, 5, QTableWidgetItem(str(r["wbc"] or "")))
+        self.table_today.setItem(rowpos, 6, QTableWidgetItem(str(r["rbc"] or "")))
+        self.table_today.setItem(rowpos, 7, QTableWidgetItem(str(r["hgb"] or "")))
+        self.table_today.setItem(rowpos, 8, QTableWidgetItem(str(r["plt"] or "")))
+        self.table_today.setItem(rowpos, 9, QTableWidgetItem(str(r["crp"] or "")))
+        # hidden id column used for printing/detail lookup
+        self.table_today.setItem(rowpos, 10, QTableWidgetItem(str(r["id"])))
+
+    def remove_today_row(self, row_id: int):
+        old = self.today_ids.pop(row_id, None)
+        if old is not None:
+            i = bisect.bisect_left(self.today_keys, old)
+            self.table_today.removeRow(len(self.today_keys) - 1 - i)
+            del self.today_keys[i]
+
+    def upsert_today_row(self, r):
+        """Insert, move or drop one changed row in the Home table without reloading it."""
+        if r["op"] == "D":
+            self.remove_today_row(r["result_id"])
+            return
+        key = today_key(r)
+        self.remove_today_row(key[1])
+        if not str(key[0]).startswith(self.today_date):
+            return
+        i = bisect.bisect_left(self.today_keys, key)
+        self.today_keys.insert(i, key)
+        self.today_ids[key[1]] = key
+        rowpos = len(self.today_keys) - 1 - i
+        self.table_today.insertRow(rowpos)
+        self.fill_today_row(rowpos, r)
+
+    def start_change_feed(self):
+        self.change_feed = ChangeFeed(self.conn, chunk=CHANGE_FEED_CHUNK)
+        self.change_timer = QTimer(self.win)
+        self.change_timer.setInterval(CHANGE_FEED_INTERVAL_MS)
+        self.change_timer.timeout.connect(self.poll_changes)
+        self.change_timer.start()
+
+    def poll_changes(self):
+        """Apply rows changed by any process since the last poll (a no-op when nothing changed)."""
+        if self.change_feed is None:
+            return
+        rows = self.change_feed.poll()
+        if self.today_date != date.today().isoformat():
+            self.load_today_results()
+        elif rows:
+            with metrics.timer("ui.change_feed"):
+                for r in rows:
+                    self.upsert_today_row(r)
+        # refresh the results list only when it shows the newest page
+        if rows and self.table_results is not None and self.results_page_no == 1:
+            self.show_results_page()
+        if self.report_service:
+            # new rows from any writer (this listener, the service, other workstations)
+            for r in rows:
+                if r["op"] == "I":
+                    self.report_service.prerender(r["id"])
 
     def export_today(self):
         path, _ = QFileDialog.getSaveFileName(self.win, "Save today CSV", "today_results.csv", "CSV files (*.csv)")
         if not path:
             return
+        import csv
         today = date.today().strftime("%Y-%m-%d")
-        cur = self.conn.cursor()
-        cur.execute(
-            "SELECT * FROM crp_results "
-            "WHERE date(COALESCE(measure_datetime, created_at)) = ? "
-            "ORDER BY COALESCE(measure_datetime, created_at) DESC",
-            (today,)
-        )
-        rows = cur.fetchall()
-        headers = [d[0] for d in cur.description]
+        headers = result_columns(self.conn)
+        count = 0
         try:
             with open(path, "w", encoding="utf-8", newline='') as f:
                 writer = csv.writer(f, quoting=csv.QUOTE_MINIMAL)
                 writer.writerow(headers)
-                for r in rows:
+                for r in iter_results(self.conn, start=today, end=today):
                     writer.writerow([r[h] if r[h] is not None else "" for h in headers])
-            QMessageBox.information(self.win, "Export", f"Saved {len(rows)} rows to {path}")
+                    count += 1
+            QMessageBox.information(self.win, "Export", f"Saved {count} rows to {path}")
+        except Exception as e:
+            QMessageBox.critical(self.win, "Export Error", str(e))
+
+    def export_today_columnar(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self.win, "Save today as columns", "today_results.npz",
+            "NumPy archive (*.npz);;Parquet (*.parquet)"
+        )
+        if not path:
+            return
+        from crp_desktop.columnar import export_columnar
+        today = date.today().strftime("%Y-%m-%d")
+        try:
+            count = export_columnar(self.conn, path, start=today, end=today)
+            QMessageBox.information(self.win, "Export", f"Saved {count} rows to {path}")
+        except ImportError:
+            QMessageBox.critical(self.win, "Export Error", "Parquet export needs pyarrow; save as .npz instead.")
         except Exception as e:
             QMessageBox.critical(self.win, "Export Error", str(e))
 
@@ -164,44 +289,77 @@ class MainWindow(QWidget):
         form.addWidget(QLabel("Instrument"))
         form.addWidget(self.instrument_filter)
         search = QPushButton("Search")
-        search.clicked.connect(self.search_results)
+        search.clicked.connect(lambda: self.search_results())
         form.addWidget(search)
         v.addLayout(form)
         self.table_results = QTableWidget(0, 10)
         self.table_results.setHorizontalHeaderLabels(["ID", "DateTime", "Patient", "Instrument", "WBC", "RBC", "HGB", "PLT", "CRP", "Raw"])
         self.table_results.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         v.addWidget(self.table_results)
+        pager = QHBoxLayout()
+        self.btn_prev_page = QPushButton("< Newer")
+        self.btn_prev_page.clicked.connect(lambda: self.show_results_page("prev"))
+        self.btn_next_page = QPushButton("Older >")
+        self.btn_next_page.clicked.connect(lambda: self.show_results_page("next"))
+        self.lbl_page = QLabel("")
+        self.cmb_page_size = QComboBox()
+        for n in PAGE_SIZES:
+            self.cmb_page_size.addItem(str(n))
+        self.cmb_page_size.setCurrentText(str(PAGE_SIZE_DEFAULT))
+        self.cmb_page_size.currentTextChanged.connect(lambda _: self.show_results_page())
+        pager.addWidget(self.btn_prev_page)
+        pager.addWidget(self.lbl_page)
+        pager.addWidget(self.btn_next_page)
+        pager.addStretch(1)
+        pager.addWidget(QLabel("Rows per page"))
+        pager.addWidget(self.cmb_page_size)
+        v.addLayout(pager)
+        self.results_filters = {}
+        self.results_page = None
+        self.results_page_no = 1
         w.setLayout(v)
         return w
 
+    def open_results_tab(self):
+        w = self.make_results_tab()
+        # let the tab paint before running the (potentially large) first query
+        QTimer.singleShot(0, lambda: self.search_results(load_all=True))
+        return w
+
     def search_results(self , load_all=False):
-        s = self.start_date.date().toString("yyyy-MM-dd")
-        e = self.end_date.date().toString("yyyy-MM-dd")
-        pid = self.patient_filter.text().strip()
-        inst = self.instrument_filter.text().strip()
-        query = "SELECT * FROM crp_results WHERE 1=1"
-        params = []
+        self.results_filters = {}
         if not load_all:  # Only filter when Search button is pressed
-            if s:
-                query += " AND date(COALESCE(measure_datetime, created_at)) >= ?"
-                params.append(s)
-            if e:
-                query += " AND date(COALESCE(measure_datetime, created_at)) <= ?"
-                params.append(e)
-            if pid:
-                query += " AND patient_id LIKE ?"
-                params.append(f"%{pid}%")
-            if inst:
-                query += " AND instrument_no LIKE ?"
-                params.append(f"%{inst}%")
-
-
-        query += " ORDER BY COALESCE(measure_datetime, created_at) DESC"
-        cur = self.conn.cursor()
-        cur.execute(query, params)
-        rows = cur.fetchall()
+            self.results_filters = {
+                "start": self.start_date.date().toString("yyyy-MM-dd"),
+                "end": self.end_date.date().toString("yyyy-MM-dd"),
+                "patient": self.patient_filter.text().strip(),
+                "instrument": self.instrument_filter.text().strip(),
+            }
+        self.show_results_page()
+
+    def show_results_page(self, direction: str = None):
+        """Show the first page (direction=None) or step to the next/prev page of the current search."""
+        cursor = None
+        if direction and self.results_page:
+            cursor = self.results_page.next_cursor if direction == "next" else self.results_page.prev_cursor
+            if not cursor:
+                return
+        page = query_results(
+            self.conn, cursor=cursor, direction=direction or "next",
+            limit=int(self.cmb_page_size.currentText()), **self.results_filters
+        )
+        if direction == "next":
+            self.results_page_no += 1
+        elif direction == "prev":
+            self.results_page_no -= 1
+        else:
+            self.results_page_no = 1
+        self.results_page = page
+        self.btn_prev_page.setEnabled(page.prev_cursor is not None)
+        self.btn_next_page.setEnabled(page.next_cursor is not None)
+        self.lbl_page.setText(f"Page {self.results_page_no}")
         self.table_results.setRowCount(0)
-        for r in rows:
+        for r in page.rows:
             rowpos = self.table_results.rowCount()
             self.table_results.insertRow(rowpos)
             dt = r["measure_datetime"] or r["created_at"]
@@ -224,17 +382,40 @@ class MainWindow(QWidget):
         self.input_clinic = QLineEdit()
         self.input_report_title = QLineEdit()
         self.input_footer = QLineEdit()
-        s = get_settings(self.conn)
-        self.input_clinic.setText(s.get("clinic_name", ""))
-        self.input_report_title.setText(s.get("report_title", ""))
-        self.input_footer.setText(s.get("footer_text", ""))
+        s = self.settings
+        self.input_clinic.setText(s.get_str("clinic_name"))
+        self.input_report_title.setText(s.get_str("report_title"))
+        self.input_footer.setText(s.get_str("footer_text"))
+        self.input_backup_dir = QLineEdit()
+        self.input_backup_dir.setPlaceholderText("Leave empty to disable scheduled backups")
+        self.input_backup_dir.setText(s.get_str("backup_dir"))
+        self.input_backup_interval = QSpinBox()
+        self.input_backup_interval.setRange(1, 7 * 24 * 60)
+        self.input_backup_interval.setSuffix(" min")
+        self.input_backup_interval.setValue(s.get_int("backup_interval_min", BACKUP_INTERVAL_MIN))
+        self.chk_backup_compress = QCheckBox("Compress backups (gzip)")
+        self.chk_backup_compress.setChecked(s.get_bool("backup_compress"))
+        self.input_lis_host = QLineEdit()
+        self.input_lis_host.setPlaceholderText("Leave empty to disable sending results to the LIS")
+        self.input_lis_host.setText(s.get_str("lis_host"))
+        self.input_lis_port = QSpinBox()
+        self.input_lis_port.setRange(1, 65535)
+        self.input_lis_port.setValue(s.get_int("lis_port", LIS_PORT))
         form.addRow("Clinic name", self.input_clinic)
         form.addRow("Report title", self.input_report_title)
         form.addRow("Footer", self.input_footer)
+        form.addRow("Backup folder", self.input_backup_dir)
+        form.addRow("Backup every", self.input_backup_interval)
+        form.addRow("", self.chk_backup_compress)
+        form.addRow("LIS host (HL7/MLLP)", self.input_lis_host)
+        form.addRow("LIS port", self.input_lis_port)
         v.addLayout(form)
         btn = QPushButton("Save settings")
         btn.clicked.connect(self.save_settings_clicked)
         v.addWidget(btn)
+        backup_btn = QPushButton("Back up now")
+        backup_btn.clicked.connect(self.backup_now_clicked)
+        v.addWidget(backup_btn)
         w.setLayout(v)
         return w
 
@@ -243,10 +424,70 @@ class MainWindow(QWidget):
             "clinic_name": self.input_clinic.text().strip(),
             "report_title": self.input_report_title.text().strip(),
             "footer_text": self.input_footer.text().strip(),
+            "backup_dir": self.input_backup_dir.text().strip(),
+            "backup_interval_min": self.input_backup_interval.value(),
+            "backup_compress": self.chk_backup_compress.isChecked(),
+            "lis_host": self.input_lis_host.text().strip(),
+            "lis_port": self.input_lis_port.value(),
         }
-        set_settings(data, self.conn)
+        # dependents restart through on_settings_changed
+        self.settings.update(data)
         QMessageBox.information(self.win, "Settings", "Saved settings.")
 
+    def on_settings_changed(self, changed: dict):
+        keys = set(changed)
+        if keys & BACKUP_SETTING_KEYS:
+            self.start_backup_service()
+        if keys & LIS_SETTING_KEYS:
+            self.start_lis_sender()
+        if self.report_service:
+            # only report-related keys change its cache fingerprint
+            self.report_service.set_settings(self.settings.snapshot())
+        if keys & SERIAL_SETTING_KEYS and self.txt_log is not None:
+            self.select_saved_port()
+
+    # --- Scheduled backups
+    def start_backup_service(self):
+        if self.backup_service:
+            # cancels a backup in progress and removes its partial file; the
+            # new service's first backup is an interval away, so the two never overlap
+            self.backup_service.stop()
+            self.backup_service = None
+        s = self.settings
+        backup_dir = s.get_str("backup_dir")
+        if not backup_dir:
+            return
+        interval_min = s.get_int("backup_interval_min", BACKUP_INTERVAL_MIN)
+        report = signals_mod.signals.status.emit if signals_mod.signals else None
+        self.backup_service = BackupService(
+            backup_dir, interval_min * 60,
+            compress=s.get_bool("backup_compress"),
+            keep=BACKUP_KEEP,
+            report=report,
+        )
+        self.backup_service.start()
+
+    def backup_now_clicked(self):
+        if not self.backup_service:
+            QMessageBox.warning(self.win, "Backup", "Set and save a backup folder first.")
+            return
+        self.backup_service.trigger()
+        self.on_status("Backup started...")
+
+    # --- LIS export
+    def start_lis_sender(self):
+        if self.lis_sender:
+            self.lis_sender.stop()
+            self.lis_sender = None
+        host = self.settings.get_str("lis_host")
+        if not host:
+            return
+        port = self.settings.get_int("lis_port", LIS_PORT)
+        from crp_desktop.lis_export import LisSender
+        report = signals_mod.signals.status.emit if signals_mod.signals else None
+        self.lis_sender = LisSender(host, port, report=report)
+        self.lis_sender.start()
+
     # --- Serial Monitor tab
     def make_serial_tab(self):
         w = QWidget()
@@ -257,8 +498,13 @@ class MainWindow(QWidget):
         for b in BAUD_RATES:
             self.cmb_baud.addItem(str(b))
         self.cmb_baud.setCurrentIndex(0)
+        self.port_infos = {}
+        self.cmb_ports.currentTextChanged.connect(self.on_port_selected)
         self.btn_refresh = QPushButton("Refresh ports")
         self.btn_refresh.clicked.connect(self.refresh_ports)
+        self.btn_detect = QPushButton("Auto-detect")
+        self.btn_detect.setToolTip("Listen on every port at each baud rate; run a sample on the analyzer meanwhile")
+        self.btn_detect.clicked.connect(self.auto_detect_clicked)
         self.btn_start = QPushButton("Start listener")
         self.btn_start.clicked.connect(self.toggle_listener)
         h.addWidget(QLabel("Port:"))
@@ -266,25 +512,156 @@ class MainWindow(QWidget):
         h.addWidget(QLabel("Baud:"))
         h.addWidget(self.cmb_baud)
         h.addWidget(self.btn_refresh)
+        h.addWidget(self.btn_detect)
         h.addWidget(self.btn_start)
         v.addLayout(h)
         self.lbl_status = QLabel("Status: idle")
         v.addWidget(self.lbl_status)
-        self.txt_log = QTextEdit()
+        self.txt_log = QPlainTextEdit()
         self.txt_log.setReadOnly(True)
+        self.txt_log.setMaximumBlockCount(LOG_MAX_LINES)
         v.addWidget(self.txt_log)
+        self.chk_raw = QCheckBox("Show raw bytes (hex / ASCII)")
+        self.chk_raw.toggled.connect(self.toggle_raw_view)
+        v.addWidget(self.chk_raw)
+        self.txt_raw = QPlainTextEdit()
+        self.txt_raw.setReadOnly(True)
+        self.txt_raw.setMaximumBlockCount(RAW_VIEW_MAX_LINES)
+        self.txt_raw.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.txt_raw.setStyleSheet("font-family: Consolas, 'Courier New', monospace;")
+        self.txt_raw.setVisible(False)
+        self.raw_offset = 0
+        v.addWidget(self.txt_raw)
+        self.log_timer = QTimer(w)
+        self.log_timer.setInterval(LOG_FLUSH_MS)
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start()
+        self.flush_log()
         self.refresh_ports()
         w.setLayout(v)
         return w
+
+    def flush_log(self):
+        if len(self.log_buffer):
+            lines, dropped = self.log_buffer.drain(LOG_MAX_LINES_PER_FLUSH)
+            if dropped:
+                lines.insert(0, f"... {dropped} messages skipped ...")
+            self.txt_log.appendPlainText("\n".join(lines))
+        if self.last_status is not None:
+            self.lbl_status.setText(self.last_status)
+            self.last_status = None
+        if raw_tap.enabled:
+            data, dropped = raw_tap.drain()
+            if dropped:
+                self.txt_raw.appendPlainText(f"... {dropped} bytes skipped ...")
+                self.raw_offset += dropped
+            if data:
+                self.txt_raw.appendPlainText("\n".join(format_hexdump(data, self.raw_offset)))
+                self.raw_offset += len(data)
+
+    def toggle_raw_view(self, enabled: bool):
+        self.txt_raw.setVisible(enabled)
+        raw_tap.drain()
+        raw_tap.enabled = enabled
     
 # COMPORTS
     def refresh_ports(self):
+        # enumerating ports can take seconds on some drivers: list them off the UI thread
+        self.btn_refresh.setEnabled(False)
+        threading.Thread(target=self.list_ports_worker, daemon=True).start()
+
+    def list_ports_worker(self):
+        from crp_desktop.port_probe import list_ports
+        try:
+            ports = list_ports()
+        except Exception as e:
+            signals_mod.signals.status.emit("Serial: could not list ports: " + str(e))
+            ports = []
+        signals_mod.signals.ports_listed.emit(ports)
+
+    def on_ports_listed(self, ports):
+        self.btn_refresh.setEnabled(True)
+        self.port_infos = {p.device: p for p in ports}
+        self.cmb_ports.blockSignals(True)
         self.cmb_ports.clear()
-        ports = serial.tools.list_ports.comports()
         for p in ports:
             self.cmb_ports.addItem(p.device)
         if self.cmb_ports.count() == 0:
             self.cmb_ports.addItem("No ports found")
+        self.cmb_ports.blockSignals(False)
+        self.select_saved_port()
+
+    def on_port_selected(self, device: str):
+        """Use the baud rate detected earlier for this device, if any."""
+        from crp_desktop.port_probe import cache_key
+        info = self.port_infos.get(device)
+        baud = self.settings.get_int(cache_key(info.key)) if info else 0
+        i = self.cmb_baud.findText(str(baud)) if baud else -1
+        if i >= 0:
+            self.cmb_baud.setCurrentIndex(i)
+
+    def auto_detect_clicked(self):
+        if self.listener_thread and self.listener_thread.is_alive():
+            QMessageBox.warning(self.win, "Auto-detect", "Stop the listener first.")
+            return
+        if not self.port_infos:
+            QMessageBox.warning(self.win, "Auto-detect", "No serial ports found.")
+            return
+        from crp_desktop.port_probe import cache_key
+        preferred = {}
+        for device, info in self.port_infos.items():
+            baud = self.settings.get_int(cache_key(info.key))
+            if baud:
+                preferred[device] = baud
+        self.btn_detect.setEnabled(False)
+        self.btn_start.setEnabled(False)
+        self.lbl_status.setText(f"Probing {len(self.port_infos)} port(s)... send a result from the analyzer now")
+        threading.Thread(
+            target=self.probe_worker, args=(list(self.port_infos), preferred), daemon=True
+        ).start()
+
+    def probe_worker(self, ports: list, preferred: dict):
+        from crp_desktop.port_probe import discover
+        try:
+            results = discover(ports, BAUD_RATES, preferred=preferred)
+        except Exception as e:
+            signals_mod.signals.status.emit("Serial: auto-detect failed: " + str(e))
+            results = []
+        signals_mod.signals.probe_finished.emit(results)
+
+    def on_probe_finished(self, results):
+        from crp_desktop.port_probe import cache_key
+        self.btn_detect.setEnabled(True)
+        self.btn_start.setEnabled(True)
+        for r in results:
+            self.append_log(f"Probe {r.port} @ {r.baud or '-'}: score {r.score:.2f} ({r.nbytes} bytes)")
+        if not results or results[0].score < PROBE_MIN_SCORE:
+            self.lbl_status.setText("Status: idle")
+            QMessageBox.warning(
+                self.win, "Auto-detect",
+                "No analyzer output detected. Make sure the analyzer sends a result while probing.",
+            )
+            return
+        best = results[0]
+        info = self.port_infos.get(best.port)
+        data = {"serial_port": best.port, "serial_baud": best.baud}
+        if info:
+            data[cache_key(info.key)] = best.baud
+        self.settings.update(data)
+        self.select_saved_port()
+        self.lbl_status.setText(f"Detected analyzer on {best.port} @ {best.baud}")
+
+    def select_saved_port(self):
+        """Preselect the port/baud the listener last ran with."""
+        if self.listener_thread and self.listener_thread.is_alive():
+            return
+        port = self.settings.get_str("serial_port")
+        i = self.cmb_ports.findText(port) if port else -1
+        if i >= 0:
+            self.cmb_ports.setCurrentIndex(i)
+        i = self.cmb_baud.findText(str(self.settings.get_int("serial_baud", BAUD_RATES[0])))
+        if i >= 0:
+            self.cmb_baud.setCurrentIndex(i)
 
     def toggle_listener(self):
         if self.listener_thread and self.listener_thread.is_alive():
@@ -300,6 +677,8 @@ class MainWindow(QWidget):
                 baud = int(self.cmb_baud.currentText())
             except Exception:
                 baud = int(self.cmb_baud.itemText(0))
+            from crp_desktop.serial_reader import read_serial_and_store_results
+            self.settings.update({"serial_port": port_name, "serial_baud": baud})
             self.stop_event.clear()
             self.listener_thread = threading.Thread(
                 target=read_serial_and_store_results,
@@ -309,25 +688,118 @@ class MainWindow(QWidget):
             self.listener_thread.start()
             self.btn_start.setText("Stop listener")
             self.lbl_status.setText(f"Listener running on {port_name}@{baud}")
-            self.txt_log.append(f"Started listener on {port_name}@{baud}")
+            self.append_log(f"Started listener on {port_name}@{baud}")
 
     def on_new_result(self, parsed):
-        self.load_today_results()
-        self.search_results()
-        self.txt_log.append("New result: " + str(parsed.get("ID", "<no id>")))
+        with metrics.timer("ui.on_new_result"):
+            # written by this process: pick it up now rather than on the next tick
+            self.poll_changes()
+        self.append_log("New result: " + str(parsed.get("ID", "<no id>")))
+        if self.lis_sender:
+            self.lis_sender.notify()
+
+    def append_log(self, msg: str):
+        self.log_buffer.push(msg)
 
     def on_status(self, msg):
-        self.txt_log.append(msg)
-        self.lbl_status.setText(msg)
+        self.append_log(msg)
+        if self.lbl_status is None:
+            return
+        self.last_status = msg
         if "stopped" in msg.lower() or "error" in msg.lower():
             self.btn_start.setText("Start listener")
             self.btn_start.setEnabled(True)
 
+    # --- Diagnostics tab
+    def make_diagnostics_tab(self):
+        w = QWidget()
+        v = QVBoxLayout()
+        h = QHBoxLayout()
+        self.chk_metrics = QCheckBox("Enable instrumentation")
+        self.chk_metrics.setChecked(metrics.enabled)
+        self.chk_metrics.toggled.connect(self.toggle_metrics)
+        h.addWidget(self.chk_metrics)
+        self.btn_metrics_dump = QPushButton("Dump to JSON lines...")
+        self.btn_metrics_dump.clicked.connect(self.toggle_metrics_dump)
+        h.addWidget(self.btn_metrics_dump)
+        reset = QPushButton("Reset")
+        reset.clicked.connect(self.reset_metrics)
+        h.addWidget(reset)
+        v.addLayout(h)
+        self.table_metrics = QTableWidget(0, 8)
+        self.table_metrics.setHorizontalHeaderLabels([
+            "Metric", "Count", "Last ms", "Mean ms", "p50 ms", "p95 ms", "p99 ms", "Max ms"
+        ])
+        self.table_metrics.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        v.addWidget(self.table_metrics)
+        w.setLayout(v)
+        self.metrics_timer = QTimer(w)
+        self.metrics_timer.setInterval(1000)
+        self.metrics_timer.timeout.connect(self.refresh_metrics)
+        self.metrics_timer.start()
+        return w
+
+    def refresh_metrics(self):
+        # only repaint while the Diagnostics tab is on screen
+        if not self.table_metrics.isVisible():
+            return
+        snap = metrics.snapshot()
+        self.table_metrics.setRowCount(len(snap))
+        cols = ["count", "last_ms", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+        for rowpos, m in enumerate(snap):
+            self.table_metrics.setItem(rowpos, 0, QTableWidgetItem(m["name"]))
+            for c, key in enumerate(cols, start=1):
+                val = m.get(key)
+                if val is None:
+                    text = ""
+                elif key == "count":
+                    text = str(val)
+                else:
+                    text = f"{val:.3f}"
+                self.table_metrics.setItem(rowpos, c, QTableWidgetItem(text))
+
+    def toggle_metrics(self, enabled: bool):
+        metrics.enabled = enabled
+
+    def toggle_metrics_dump(self):
+        if metrics.dump_file:
+            metrics.close_dump()
+            self.btn_metrics_dump.setText("Dump to JSON lines...")
+            return
+        path, _ = QFileDialog.getSaveFileName(self.win, "Metrics dump", "crp_metrics.jsonl", "JSON lines (*.jsonl)")
+        if not path:
+            return
+        metrics.open_dump(path)
+        self.btn_metrics_dump.setText("Stop dump")
+
+    def reset_metrics(self):
+        metrics.reset()
+        self.refresh_metrics()
+
     def show(self):
+        # fill the tables once the window has been painted (see eventFilter):
+        # a plain singleShot(0) would usually run before the first paint
+        self.win.installEventFilter(self)
         self.win.show()
 
+    def eventFilter(self, obj, event):
+        if obj is self.win and event.type() == QEvent.Paint:
+            self.win.removeEventFilter(self)
+            QTimer.singleShot(0, self.load_initial_data)
+        return False
+
     def close(self):
         self.stop_event.set()
+        if self.change_feed:
+            self.change_timer.stop()
+        if self.backup_service:
+            self.backup_service.stop()
+        if self.lis_sender:
+            self.lis_sender.stop()
+        if self.report_service:
+            self.report_service.stop()
+            self.report_service.close()
+        metrics.close_dump()
         if self.listener_thread and self.listener_thread.is_alive():
             self.listener_thread.join(timeout=1.0)
         try:
@@ -353,13 +825,16 @@ class MainWindow(QWidget):
             self.today_detail.clear()
             return
 
-        cur = self.conn.cursor()
-        cur.execute("SELECT * FROM crp_results WHERE id = ?", (row_id,))
-        r = cur.fetchone()
-        if not r:
+        entry = self.result_cache.get(self.conn, row_id)
+        if entry is None:
             self.today_detail.clear()
             return
+        if entry.detail is None:
+            self.result_cache.set_detail(row_id, self.render_detail(entry, sel))
+        self.today_detail.setPlainText(entry.detail)
 
+    def render_detail(self, entry, sel: int) -> str:
+        r = entry.row
         # Build a readable detail block
         detail_lines = []
         detail_lines.append(f"Patient ID: {r['patient_id'] or ''}")
@@ -368,21 +843,21 @@ class MainWindow(QWidget):
         detail_lines.append(f"Date/Time: {dt_full}")
         detail_lines.append(f"Instrument: {r['instrument_no'] or r['instrument_name'] or ''}")
         detail_lines.append("")
+        flags = parse_flags(r["flags"])
         for key in ["wbc", "rbc", "hgb", "hct", "mcv", "mch", "mchc", "rdw", "plt", "mpv", "pct", "pdw", "crp"]:
-            detail_lines.append(f"{key.upper()}: {r[key] or ''}")
+            flag = f"  [{flags[key]}]" if key in flags else ""
+            detail_lines.append(f"{key.upper()}: {r[key] or ''}{flag}")
 
         # show raw payload (pretty json) if present
-        raw = r["raw_payload"]
-        if raw:
-            try:
-                parsed_raw = json.loads(raw)
-                detail_lines.append("\nRaw payload:")
-                detail_lines.append(json.dumps(parsed_raw, indent=2, ensure_ascii=False))
-            except Exception:
-                detail_lines.append("\nRaw payload:")
-                detail_lines.append(str(raw))
+        payload = entry.payload
+        if payload:
+            detail_lines.append("\nRaw payload:")
+            if isinstance(payload, dict):
+                detail_lines.append(json.dumps(payload, indent=2, ensure_ascii=False))
+            else:
+                detail_lines.append(str(payload))
 
-        self.today_detail.setPlainText("\n".join(detail_lines))
+        return "\n".join(detail_lines)
 
 
     def export_selected_report(self, from_today: bool = False):
@@ -408,35 +883,35 @@ class MainWindow(QWidget):
             QMessageBox.warning(self.win, "Select row", "Could not read the selected row id.")
             return
     
-        cur = self.conn.cursor()
-        cur.execute("SELECT * FROM crp_results WHERE id = ?", (row_id,))
-        r = cur.fetchone()
-        if not r:
+        entry = self.result_cache.get(self.conn, row_id)
+        if entry is None:
             QMessageBox.critical(self.win, "Error", "Could not find result in database.")
             return
-    
-        parsed = dict(r)  # row access; parsed info in raw_payload too
-        try:
-            raw = parsed.get("raw_payload")
-            if raw:
-                try:
-                    parsed_from_raw = json.loads(raw)
-                    # prefer parsed_from_raw for display (contains parsed field names)
-                    parsed.update(parsed_from_raw)
-                except Exception:
-                    pass
-        except Exception:
-            pass
-        
-        settings = get_settings(self.conn)
-        # optional: pass path of logo from settings: settings.get("logo_path")
-        html = generate_report_html(parsed, settings, logo_path=settings.get("logo_path"))
+
         path, _ = QFileDialog.getSaveFileName(self.win, "Save PDF", "report.pdf", "PDF Files (*.pdf)")
         if not path:
             return
+        if self.report_service is None:
+            self.start_report_service()
         try:
-            save_html_to_pdf(html, path)
-            QMessageBox.information(self.win, "Saved", f"Saved report to {path}")
+            # a cached PDF is copied right away; otherwise on_report_ready reports back
+            if self.report_service.export(row_id, path):
+                QMessageBox.information(self.win, "Saved", f"Saved report to {path}")
+            else:
+                self.on_status("Rendering report...")
         except Exception as e:
             QMessageBox.critical(self.win, "Error", str(e))
+
+    # --- Report rendering (worker thread + PDF cache)
+    def start_report_service(self):
+        from crp_desktop.report_service import ReportRenderService
+        done = signals_mod.signals.report_ready.emit if signals_mod.signals else None
+        self.report_service = ReportRenderService(self.settings.snapshot(), done=done)
+        self.report_service.start()
+
+    def on_report_ready(self, info):
+        if info["error"]:
+            QMessageBox.critical(self.win, "Error", info["error"])
+        else:
+            QMessageBox.information(self.win, "Saved", f"Saved report to {info['path']}")
     
\ No newline at end of file
@@ -0,0 +1,399 @@
+"""
+Outbound export of results to a LIS as HL7 v2 ORU^R01 messages over MLLP.
+
+Committed results are picked up by id (a high-water mark, like the API's
+change stream), serialized once and queued in a persistent outbox. The
+outbox is a separate SQLite file next to the results database, so the
+sender never takes the results database's write lock: the serial listener
+and DB writer are never blocked by it. Messages are sent in pipelined
+batches over pooled TCP connections; anything not acknowledged with AA/CA
+is retried with exponential back-off. A batch is claimed ('sending') before
+it goes out, so a second sender on the same outbox (e.g. one restarted
+while the old one still waits for ACKs) never sends it again.
+
+    python -m crp_desktop.lis_export --db crp_results.db --lis 10.0.0.5:2575
+"""
+import os
+import sys
+import time
+import socket
+import queue
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from crp_desktop.db import get_read_db, results_after, max_result_id
+from crp_desktop.record import ANALYTE_SLOTS, SLOT_TO_LABEL
+from crp_desktop.reference import reference_ranges, parse_flags, parse_value
+from crp_desktop.resources import (
+    DB_PATH, LIS_PORT, LIS_TIMEOUT, LIS_POOL_SIZE, OUTBOX_POLL_INTERVAL, OUTBOX_BATCH,
+    OUTBOX_RETRY_BASE, OUTBOX_RETRY_MAX, OUTBOX_MAX_ATTEMPTS, OUTBOX_LEASE, HL7_SENDING_APP,
+)
+
+MLLP_START = b"\x0b"
+MLLP_END = b"\x1c\x0d"
+ACCEPTED = ("AA", "CA")
+
+# --- HL7 serialization
+_HL7_ESCAPES = [("\\", "\\E\\"), ("|", "\\F\\"), ("^", "\\S\\"), ("~", "\\R\\"), ("&", "\\T\\")]
+
+def hl7_escape(text) -> str:
+    text = "" if text is None else str(text)
+    for ch, esc in _HL7_ESCAPES:
+        text = text.replace(ch, esc)
+    return text.replace("\r", " ").replace("\n", " ")
+
+def hl7_timestamp(value) -> str:
+    """'2024-02-01 10:05:00' -> '20240201100500'; '' when it is not an ISO timestamp."""
+    if not value:
+        return ""
+    try:
+        return datetime.fromisoformat(str(value)).strftime("%Y%m%d%H%M%S")
+    except ValueError:
+        return ""
+
+def build_oru(row, control_id: str, sending_app: str = HL7_SENDING_APP, now: datetime = None,
+              ranges=reference_ranges) -> str:
+    """ORU^R01 (v2.5.1) for one crp_results row: one OBX per numeric analyte."""
+    now = now or datetime.now()
+    obs_time = hl7_timestamp(row["measure_datetime"] or row["created_at"])
+    flags = parse_flags(row["flags"])
+    segments = [
+        f"MSH|^~\\&|{hl7_escape(sending_app)}|{hl7_escape(row['instrument_no'])}|||"
+        f"{now:%Y%m%d%H%M%S}||ORU^R01^ORU_R01|{control_id}|P|2.5.1",
+        f"PID|1||{hl7_escape(row['patient_id'])}",
+        f"OBR|1|{hl7_escape(row['sid'])}|{row['id']}|CBC^CBC + CRP|||{obs_time}",
+    ]
+    n = 0
+    for slot in ANALYTE_SLOTS:
+        raw = row[slot]
+        if parse_value(raw) is None:
+            continue
+        n += 1
+        label = hl7_escape(SLOT_TO_LABEL[slot])
+        value = str(raw).split()[0]
+        segments.append(
+            f"OBX|{n}|NM|{label}^{label}||{hl7_escape(value)}|{hl7_escape(ranges.unit(slot))}|"
+            f"{hl7_escape(ranges.describe(slot))}|{flags.get(slot, '')}|||F|||{obs_time}"
+        )
+    return "\r".join(segments) + "\r"
+
+def mllp_frame(message: str) -> bytes:
+    return MLLP_START + message.encode("utf-8") + MLLP_END
+
+def parse_ack(message: str) -> tuple:
+    """(acknowledgment code, control id) from an ACK's MSA segment."""
+    for seg in message.replace("\n", "\r").split("\r"):
+        if seg.startswith("MSA|"):
+            fields = seg.split("|")
+            return fields[1], fields[2] if len(fields) > 2 else ""
+    raise ValueError("ACK without MSA segment")
+
+# --- transport
+class MllpClient:
+    def __init__(self, host: str, port: int, timeout: float = LIS_TIMEOUT):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.buffer = b""
+
+    def send(self, data: bytes):
+        self.sock.sendall(data)
+
+    def read_message(self) -> str:
+        while True:
+            end = self.buffer.find(MLLP_END)
+            if end >= 0:
+                start = self.buffer.find(MLLP_START)
+                frame = self.buffer[start + 1 if 0 <= start < end else 0:end]
+                self.buffer = self.buffer[end + len(MLLP_END):]
+                return frame.decode("utf-8", errors="replace")
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("LIS closed the connection")
+            self.buffer += chunk
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+class MllpPool:
+    """
+    Open connections to one LIS endpoint, reused across batches.
+    A connection that failed is discard()ed instead of released.
+    """
+    def __init__(self, host: str, port: int, size: int = LIS_POOL_SIZE, timeout: float = LIS_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> MllpClient:
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                try:
+                    return MllpClient(self.host, self.port, self.timeout)
+                except Exception:
+                    self.created -= 1
+                    raise
+        return self.idle.get(timeout=self.timeout)
+
+    def release(self, client: MllpClient):
+        self.idle.put(client)
+
+    def discard(self, client: MllpClient):
+        client.close()
+        with self.lock:
+            self.created -= 1
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self.lock:
+            self.created = 0
+
+# --- persistent outbox
+def outbox_path(db_path: str = DB_PATH) -> str:
+    root, _ = os.path.splitext(db_path)
+    return root + "_outbox.db"
+
+def retry_delay(attempts: int) -> float:
+    return min(OUTBOX_RETRY_BASE * 2 ** max(attempts - 1, 0), OUTBOX_RETRY_MAX)
+
+class Outbox:
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                result_id INTEGER UNIQUE,
+                control_id TEXT,
+                message TEXT,
+                status TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at REAL DEFAULT 0,
+                last_error TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                sent_at TEXT
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at, id)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS outbox_state (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+    def high_water(self):
+        row = self.conn.execute("SELECT value FROM outbox_state WHERE key = 'last_result_id'").fetchone()
+        return int(row[0]) if row else None
+
+    def enqueue(self, items: list, last_result_id: int):
+        """items: (result_id, control_id, message); moves the high-water mark in the same transaction."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO outbox (result_id, control_id, message) VALUES (?,?,?)", items
+            )
+            self.conn.execute(
+                "INSERT INTO outbox_state (key, value) VALUES ('last_result_id', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (str(last_result_id),),
+            )
+
+    def due(self, limit: int, now: float = None) -> list:
+        """Messages ready to send: pending, or claimed by a sender whose lease ran out."""
+        now = time.time() if now is None else now
+        return self.conn.execute(
+            "SELECT id, control_id, message, attempts FROM outbox "
+            "WHERE status IN ('pending', 'sending') AND next_attempt_at <= ? "
+            "ORDER BY next_attempt_at, id LIMIT ?",
+            (now, limit),
+        ).fetchall()
+
+    def claim(self, limit: int, now: float = None, lease: float = OUTBOX_LEASE) -> list:
+        """due() rows, marked 'sending' in the same write transaction so no other sender gets them."""
+        now = time.time() if now is None else now
+        with self.conn:
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN IMMEDIATE")
+            items = self.due(limit, now)
+            self.conn.executemany(
+                "UPDATE outbox SET status='sending', next_attempt_at=? WHERE id=?",
+                [(now + lease, i["id"]) for i in items],
+            )
+        return items
+
+    def mark_sent(self, ids: list):
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE outbox SET status='sent', attempts=attempts+1, last_error=NULL, "
+                "sent_at=CURRENT_TIMESTAMP WHERE id=?",
+                [(i,) for i in ids],
+            )
+
+    def mark_retry(self, items: list, error: str, now: float = None):
+        """items: outbox rows that failed; they go back to pending with a back-off, or to 'failed'."""
+        now = time.time() if now is None else now
+        updates = []
+        for item in items:
+            attempts = item["attempts"] + 1
+            status = "failed" if OUTBOX_MAX_ATTEMPTS and attempts >= OUTBOX_MAX_ATTEMPTS else "pending"
+            updates.append((status, attempts, now + retry_delay(attempts), error, item["id"]))
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE outbox SET status=?, attempts=?, next_attempt_at=?, last_error=? WHERE id=?", updates
+            )
+
+    def counts(self) -> dict:
+        return {r[0]: r[1] for r in self.conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")}
+
+    def close(self):
+        self.conn.close()
+
+class LisSender(threading.Thread):
+    """
+    Background thread: queue new results into the outbox, send what is due.
+    notify() (e.g. on new_result) wakes it early; otherwise it polls.
+    Reports sends and errors through `report` (e.g. signals.status.emit).
+    """
+    def __init__(self, host: str, port: int = LIS_PORT, db_path: str = DB_PATH,
+                 outbox_db: str = None, batch: int = OUTBOX_BATCH,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL, start_id: int = None, report=None):
+        super().__init__(daemon=True, name="lis-sender")
+        self.db_path = db_path
+        self.outbox = Outbox(outbox_db or outbox_path(db_path))
+        self.pool = MllpPool(host, port)
+        self.batch = batch
+        self.poll_interval = poll_interval
+        self.start_id = start_id
+        self.report = report
+        self.read_conn = None
+        self.stop_event = threading.Event()
+        self.wake = threading.Event()
+        self.last_error = None
+
+    def enqueue_new(self) -> int:
+        """Serialize results committed since the high-water mark; returns how many were queued."""
+        if self.read_conn is None:
+            self.read_conn = get_read_db(self.db_path)
+        after = self.outbox.high_water()
+        if after is None:
+            # first run: start from now (or start_id) rather than sending the whole history
+            after = self.start_id if self.start_id is not None else max_result_id(self.read_conn)
+            self.outbox.enqueue([], after)
+        queued = 0
+        while True:
+            rows = results_after(self.read_conn, after, self.batch)
+            if not rows:
+                return queued
+            items = [(r["id"], f"CRP{r['id']}", build_oru(r, f"CRP{r['id']}")) for r in rows]
+            after = rows[-1]["id"]
+            self.outbox.enqueue(items, after)
+            queued += len(items)
+
+    def send_batch(self, items: list) -> tuple:
+        """Send one pipelined batch; returns ({control_id: ack code}, error message or None)."""
+        acks = {}
+        try:
+            client = self.pool.acquire()
+        except (OSError, queue.Empty) as e:
+            return acks, f"cannot connect to {self.pool.host}:{self.pool.port}: {e}"
+        try:
+            client.send(b"".join(mllp_frame(item["message"]) for item in items))
+            for _ in items:
+                code, control_id = parse_ack(client.read_message())
+                acks[control_id] = code
+        except (OSError, ValueError) as e:
+            self.pool.discard(client)
+            return acks, str(e) or e.__class__.__name__
+        self.pool.release(client)
+        return acks, None
+
+    def send_due(self) -> int:
+        """Send one batch of due messages; returns how many were accepted."""
+        items = self.outbox.claim(self.batch)
+        if not items:
+            return 0
+        acks, error = self.send_batch(items)
+        sent = [i["id"] for i in items if acks.get(i["control_id"]) in ACCEPTED]
+        rejected = [i for i in items if i["control_id"] in acks and acks[i["control_id"]] not in ACCEPTED]
+        unanswered = [i for i in items if i["control_id"] not in acks]
+        if sent:
+            self.outbox.mark_sent(sent)
+        if rejected:
+            self.outbox.mark_retry(rejected, "rejected by LIS: " + acks[rejected[0]["control_id"]])
+        if unanswered:
+            self.outbox.mark_retry(unanswered, error or "no ACK")
+        if error and error != self.last_error:
+            self._report(f"LIS send failed: {error} (will retry)")
+        elif sent:
+            self._report(f"LIS: sent {len(sent)} result(s)")
+        self.last_error = error
+        return len(sent)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            more = False
+            try:
+                self.enqueue_new()
+                more = self.send_due() >= self.batch
+            except Exception as e:
+                self._report(f"LIS export error: {e}")
+            if not more:
+                self.wake.wait(self.poll_interval)
+                self.wake.clear()
+        self.pool.close()
+        self.outbox.close()
+        if self.read_conn is not None:
+            self.read_conn.close()
+
+    def notify(self, *_):
+        self.wake.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+
+    def _report(self, msg: str):
+        if self.report:
+            self.report(msg)
+
+def parse_endpoint(spec: str) -> tuple:
+    """'10.0.0.5:2575' -> ('10.0.0.5', 2575); port defaults to LIS_PORT."""
+    host, sep, port = spec.rpartition(":")
+    if not sep:
+        return spec, LIS_PORT
+    return host, int(port)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Send results to a LIS as HL7 v2 ORU messages over MLLP")
+    ap.add_argument("--lis", required=True, metavar="HOST[:PORT]")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--from-id", type=int, default=None,
+                    help="on first run, send results after this id (default: only new results)")
+    args = ap.parse_args(argv)
+    host, port = parse_endpoint(args.lis)
+    sender = LisSender(host, port, args.db, start_id=args.from_id, report=print)
+    sender.start()
+    try:
+        while sender.is_alive():
+            sender.join(1.0)
+    except KeyboardInterrupt:
+        sender.stop()
+        sender.join()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
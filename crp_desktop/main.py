@@ -1,11 +1,19 @@
-
+import os
 import sys
+import time
+import json
+
+_T0 = time.perf_counter()
+
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QPalette, QColor
+from PySide6.QtCore import QTimer, QObject, QEvent
 
 from crp_desktop.db import init_db
 from crp_desktop.signals import init_signals
-from crp_desktop.gui import MainWindow
+
+# set to a file path to record startup timings and exit after the first paint
+STARTUP_PROBE_ENV = "CRP_STARTUP_PROBE"
 
 def apply_light_theme(app: QApplication) -> None:
     """Force a simple light theme (works reliably across platforms)."""
@@ -20,7 +28,30 @@ def apply_light_theme(app: QApplication) -> None:
     palette.setColor(QPalette.ButtonText, QColor(0, 0, 0))
     app.setPalette(palette)
 
+class _FirstPaintProbe(QObject):
+    """Records first_paint_s at the first widget paint, then writes the marks and quits."""
+    def __init__(self, path: str, marks: dict, app: QApplication):
+        super().__init__()
+        self.path = path
+        self.marks = marks
+        self.app = app
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and "first_paint_s" not in self.marks:
+            self.marks["first_paint_s"] = time.perf_counter() - _T0
+            self.app.removeEventFilter(self)
+            # write after the paint, so the probe's file I/O is not part of the mark
+            QTimer.singleShot(0, self.write)
+        return False
+
+    def write(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.marks, f)
+        self.app.quit()
+
 def run():
+    marks = {"qt_import_s": time.perf_counter() - _T0}
+
     # Ensure DB schema exists before starting the UI
     init_db()
 
@@ -33,9 +64,22 @@ def run():
     # initialize global signals instance (requires QApplication)
     init_signals()
 
+    from crp_desktop.gui import MainWindow
+    marks["gui_import_s"] = time.perf_counter() - _T0
+
+    # the probe watches paint events, so it must be installed before the window is shown.
+    # MainWindow starts its initial data load only after its first paint, so
+    # first_paint_s does not include it.
+    probe = None
+    probe_path = os.environ.get(STARTUP_PROBE_ENV)
+    if probe_path:
+        probe = _FirstPaintProbe(probe_path, marks, app)
+        app.installEventFilter(probe)
+
     # Create and show main window
     mw = MainWindow()
     mw.show()
+    marks["window_shown_s"] = time.perf_counter() - _T0
 
     # Start event loop
     sys.exit(app.exec())
@@ -0,0 +1,155 @@
+"""
+Lightweight timers and counters.
+
+Samples go into a fixed-size ring buffer per metric so p50/p95/p99 always
+reflect recent activity. When disabled, `timer()` returns a shared no-op
+context manager and `incr()` returns immediately.
+
+Enable with CRP_METRICS=1 (or from the Diagnostics tab); set
+CRP_METRICS_DUMP=<path> to also append every sample as a JSON line.
+"""
+import os
+import json
+import math
+import time
+import threading
+from functools import wraps
+from collections import deque
+
+METRICS_ENV = "CRP_METRICS"
+METRICS_DUMP_ENV = "CRP_METRICS_DUMP"
+RING_SIZE = 2048
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ("registry", "name", "t0")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.record(self.name, time.perf_counter() - self.t0)
+        return False
+
+def percentile(sorted_vals: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list (q in 0..100)."""
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(q / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+class Metrics:
+    def __init__(self, enabled: bool = False, ring_size: int = RING_SIZE, dump_path: str = None):
+        self.enabled = enabled
+        self.ring_size = ring_size
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.totals = {}
+        self.counters = {}
+        self.dump_file = None
+        if dump_path:
+            self.open_dump(dump_path)
+
+    def timer(self, name: str):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def timed(self, name: str):
+        """Decorator form of timer(); checks `enabled` on every call."""
+        def deco(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - t0)
+            return wrapper
+        return deco
+
+    def record(self, name: str, seconds: float):
+        with self.lock:
+            ring = self.samples.get(name)
+            if ring is None:
+                ring = self.samples[name] = deque(maxlen=self.ring_size)
+                self.totals[name] = [0, 0.0]
+            ring.append(seconds)
+            tot = self.totals[name]
+            tot[0] += 1
+            tot[1] += seconds
+            if self.dump_file:
+                self.dump_file.write(json.dumps(
+                    {"ts": time.time(), "metric": name, "ms": round(seconds * 1000.0, 4)}
+                ) + "\n")
+
+    def incr(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> list:
+        """One dict per metric: name, count, last_ms, mean_ms, p50_ms, p95_ms, p99_ms, max_ms."""
+        with self.lock:
+            rings = {k: list(v) for k, v in self.samples.items()}
+            totals = {k: tuple(v) for k, v in self.totals.items()}
+            counters = dict(self.counters)
+        out = []
+        for name in sorted(rings):
+            vals = rings[name]
+            ordered = sorted(vals)
+            count, total = totals[name]
+            out.append({
+                "name": name,
+                "count": count,
+                "last_ms": vals[-1] * 1000.0 if vals else 0.0,
+                "mean_ms": total / count * 1000.0 if count else 0.0,
+                "p50_ms": percentile(ordered, 50) * 1000.0,
+                "p95_ms": percentile(ordered, 95) * 1000.0,
+                "p99_ms": percentile(ordered, 99) * 1000.0,
+                "max_ms": ordered[-1] * 1000.0 if ordered else 0.0,
+            })
+        for name in sorted(counters):
+            out.append({"name": name, "count": counters[name]})
+        return out
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.totals.clear()
+            self.counters.clear()
+
+    def open_dump(self, path: str):
+        with self.lock:
+            if self.dump_file:
+                self.dump_file.close()
+            self.dump_file = open(path, "a", encoding="utf-8", buffering=64 * 1024)
+
+    def close_dump(self):
+        with self.lock:
+            if self.dump_file:
+                self.dump_file.close()
+                self.dump_file = None
+
+metrics = Metrics(
+    enabled=os.environ.get(METRICS_ENV) == "1",
+    dump_path=os.environ.get(METRICS_DUMP_ENV),
+)
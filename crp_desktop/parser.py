@@ -1,8 +1,8 @@
 
 import re
 import json
-from collections import OrderedDict
-from crp_desktop.resources import IDENTIFIER_MAP
+from crp_desktop.resources import IDENTIFIER_MAP, MAX_FRAME_BUFFER
+from crp_desktop.record import Result
 
 RE_VALUE_NUM = re.compile(r"([-+]?[0-9]*\.?[0-9]+)")
 RE_TOKEN_LINE = re.compile(r"^\s*([^\s])\s+(.+)$")
@@ -40,7 +40,7 @@ def find_best_id(text: str) -> str:
         return m3.group(1)
     return ""
 
-def extract_header(text: str, out: dict):
+def extract_header(text: str, out):
     m = RE_NO.search(text)
     if m:
         out['NO.'] = m.group(1).strip()
@@ -69,8 +69,8 @@ def extract_header(text: str, out: dict):
         if candidate:
             out['ID'] = candidate
 
-def extract_fields_from_block(block_text: str) -> dict:
-    data = OrderedDict()
+def extract_fields_from_block(block_text: str) -> Result:
+    data = Result()
     cleaned = keep_printables(block_text.replace('\r\n', '\n').replace('\r', '\n'))
     lines = [ln.strip() for ln in cleaned.split('\n') if ln.strip()]
     footer_map = {}
@@ -119,6 +119,90 @@ def extract_fields_from_block(block_text: str) -> dict:
         data['Checksum'] = footer_map['$FD']
     return data
 
+def take_packets(buffer: str):
+    """Split complete packets off the front of buffer; returns (packets, rest)."""
+    packets = []
+    # scan by position and slice once at the end (no re-copying of the tail per packet)
+    pos = 0
+    while True:
+        stx_idx = buffer.find('\x02', pos)
+        if stx_idx != -1:
+            etx_idx = buffer.find('\x03', stx_idx)
+            if etx_idx == -1:
+                # an STX frame is still open: wait for its ETX
+                break
+            packets.append(buffer[stx_idx + 1:etx_idx])
+            pos = etx_idx + 1
+            continue
+        ff_idx = buffer.find('\f', pos)
+        if ff_idx != -1:
+            # printer output: one page per result
+            packets.append(buffer[pos:ff_idx])
+            pos = ff_idx + 1
+            continue
+        if buffer.find('\n$FE', pos) != -1 or buffer.find(' CRP', pos) != -1:
+            last_nl = buffer.rfind('\n', pos)
+            if last_nl > pos:
+                packets.append(buffer[pos:last_nl + 1])
+                pos = last_nl + 1
+                continue
+        break
+    return [p for p in packets if p.strip()], buffer[pos:]
+
+class FrameAssembler:
+    """
+    Incremental framing for any byte source: feed() raw bytes and get back
+    the complete frames; flush() returns whatever is left (e.g. after an
+    idle timeout or at end of input). The buffer never grows past
+    `max_buffer` characters; older data is dropped and counted.
+    """
+    def __init__(self, max_buffer: int = MAX_FRAME_BUFFER, encoding: str = "latin1"):
+        self.max_buffer = max_buffer
+        self.encoding = encoding
+        self.buffer = ""
+        self.dropped = 0
+
+    def feed(self, data: bytes) -> list:
+        self.buffer += data.decode(self.encoding, errors="ignore")
+        frames, self.buffer = take_packets(self.buffer)
+        if len(self.buffer) > self.max_buffer:
+            cut = len(self.buffer) - self.max_buffer
+            self.dropped += cut
+            self.buffer = self.buffer[cut:]
+        return frames
+
+    def flush(self):
+        tail, self.buffer = self.buffer, ""
+        if tail.strip("\x00\x02\x03\r\n\t "):
+            return tail
+        return None
+
+    def pending(self) -> bool:
+        return bool(self.buffer)
+
+def read_chunks(f, size: int = 64 * 1024):
+    """Byte chunks from a binary file object (file, socket.makefile('rb'), sys.stdin.buffer)."""
+    return iter(lambda: f.read(size), b"")
+
+def iter_frames(byte_chunks, max_buffer: int = MAX_FRAME_BUFFER):
+    """Yield complete frames (str) from an iterable of byte chunks."""
+    asm = FrameAssembler(max_buffer)
+    for chunk in byte_chunks:
+        yield from asm.feed(chunk)
+    tail = asm.flush()
+    if tail:
+        yield tail
+
+def iter_results(byte_chunks, max_buffer: int = MAX_FRAME_BUFFER):
+    """
+    Yield a parsed Result per frame from an iterable of byte chunks, e.g.
+
+        with open(path, "rb") as f:
+            save_results(iter_results(read_chunks(f)), conn)
+    """
+    for frame in iter_frames(byte_chunks, max_buffer):
+        yield extract_fields_from_block(frame)
+
 # Optional utility to format a receipt-like string (same logic as single-file)
 def format_receipt(parsed: dict) -> str:
     lines = []
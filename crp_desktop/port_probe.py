@@ -0,0 +1,129 @@
+"""
+Serial port discovery and baud-rate detection.
+
+Each candidate port is opened in its own worker thread and listened to at
+each configured baud rate; the bytes received are scored by how much they
+look like analyzer output (printable text, STX/ETX framing, fields the
+parser recognises). Garbage from a wrong baud rate scores near zero. The
+analyzer has to be sending while probing (run a sample or reprint the last
+result).
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from crp_desktop.parser import FrameAssembler, extract_fields_from_block
+from crp_desktop.record import ROW_SLOTS
+from crp_desktop.resources import BAUD_RATES, PROBE_LISTEN_SECONDS, PROBE_MIN_SCORE, PROBE_WORKERS
+
+ProbeResult = namedtuple("ProbeResult", "port baud score nbytes")
+PortInfo = namedtuple("PortInfo", "device key description")
+
+_TEXT_BYTES = frozenset(range(0x20, 0x7F)) | {0x02, 0x03, 0x09, 0x0A, 0x0C, 0x0D}
+# recognised fields that make a sample count as a full result
+FIELDS_FOR_FULL_SCORE = 4
+
+def printable_fraction(data: bytes) -> float:
+    """Share of bytes that are text or framing; wrong-baud noise is mostly neither."""
+    if not data:
+        return 0.0
+    return sum(1 for b in data if b in _TEXT_BYTES) / len(data)
+
+def score_bytes(data: bytes) -> float:
+    """
+    0..1: how much `data` looks like analyzer output.
+    0.4 x printable fraction + 0.2 for a complete frame + 0.4 x parsed fields.
+    """
+    if not data:
+        return 0.0
+    printable = printable_fraction(data)
+    asm = FrameAssembler()
+    frames = asm.feed(data)
+    framed = 1.0 if frames else 0.0
+    tail = asm.flush()
+    if tail:
+        frames.append(tail)
+    fields = 0
+    for frame in frames:
+        parsed = extract_fields_from_block(frame)
+        fields = max(fields, sum(1 for s in ROW_SLOTS if getattr(parsed, s) is not None))
+    return round(0.4 * printable + 0.2 * framed + 0.4 * min(fields / FIELDS_FOR_FULL_SCORE, 1.0), 3)
+
+def list_ports() -> list:
+    """PortInfo for every serial port; `key` identifies the device across port renumbering."""
+    import serial.tools.list_ports
+    out = []
+    for p in serial.tools.list_ports.comports():
+        key = p.serial_number or (f"{p.vid:04x}:{p.pid:04x}" if p.vid is not None else None) or p.device
+        out.append(PortInfo(p.device, key, p.description or ""))
+    return out
+
+def _open_port(port: str, baud: int):
+    from crp_desktop.serial_reader import connect_port_specific
+    ser, _ = connect_port_specific(port, baud)
+    return ser
+
+def listen(ser, seconds: float, min_score: float = PROBE_MIN_SCORE) -> bytes:
+    """Collect bytes for up to `seconds`; stops early once a complete result has scored well."""
+    data = b""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            n = ser.in_waiting
+        except Exception:
+            n = 0
+        if n:
+            data += ser.read(n)
+            if b"\x03" in data and score_bytes(data) >= max(min_score, 0.9):
+                break
+        else:
+            time.sleep(0.05)
+    return data
+
+def probe_port(port: str, bauds=BAUD_RATES, seconds: float = PROBE_LISTEN_SECONDS,
+               min_score: float = PROBE_MIN_SCORE, open_port=_open_port) -> ProbeResult:
+    """Best-scoring baud for one port; stops at the first baud scoring >= min_score."""
+    best = ProbeResult(port, None, 0.0, 0)
+    for baud in bauds:
+        try:
+            ser = open_port(port, baud)
+        except Exception:
+            ser = None
+        if ser is None:
+            break  # busy or gone: no baud will do better
+        try:
+            data = listen(ser, seconds, min_score)
+        finally:
+            try:
+                ser.close()
+            except Exception:
+                pass
+        result = ProbeResult(port, baud, score_bytes(data), len(data))
+        if result.score > best.score:
+            best = result
+        if result.score >= min_score:
+            break
+    return best
+
+def discover(ports: list, bauds=BAUD_RATES, seconds: float = PROBE_LISTEN_SECONDS,
+             min_score: float = PROBE_MIN_SCORE, preferred: dict = None,
+             workers: int = PROBE_WORKERS, open_port=_open_port) -> list:
+    """
+    Probe all ports concurrently. `preferred` maps port -> baud to try first
+    (e.g. the cached rate for that device). Returns ProbeResults, best first.
+    """
+    preferred = preferred or {}
+
+    def order(port):
+        first = preferred.get(port)
+        return [first] + [b for b in bauds if b != first] if first else list(bauds)
+
+    if not ports:
+        return []
+    with ThreadPoolExecutor(max_workers=min(workers, len(ports))) as pool:
+        futures = [pool.submit(probe_port, p, order(p), seconds, min_score, open_port) for p in ports]
+        results = [f.result() for f in futures]
+    return sorted(results, key=lambda r: r.score, reverse=True)
+
+def cache_key(device_key: str) -> str:
+    """Settings key holding the detected baud for one device."""
+    return f"serial_baud:{device_key}"
@@ -0,0 +1,139 @@
+"""
+Result: the single record type passed from the parser to the DB writer,
+the Qt signals and the report.
+
+Fixed fields live in __slots__ (named like the crp_results columns); rare
+tokens (histograms, TOK:x, unknown labels) go into the `extra` dict. It
+also supports the dict-style access the rest of the code uses, by parser
+label ("WBC", "NO.", "%LYM") or by column name ("wbc", "instrument_no").
+"""
+
+HEADER_SLOTS = ("instrument_no", "date", "time", "patient_id", "sid", "pid")
+ANALYTE_SLOTS = (
+    "wbc", "rbc", "hgb", "hct", "mcv", "mch", "mchc", "rdw", "plt", "mpv", "pct", "pdw",
+    "pct_lym", "pct_mon", "pct_gra", "hash_lym", "hash_mon", "hash_gra", "crp",
+)
+FOOTER_SLOTS = ("instrument_name", "format_version", "checksum", "packet_type")
+# the order of Result.as_row(); db.INSERT_RESULT_SQL lists its columns in this order
+ROW_SLOTS = HEADER_SLOTS + ANALYTE_SLOTS + FOOTER_SLOTS
+DB_SLOTS = ("measure_datetime", "created_at", "id", "flags")
+
+LABEL_TO_SLOT = {
+    "NO.": "instrument_no", "DATE": "date", "TIME": "time", "ID": "patient_id",
+    "SID": "sid", "PID": "pid",
+    "WBC": "wbc", "RBC": "rbc", "HGB": "hgb", "HCT": "hct", "MCV": "mcv", "MCH": "mch",
+    "MCHC": "mchc", "RDW": "rdw", "PLT": "plt", "MPV": "mpv", "PCT": "pct", "PDW": "pdw",
+    "%LYM": "pct_lym", "%MON": "pct_mon", "%GRA": "pct_gra",
+    "#LYM": "hash_lym", "#MON": "hash_mon", "#GRA": "hash_gra", "CRP": "crp",
+    "InstrumentName": "instrument_name", "FormatVersion": "format_version",
+    "Checksum": "checksum", "PacketType": "packet_type", "MISC": "misc",
+}
+SLOT_TO_LABEL = {v: k for k, v in LABEL_TO_SLOT.items()}
+# column names are accepted as keys too (report/GUI code reads both)
+_KEY_TO_SLOT = dict(LABEL_TO_SLOT)
+_KEY_TO_SLOT.update({s: s for s in ROW_SLOTS + ("misc",) + DB_SLOTS})
+_STATE_SLOTS = ROW_SLOTS + ("misc", "extra") + DB_SLOTS
+
+class Result:
+    __slots__ = _STATE_SLOTS
+
+    def __init__(self):
+        for name in _STATE_SLOTS:
+            object.__setattr__(self, name, None)
+
+    # --- mapping-style access
+    def get(self, key, default=None):
+        slot = _KEY_TO_SLOT.get(key)
+        if slot is not None:
+            val = getattr(self, slot)
+            return default if val is None else val
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        val = self.get(key)
+        if val is None:
+            raise KeyError(key)
+        return val
+
+    def __setitem__(self, key, value):
+        slot = _KEY_TO_SLOT.get(key)
+        if slot is not None:
+            setattr(self, slot, value)
+            return
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def setdefault(self, key, default=None):
+        val = self.get(key)
+        if val is None:
+            self[key] = default
+            return default
+        return val
+
+    def keys(self):
+        keys = [SLOT_TO_LABEL[s] for s in ROW_SLOTS + ("misc",) if getattr(self, s) is not None]
+        if self.extra:
+            keys.extend(self.extra)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(k, self.get(k)) for k in self.keys()]
+
+    def to_dict(self) -> dict:
+        """Plain dict keyed by parser label (the raw_payload JSON shape)."""
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"Result({self.to_dict()!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Result):
+            return NotImplemented
+        return all(getattr(self, s) == getattr(other, s) for s in _STATE_SLOTS)
+
+    # --- conversion
+    def as_row(self) -> tuple:
+        """ROW_SLOTS values plus the newline-joined misc text, for parameterized inserts."""
+        misc = self.misc
+        if isinstance(misc, list):
+            misc = "\n".join(misc)
+        return tuple(getattr(self, s) for s in ROW_SLOTS) + (misc,)
+
+    @classmethod
+    def from_mapping(cls, data) -> "Result":
+        r = cls()
+        for k, v in data.items():
+            r[k] = v
+        return r
+
+    @classmethod
+    def from_row(cls, row) -> "Result":
+        """Build from a crp_results row (sqlite3.Row) without decoding raw_payload."""
+        r = cls()
+        for s in ROW_SLOTS + DB_SLOTS:
+            setattr(r, s, row[s])
+        misc = row["misc"]
+        r.misc = misc.split("\n") if misc else None
+        return r
+
+    # compact pickling for process pools / queues: one flat tuple
+    def __reduce__(self):
+        return (_result_from_state, (tuple(getattr(self, s) for s in _STATE_SLOTS),))
+
+def _result_from_state(values: tuple) -> Result:
+    r = Result.__new__(Result)
+    for name, val in zip(_STATE_SLOTS, values):
+        object.__setattr__(r, name, val)
+    return r
@@ -0,0 +1,223 @@
+"""
+Reference ranges and result flagging.
+
+Ranges live in the reference_ranges table (seeded with DEFAULT_RANGES) and
+are loaded into the in-memory `reference_ranges` table by db.init_db. Each
+analyte can have several rows by sex ("M", "F", "*" for any) and age band
+(years, None = open bound); the most specific matching row wins.
+
+Flags are "L"/"H" (outside the range) and "LL"/"HH" (outside the critical
+limits). db.save_result stores them with every row, so flagged results are
+found with an index lookup instead of re-parsing values.
+"""
+import sqlite3
+from collections import namedtuple
+from crp_desktop.record import Result, ANALYTE_SLOTS, SLOT_TO_LABEL, LABEL_TO_SLOT
+
+RefRange = namedtuple("RefRange", "analyte sex age_min age_max low high critical_low critical_high unit")
+
+CRITICAL_FLAGS = ("LL", "HH")
+ABNORMAL_FLAGS = ("L", "H") + CRITICAL_FLAGS
+
+# adult defaults for the analyzer's units; edit the reference_ranges table for your lab
+DEFAULT_RANGES = [
+    RefRange("wbc", "*", None, None, 4.0, 10.0, 2.0, 30.0, "10^3/uL"),
+    RefRange("rbc", "M", 18, None, 4.5, 5.9, None, None, "10^6/uL"),
+    RefRange("rbc", "F", 18, None, 4.0, 5.2, None, None, "10^6/uL"),
+    RefRange("rbc", "*", None, None, 4.0, 5.9, None, None, "10^6/uL"),
+    RefRange("hgb", "M", 18, None, 13.5, 17.5, 7.0, 20.0, "g/dL"),
+    RefRange("hgb", "F", 18, None, 12.0, 15.5, 7.0, 20.0, "g/dL"),
+    RefRange("hgb", "*", None, None, 12.0, 17.5, 7.0, 20.0, "g/dL"),
+    RefRange("hct", "M", 18, None, 40.0, 52.0, 20.0, 60.0, "%"),
+    RefRange("hct", "F", 18, None, 36.0, 46.0, 20.0, 60.0, "%"),
+    RefRange("hct", "*", None, None, 36.0, 52.0, 20.0, 60.0, "%"),
+    RefRange("mcv", "*", None, None, 80.0, 100.0, None, None, "fL"),
+    RefRange("mch", "*", None, None, 27.0, 33.0, None, None, "pg"),
+    RefRange("mchc", "*", None, None, 32.0, 36.0, None, None, "g/dL"),
+    RefRange("rdw", "*", None, None, 11.5, 14.5, None, None, "%"),
+    RefRange("plt", "*", None, None, 150.0, 400.0, 20.0, 1000.0, "10^3/uL"),
+    RefRange("mpv", "*", None, None, 7.5, 11.5, None, None, "fL"),
+    RefRange("pct", "*", None, None, 0.15, 0.40, None, None, "%"),
+    RefRange("pdw", "*", None, None, 10.0, 18.0, None, None, "%"),
+    RefRange("pct_lym", "*", None, None, 20.0, 40.0, None, None, "%"),
+    RefRange("pct_mon", "*", None, None, 2.0, 10.0, None, None, "%"),
+    RefRange("pct_gra", "*", None, None, 50.0, 70.0, None, None, "%"),
+    RefRange("hash_lym", "*", None, None, 1.0, 4.0, None, None, "10^3/uL"),
+    RefRange("hash_mon", "*", None, None, 0.1, 1.0, None, None, "10^3/uL"),
+    RefRange("hash_gra", "*", None, None, 2.0, 7.0, 0.5, None, "10^3/uL"),
+    RefRange("crp", "*", None, None, 0.0, 0.5, None, 10.0, "mg/dL"),
+]
+
+def init_reference_db(conn: sqlite3.Connection):
+    """Create the reference_ranges table; seed it with DEFAULT_RANGES when empty."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS reference_ranges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            analyte TEXT NOT NULL,
+            sex TEXT NOT NULL DEFAULT '*',
+            age_min REAL,
+            age_max REAL,
+            low REAL,
+            high REAL,
+            critical_low REAL,
+            critical_high REAL,
+            unit TEXT
+        )
+        """
+    )
+    if conn.execute("SELECT COUNT(*) FROM reference_ranges").fetchone()[0] == 0:
+        conn.executemany(
+            "INSERT INTO reference_ranges (" + ",".join(RefRange._fields) + ") VALUES ("
+            + ",".join("?" * len(RefRange._fields)) + ")",
+            DEFAULT_RANGES,
+        )
+    conn.commit()
+
+def parse_value(text):
+    """Numeric part of an analyte value ("6.23 10^3/uL" -> 6.23), or None."""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    head = str(text).split(None, 1)
+    if not head:
+        return None
+    try:
+        return float(head[0].lstrip("<>="))
+    except ValueError:
+        return None
+
+def classify(value, rng: RefRange):
+    """Flag for one numeric value against one range: None, "L", "H", "LL" or "HH"."""
+    if value is None or rng is None:
+        return None
+    if rng.critical_low is not None and value < rng.critical_low:
+        return "LL"
+    if rng.critical_high is not None and value > rng.critical_high:
+        return "HH"
+    if rng.low is not None and value < rng.low:
+        return "L"
+    if rng.high is not None and value > rng.high:
+        return "H"
+    return None
+
+def format_flags(flags: dict) -> str:
+    """{"crp": "H", "wbc": "L"} -> "WBC:L CRP:H" (analyte order; "" when nothing is flagged)."""
+    return " ".join(f"{SLOT_TO_LABEL[s]}:{flags[s]}" for s in ANALYTE_SLOTS if s in flags)
+
+def parse_flags(text) -> dict:
+    """Inverse of format_flags, keyed by slot."""
+    out = {}
+    for item in (text or "").split():
+        label, _, flag = item.rpartition(":")
+        slot = LABEL_TO_SLOT.get(label)
+        if slot:
+            out[slot] = flag
+    return out
+
+def _value(result, slot: str):
+    # Result (slot attribute), dict, or a sqlite3.Row (which has no .get)
+    if isinstance(result, Result):
+        return getattr(result, slot)
+    return result.get(slot) if hasattr(result, "get") else result[slot]
+
+def _format_bound(v) -> str:
+    return f"{v:g}"
+
+class ReferenceRanges:
+    def __init__(self, ranges=DEFAULT_RANGES):
+        self.set_ranges(ranges)
+
+    def set_ranges(self, ranges):
+        by_analyte = {}
+        for r in ranges:
+            r = RefRange(*r)
+            by_analyte.setdefault(r.analyte, []).append(r)
+        # most specific first: a sex-specific row, then an age band, beats the "*" catch-all
+        for rows in by_analyte.values():
+            rows.sort(key=lambda r: (r.sex == "*", r.age_min is None and r.age_max is None))
+        self.by_analyte = by_analyte
+        self.cache = {}
+        self.active_cache = {}
+
+    def load(self, conn: sqlite3.Connection):
+        rows = conn.execute(
+            "SELECT " + ",".join(RefRange._fields) + " FROM reference_ranges ORDER BY id"
+        ).fetchall()
+        self.set_ranges(tuple(r) for r in rows)
+
+    def lookup(self, analyte: str, sex: str = None, age: float = None):
+        """Range for an analyte slot; with no age only open-ended rows apply."""
+        key = (analyte, sex, age)
+        try:
+            return self.cache[key]
+        except KeyError:
+            pass
+        found = None
+        for r in self.by_analyte.get(analyte, ()):
+            if r.sex != "*" and r.sex != sex:
+                continue
+            if age is None:
+                if r.age_min is not None or r.age_max is not None:
+                    continue
+            elif (r.age_min is not None and age < r.age_min) or (r.age_max is not None and age >= r.age_max):
+                continue
+            found = r
+            break
+        self.cache[key] = found
+        return found
+
+    def active(self, sex: str = None, age: float = None) -> list:
+        """(slot, range) for every analyte that has a range for this sex/age."""
+        key = (sex, age)
+        found = self.active_cache.get(key)
+        if found is None:
+            found = [(s, self.lookup(s, sex, age)) for s in ANALYTE_SLOTS]
+            found = self.active_cache[key] = [(s, r) for s, r in found if r is not None]
+        return found
+
+    def describe(self, analyte: str, sex: str = None, age: float = None) -> str:
+        """Reference range text for reports, e.g. "4 - 10"."""
+        r = self.lookup(analyte, sex, age)
+        if r is None or (r.low is None and r.high is None):
+            return ""
+        if r.low is None:
+            return f"< {_format_bound(r.high)}"
+        if r.high is None:
+            return f"> {_format_bound(r.low)}"
+        return f"{_format_bound(r.low)} - {_format_bound(r.high)}"
+
+    def unit(self, analyte: str) -> str:
+        rows = self.by_analyte.get(analyte)
+        return (rows[0].unit or "") if rows else ""
+
+    def evaluate(self, result, sex: str = None, age: float = None) -> dict:
+        """Flags of one Result (or sqlite3.Row), keyed by slot; unflagged analytes are left out."""
+        flags = {}
+        for slot, rng in self.active(sex, age):
+            raw = _value(result, slot)
+            if raw is None:
+                continue
+            flag = classify(parse_value(raw), rng)
+            if flag:
+                flags[slot] = flag
+        return flags
+
+    def evaluate_columns(self, rows, sex: str = None, age: float = None) -> list:
+        """
+        Flags for a whole result set, one dict per row. Works column by column:
+        one range lookup per analyte, then a single pass over that column.
+        """
+        rows = list(rows)
+        out = [{} for _ in rows]
+        for slot, rng in self.active(sex, age):
+            column = [parse_value(_value(r, slot)) for r in rows]
+            for flags, value in zip(out, column):
+                flag = classify(value, rng)
+                if flag:
+                    flags[slot] = flag
+        return out
+
+# shared lookup table, loaded from the database by db.init_db
+reference_ranges = ReferenceRanges()
@@ -0,0 +1,360 @@
+"""
+Incremental replication of workstation results into a central SQLite database.
+
+Each workstation ships the rows changed since its high-water mark (a
+change_log sequence number, see db.ChangeFeed) as zlib-compressed JSON
+batches; the central side applies them with one batched upsert per batch,
+keyed on (source_id, source_row_id), and records per-source progress.
+Rows deleted at the source (change_log op 'D') travel as ids and are
+deleted centrally. The cost of a run depends on how much changed, not on
+how much history exists.
+
+Batches travel through a directory (a share, a synced folder): files are
+written under a temporary name and renamed into place, so a reader never
+sees half a batch. Re-shipping or re-applying a batch is harmless.
+
+The workstation's mark lives in a separate `<db>_replication.db` file, so
+shipping only ever reads the results database. The mark is stored with the
+database's id (db.database_id). When the id changes (a different database)
+or the change log is behind the mark (a restored backup), the source starts
+a new generation: it ships everything again from seq 0, and the central
+side replaces that source's rows when the first batch of the generation
+arrives.
+
+    python -m crp_desktop.replication ship --db crp_results.db --source clinic-a --dir //server/crp_sync
+    python -m crp_desktop.replication apply --central central.db --dir //server/crp_sync --every 60
+    python -m crp_desktop.replication lag --central central.db --dir //server/crp_sync
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import argparse
+from crp_desktop.db import (
+    get_read_db, changes_since, last_change_seq, result_columns, database_id, _add_missing_columns,
+)
+from crp_desktop.record import ROW_SLOTS
+from crp_desktop.resources import DB_PATH, REPLICATION_BATCH_ROWS, REPLICATION_INTERVAL
+
+BATCH_SUFFIX = ".json.z"
+# crp_results columns carried over (id becomes source_row_id)
+REPLICATED_COLUMNS = ROW_SLOTS + (
+    "misc", "measure_datetime", "raw_payload", "created_at", "flags", "abnormal", "critical",
+)
+
+def state_path(db_path: str = DB_PATH) -> str:
+    root, _ = os.path.splitext(db_path)
+    return root + "_replication.db"
+
+def batch_name(from_seq: int, to_seq: int, generation: int = 0) -> str:
+    # zero-padded so a plain sort is sequence order; later generations sort after ("g" > digits)
+    name = f"{from_seq:012d}-{to_seq:012d}{BATCH_SUFFIX}"
+    return f"g{generation:06d}-{name}" if generation else name
+
+def encode_batch(batch: dict) -> bytes:
+    return zlib.compress(json.dumps(batch, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+def decode_batch(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+class DirectoryTransport:
+    """<root>/<source_id>/<from>-<to>.json.z; applied batches are deleted."""
+    def __init__(self, root: str):
+        self.root = root
+
+    def send(self, source_id: str, name: str, data: bytes):
+        folder = os.path.join(self.root, source_id)
+        os.makedirs(folder, exist_ok=True)
+        tmp = os.path.join(folder, "." + name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(folder, name))
+
+    def sources(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def pending(self, source_id: str) -> list:
+        folder = os.path.join(self.root, source_id)
+        if not os.path.isdir(folder):
+            return []
+        return [os.path.join(folder, n) for n in sorted(os.listdir(folder)) if n.endswith(BATCH_SUFFIX)]
+
+    def read(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def remove(self, path: str):
+        os.remove(path)
+
+class ReplicationSource:
+    """Ships this workstation's changes since its high-water mark."""
+    def __init__(self, source_id: str, transport, db_path: str = DB_PATH,
+                 state_db: str = None, batch_rows: int = REPLICATION_BATCH_ROWS):
+        self.source_id = source_id
+        self.transport = transport
+        self.batch_rows = batch_rows
+        self.read_conn = get_read_db(db_path)
+        self.state = sqlite3.connect(state_db or state_path(db_path))
+        self.state.execute(
+            "CREATE TABLE IF NOT EXISTS replication_state ("
+            "source_id TEXT PRIMARY KEY, shipped_seq INTEGER NOT NULL, shipped_at REAL)"
+        )
+        _add_missing_columns(self.state.cursor(), "replication_state",
+                             {"db_id": "TEXT", "generation": "INTEGER NOT NULL DEFAULT 0"})
+        self.state.commit()
+
+    def shipped_seq(self) -> int:
+        return self.mark()[0]
+
+    def mark(self) -> tuple:
+        """(shipped_seq, db_id, generation) as last recorded."""
+        row = self.state.execute(
+            "SELECT shipped_seq, db_id, generation FROM replication_state WHERE source_id = ?",
+            (self.source_id,),
+        ).fetchone()
+        return tuple(row) if row else (0, None, 0)
+
+    def ship(self) -> int:
+        """Send every change past the mark; returns the number of rows shipped."""
+        seq, shipped_db, generation = self.mark()
+        db_id = database_id(self.read_conn)
+        columns = [c for c in result_columns(self.read_conn) if c in REPLICATED_COLUMNS]
+        head = last_change_seq(self.read_conn)
+        # a mark from before ids were recorded (None) is taken as ours
+        reset = (shipped_db is not None and shipped_db != db_id) or head < seq
+        if reset:
+            seq, generation = 0, generation + 1
+        shipped = 0
+        while True:
+            changes = changes_since(self.read_conn, seq, self.batch_rows)
+            if not changes and not reset:
+                break
+            # after a reset at least one batch goes out, so the central side replaces its copy
+            reset = False
+            to_seq = changes[-1]["seq"] if changes else seq
+            # a row changed several times in the batch is sent once, as it is now
+            latest = {r["result_id"]: r for r in changes}
+            rows = [r for r in latest.values() if r["op"] != "D"]
+            batch = {
+                "source_id": self.source_id,
+                "generation": generation,
+                "from_seq": seq,
+                "to_seq": to_seq,
+                "source_seq": max(head, to_seq),
+                "shipped_at": time.time(),
+                "columns": columns,
+                "rows": [[r["id"]] + [r[c] for c in columns] for r in rows],
+                "deleted": [r["result_id"] for r in latest.values() if r["op"] == "D"],
+            }
+            self.transport.send(self.source_id, batch_name(seq, to_seq, generation), encode_batch(batch))
+            with self.state:
+                self.state.execute(
+                    "INSERT INTO replication_state (source_id, shipped_seq, shipped_at, db_id, generation) "
+                    "VALUES (?,?,?,?,?) "
+                    "ON CONFLICT(source_id) DO UPDATE SET shipped_seq=excluded.shipped_seq, "
+                    "shipped_at=excluded.shipped_at, db_id=excluded.db_id, generation=excluded.generation",
+                    (self.source_id, to_seq, batch["shipped_at"], db_id, generation),
+                )
+            shipped += len(latest)
+            seq = to_seq
+        return shipped
+
+    def close(self):
+        self.read_conn.close()
+        self.state.close()
+
+def init_central_db(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    cols = ",\n".join(
+        f"{c} INTEGER DEFAULT 0" if c in ("abnormal", "critical") else f"{c} TEXT" for c in REPLICATED_COLUMNS
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS central_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_id TEXT NOT NULL,
+            source_row_id INTEGER NOT NULL,
+            {cols},
+            replicated_at REAL,
+            UNIQUE (source_id, source_row_id)
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_central_results_ts "
+        "ON central_results(COALESCE(measure_datetime, created_at), id)"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS replication_sources (
+            source_id TEXT PRIMARY KEY,
+            applied_seq INTEGER NOT NULL DEFAULT 0,
+            source_seq INTEGER NOT NULL DEFAULT 0,
+            shipped_at REAL,
+            applied_at REAL,
+            rows_applied INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    _add_missing_columns(conn.cursor(), "replication_sources", {"generation": "INTEGER NOT NULL DEFAULT 0"})
+    conn.commit()
+    return conn
+
+def upsert_sql(columns: list) -> str:
+    names = ["source_id", "source_row_id"] + list(columns) + ["replicated_at"]
+    updates = ", ".join(f"{c}=excluded.{c}" for c in list(columns) + ["replicated_at"])
+    return (
+        f"INSERT INTO central_results ({','.join(names)}) VALUES ({','.join('?' * len(names))}) "
+        f"ON CONFLICT(source_id, source_row_id) DO UPDATE SET {updates}"
+    )
+
+class CentralReplica:
+    """Applies shipped batches in sequence order, one transaction per batch."""
+    def __init__(self, path: str, transport):
+        self.conn = init_central_db(path)
+        self.transport = transport
+
+    def applied_seq(self, source_id: str) -> int:
+        return self.position(source_id)[1]
+
+    def position(self, source_id: str) -> tuple:
+        """(generation, applied_seq) of a source."""
+        row = self.conn.execute(
+            "SELECT generation, applied_seq FROM replication_sources WHERE source_id = ?", (source_id,)
+        ).fetchone()
+        return tuple(row) if row else (0, 0)
+
+    def apply_batch(self, batch: dict) -> int:
+        """
+        Upsert (and delete) one decoded batch; returns rows written (0 when it
+        was already applied or belongs to an older generation). The first
+        batch of a new generation replaces the source's rows.
+        """
+        source_id = batch["source_id"]
+        generation = batch.get("generation", 0)
+        current, applied = self.position(source_id)
+        if generation < current:
+            return 0
+        new_generation = generation > current
+        if not new_generation and batch["to_seq"] <= applied:
+            return 0
+        columns = [c for c in batch["columns"] if c in REPLICATED_COLUMNS]
+        index = [batch["columns"].index(c) + 1 for c in columns]
+        now = time.time()
+        params = [[source_id, row[0]] + [row[i] for i in index] + [now] for row in batch["rows"]]
+        # batches shipped before deletes were replicated have no "deleted" key
+        deleted = [(source_id, row_id) for row_id in batch.get("deleted", ())]
+        with self.conn:
+            if new_generation:
+                self.conn.execute("DELETE FROM central_results WHERE source_id = ?", (source_id,))
+            self.conn.executemany(upsert_sql(columns), params)
+            self.conn.executemany(
+                "DELETE FROM central_results WHERE source_id = ? AND source_row_id = ?", deleted
+            )
+            self.conn.execute(
+                "INSERT INTO replication_sources "
+                "(source_id, generation, applied_seq, source_seq, shipped_at, applied_at, rows_applied) "
+                "VALUES (?,?,?,?,?,?,?) ON CONFLICT(source_id) DO UPDATE SET generation=excluded.generation, "
+                "applied_seq=excluded.applied_seq, source_seq=excluded.source_seq, shipped_at=excluded.shipped_at, "
+                "applied_at=excluded.applied_at, rows_applied=rows_applied + excluded.rows_applied",
+                (source_id, generation, batch["to_seq"], batch["source_seq"], batch["shipped_at"], now,
+                 len(params) + len(deleted)),
+            )
+        return len(params) + len(deleted)
+
+    def apply_pending(self) -> dict:
+        """Apply every waiting batch; stops at a gap in a source's sequence. {source_id: rows}."""
+        applied = {}
+        for source_id in self.transport.sources():
+            for path in self.transport.pending(source_id):
+                batch = decode_batch(self.transport.read(path))
+                generation, applied_seq = self.position(source_id)
+                # a new generation starts again at seq 0
+                expected = applied_seq if batch.get("generation", 0) == generation else 0
+                if batch.get("generation", 0) >= generation and batch["from_seq"] > expected:
+                    break  # an earlier batch has not arrived yet
+                applied[source_id] = applied.get(source_id, 0) + self.apply_batch(batch)
+                self.transport.remove(path)
+        return applied
+
+    def lag_report(self, now: float = None) -> list:
+        """Per source: how far the central copy trails what the source had shipped."""
+        now = time.time() if now is None else now
+        report = []
+        for r in self.conn.execute("SELECT * FROM replication_sources ORDER BY source_id"):
+            report.append({
+                "source_id": r["source_id"],
+                "applied_seq": r["applied_seq"],
+                "seq_behind": r["source_seq"] - r["applied_seq"],
+                "pending_batches": len(self.transport.pending(r["source_id"])),
+                "rows_applied": r["rows_applied"],
+                "seconds_since_apply": now - r["applied_at"] if r["applied_at"] else None,
+                # time since the newest applied batch left the source
+                "staleness_s": now - r["shipped_at"] if r["shipped_at"] else None,
+            })
+        return report
+
+    def close(self):
+        self.conn.close()
+
+def format_lag(report: list) -> str:
+    lines = []
+    for r in report:
+        stale = "-" if r["staleness_s"] is None else f"{r['staleness_s']:.0f}s"
+        lines.append(
+            f"{r['source_id']}: seq {r['applied_seq']} (+{r['seq_behind']} behind, "
+            f"{r['pending_batches']} batches waiting), data {stale} old, {r['rows_applied']} rows applied"
+        )
+    return "\n".join(lines) or "no sources yet"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replicate results into a central database")
+    sub = ap.add_subparsers(dest="command", required=True)
+    ship = sub.add_parser("ship", help="send this workstation's changes")
+    ship.add_argument("--db", default=DB_PATH)
+    ship.add_argument("--source", required=True, help="unique name of this workstation")
+    apply_ = sub.add_parser("apply", help="apply waiting batches to the central database")
+    lag = sub.add_parser("lag", help="print per-source replication lag")
+    for p in (apply_, lag):
+        p.add_argument("--central", required=True)
+    for p in (ship, apply_, lag):
+        p.add_argument("--dir", required=True, help="batch directory shared by sources and central")
+    for p in (ship, apply_):
+        p.add_argument("--every", type=float, default=None, metavar="SECONDS",
+                       help=f"keep running, once per interval (e.g. {REPLICATION_INTERVAL:g})")
+    args = ap.parse_args(argv)
+
+    transport = DirectoryTransport(args.dir)
+    if args.command == "lag":
+        central = CentralReplica(args.central, transport)
+        print(format_lag(central.lag_report()))
+        central.close()
+        return 0
+    if args.command == "ship":
+        worker = ReplicationSource(args.source, transport, args.db)
+        step = lambda: print(f"Shipped {worker.ship()} rows")
+    else:
+        worker = CentralReplica(args.central, transport)
+        step = lambda: print(f"Applied {worker.apply_pending()}")
+    try:
+        while True:
+            step()
+            if args.every is None:
+                break
+            time.sleep(args.every)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
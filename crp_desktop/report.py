@@ -6,6 +6,9 @@ from PySide6.QtPrintSupport import QPrinter
 from PySide6.QtGui import QTextDocument
 from PySide6.QtGui import QPageLayout
 from PySide6.QtCore import QMarginsF
+from crp_desktop.metrics import metrics
+from crp_desktop.record import LABEL_TO_SLOT
+from crp_desktop.reference import reference_ranges, parse_flags
 
 # sample test order and display mapping
 TEST_ORDER = [
@@ -28,11 +31,14 @@ def _img_to_base64(path: str) -> str:
     mime = "image/png" if p.suffix.lower() in (".png",) else "image/jpeg"
     return f"data:{mime};base64," + base64.b64encode(b).decode("ascii")
 
-def generate_report_html(parsed: dict, settings: dict = None, logo_path: str = None) -> str:
+@metrics.timed("report.html")
+def generate_report_html(parsed, settings: dict = None, logo_path: str = None,
+                         sex: str = None, age: float = None) -> str:
     """
-    Build an HTML report string using the parsed result dict and optional settings.
-    parsed: dict from extract_fields_from_block or DB row (parsed fields)
+    Build an HTML report string using the parsed result and optional settings.
+    parsed: record.Result (from extract_fields_from_block or Result.from_row) or a dict
     settings: dictionary with clinic_name, report_title, footer_text, etc.
+    sex/age: pick sex/age-specific reference ranges (flags are re-evaluated when given)
     """
     settings = settings or {}
     clinic = settings.get("clinic_name", "Your Clinic Name")
@@ -105,18 +111,29 @@ def generate_report_html(parsed: dict, settings: dict = None, logo_path: str = N
         <tbody>
     """
 
-    # produce rows from TEST_ORDER (uses mapping to units if parsed had units)
+    # flags stored at ingestion apply to the default ranges; recompute for a given sex/age
+    stored = parsed.get("flags")
+    if stored is not None and sex is None and age is None:
+        flags = parse_flags(stored)
+    else:
+        flags = reference_ranges.evaluate(parsed, sex, age)
+
+    # produce rows from TEST_ORDER; reference range and unit come from the reference table
     for key, display in TEST_ORDER:
         val = parsed.get(display) or parsed.get(key) or ""
         if not val:
             continue
-        # split value/unit if it already contains unit (e.g. "6.3 10^3/uL")
-        # crude parse: last token that contains '/' or '^' or letters => unit; otherwise empty
+        slot = LABEL_TO_SLOT[key]
         result_text = str(val)
-        unit = ""
-        ref = parsed.get(f"{display}_ref", "") or ""
-        # some of your parsed fields already contain unit, leave as-is in result column
-        html += f"<tr><td>{display}</td><td>{result_text}</td><td>{ref}</td><td>{parsed.get('unit_'+display,'')}</td><td></td></tr>"
+        unit = parsed.get("unit_" + display) or reference_ranges.unit(slot)
+        # the parser appends the unit to the value ("6.3 10^3/uL"); show it once, in Units
+        if unit and result_text.endswith(" " + unit):
+            result_text = result_text[:-len(unit) - 1]
+        flag = flags.get(slot)
+        if flag:
+            result_text = f"<b>{result_text} {flag}</b>"
+        ref = parsed.get(f"{display}_ref") or reference_ranges.describe(slot, sex, age)
+        html += f"<tr><td>{display}</td><td>{result_text}</td><td>{ref}</td><td>{unit}</td><td></td></tr>"
 
     # include misc lines (MISC) if present - show below table
     html += "</tbody></table>"
@@ -145,6 +162,7 @@ def generate_report_html(parsed: dict, settings: dict = None, logo_path: str = N
 
     return html
 
+@metrics.timed("report.pdf")
 def save_html_to_pdf(html: str, out_path: str) -> None:
     """
     Convert HTML string to PDF using Qt's QTextDocument + QPrinter.
@@ -0,0 +1,193 @@
+"""
+Background report rendering with an on-disk PDF cache.
+
+Reports are laid out (QTextDocument + QPrinter, see report.py) on a worker
+thread, never on the UI thread. Each PDF is cached as
+<result id>-<row version>-<fingerprint>.pdf. The row version is the row's
+change_log seq, which moves whenever the row is edited; the fingerprint
+hashes the report settings, the logo file, the reference ranges and
+REPORT_TEMPLATE_VERSION. Changing any of them makes old files unreachable
+(and pruned eventually).
+New results are pre-rendered at low priority, so printing one is usually
+just a file copy.
+"""
+import os
+import json
+import queue
+import shutil
+import hashlib
+import itertools
+import threading
+from crp_desktop.db import get_read_db
+from crp_desktop.record import Result
+from crp_desktop.reference import reference_ranges
+from crp_desktop.resources import DB_PATH, REPORT_CACHE_DIR, REPORT_CACHE_MAX_FILES, REPORT_TEMPLATE_VERSION
+
+# the row plus its version: its latest change_log seq
+ROW_SQL = (
+    "SELECT r.*, COALESCE(c.seq, 0) AS version FROM crp_results r "
+    "LEFT JOIN change_log c ON c.result_id = r.id WHERE r.id = ?"
+)
+
+# job priorities: exports first, then the stop marker, then pre-renders
+PRIORITY_PRINT = 0
+PRIORITY_STOP = 1
+PRIORITY_PRERENDER = 2
+
+# settings read by report.generate_report_html; other settings do not invalidate the cache
+REPORT_SETTING_KEYS = ("clinic_name", "clinic_address", "clinic_contact", "report_title", "footer_text", "logo_path")
+
+def report_fingerprint(settings: dict, ranges=reference_ranges) -> str:
+    """Hash of everything besides the result row that changes the rendered PDF."""
+    h = hashlib.sha1()
+    h.update(f"template:{REPORT_TEMPLATE_VERSION}\n".encode("utf-8"))
+    used = {k: settings.get(k) for k in REPORT_SETTING_KEYS}
+    h.update(json.dumps(used, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    logo = settings.get("logo_path")
+    if logo and os.path.exists(logo):
+        st = os.stat(logo)
+        h.update(f"logo:{st.st_size}:{st.st_mtime_ns}\n".encode("utf-8"))
+    h.update(repr(sorted(ranges.by_analyte.items())).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def render_pdf(row, settings: dict, out_path: str):
+    """Default renderer: the report.py template. Imported here to keep Qt printing off startup."""
+    from crp_desktop.report import generate_report_html, save_html_to_pdf
+    html = generate_report_html(Result.from_row(row), settings, logo_path=settings.get("logo_path"))
+    save_html_to_pdf(html, out_path)
+
+class ReportRenderService(threading.Thread):
+    """
+    Worker thread rendering reports into `cache_dir`.
+
+    prerender(id) queues a result at low priority; export(id, dest) copies a
+    cached PDF right away or renders it first, ahead of pre-renders. Finished
+    exports are reported through `done(info)` with result_id, path and error
+    (e.g. signals.report_ready.emit, which hands it to the UI thread).
+    """
+    def __init__(self, settings: dict, db_path: str = DB_PATH, cache_dir: str = REPORT_CACHE_DIR,
+                 max_files: int = REPORT_CACHE_MAX_FILES, done=None, render=render_pdf):
+        super().__init__(daemon=True, name="report-render")
+        self.db_path = db_path
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self.done = done
+        self.render = render
+        self.jobs = queue.PriorityQueue()
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+        self.conn = None
+        # export()/cached() run on the caller's thread and look versions up on their own connection
+        self.lookup_conn = None
+        self.rendered = 0
+        self.set_settings(settings)
+
+    def set_settings(self, settings: dict):
+        with self.lock:
+            self.settings = dict(settings)
+            self.fingerprint = report_fingerprint(self.settings)
+
+    def cache_path(self, result_id: int, version: int) -> str:
+        return os.path.join(self.cache_dir, f"{result_id}-{version}-{self.fingerprint}.pdf")
+
+    def row_version(self, result_id: int):
+        with self.lock:
+            if self.lookup_conn is None:
+                self.lookup_conn = get_read_db(self.db_path)
+            row = self.lookup_conn.execute(
+                "SELECT seq FROM change_log WHERE result_id = ?", (result_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def cached(self, result_id: int):
+        path = self.cache_path(result_id, self.row_version(result_id))
+        return path if os.path.exists(path) else None
+
+    def prerender(self, result_id: int):
+        if result_id is not None:
+            self.jobs.put((PRIORITY_PRERENDER, next(self.seq), result_id, None))
+
+    def export(self, result_id: int, dest: str) -> bool:
+        """True if dest was written from the cache now; False if it was queued for rendering."""
+        path = self.cached(result_id)
+        if path:
+            shutil.copyfile(path, dest)
+            return True
+        self.jobs.put((PRIORITY_PRINT, next(self.seq), result_id, dest))
+        return False
+
+    def render_one(self, result_id: int) -> str:
+        """Render into the cache (unless already there); returns the cached path."""
+        if self.conn is None:
+            self.conn = get_read_db(self.db_path)
+        row = self.conn.execute(ROW_SQL, (result_id,)).fetchone()
+        if row is None:
+            raise LookupError(f"result {result_id} not found")
+        with self.lock:
+            settings = self.settings
+            path = self.cache_path(result_id, row["version"])
+        if os.path.exists(path):
+            return path
+        os.makedirs(self.cache_dir, exist_ok=True)
+        part = path + ".part"
+        try:
+            self.render(row, settings, part)
+            os.replace(part, path)
+        finally:
+            if os.path.exists(part):
+                os.remove(part)
+        self.rendered += 1
+        self.prune()
+        return path
+
+    def run_job(self, job):
+        _, _, result_id, dest = job
+        if result_id is None:
+            return False
+        info = {"result_id": result_id, "path": dest, "error": None}
+        try:
+            path = self.render_one(result_id)
+            if dest:
+                shutil.copyfile(path, dest)
+        except Exception as e:
+            info["error"] = str(e)
+        if dest and self.done:
+            self.done(info)
+        return True
+
+    def run(self):
+        while self.run_job(self.jobs.get()):
+            pass
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def close(self):
+        """Close the caller-side connection, and the worker's one if the thread is not running."""
+        with self.lock:
+            if self.lookup_conn is not None:
+                self.lookup_conn.close()
+                self.lookup_conn = None
+        if self.conn is not None and not self.is_alive():
+            self.conn.close()
+            self.conn = None
+
+    def stop(self):
+        # queued exports still finish; pending pre-renders are dropped
+        self.jobs.put((PRIORITY_STOP, next(self.seq), None, None))
+
+    def prune(self):
+        if not self.max_files:
+            return
+        try:
+            files = [os.path.join(self.cache_dir, n) for n in os.listdir(self.cache_dir) if n.endswith(".pdf")]
+        except OSError:
+            return
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=os.path.getmtime)
+        for f in files[:len(files) - self.max_files]:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
@@ -37,3 +37,78 @@ DB_PATH = "crp_results.db"
 BAUD_RATES = [9600, 4800, 19200, 38400]
 READ_TIMEOUT = 1.0
 BUFFER_RESET_TIMEOUT = 5.0
+
+# Online backup
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE = 0.005
+BACKUP_MAX_RESTARTS = 20
+BACKUP_INTERVAL_MIN = 60
+BACKUP_KEEP = 14
+
+# Serial Monitor log
+LOG_MAX_LINES = 5000
+LOG_FLUSH_MS = 250
+LOG_MAX_LINES_PER_FLUSH = 200
+RAW_TAP_MAX_BYTES = 64 * 1024
+RAW_VIEW_MAX_LINES = 4000
+
+# Headless service
+SERVICE_RECONNECT_DELAY = 5.0
+
+# Read pool / HTTP API
+READ_POOL_SIZE = 4
+PAGE_SIZE_DEFAULT = 100
+PAGE_SIZE_MAX = 1000
+PAGE_SIZES = [50, 100, 250, 500, 1000]
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+API_POLL_INTERVAL = 0.5
+API_LONG_POLL_TIMEOUT = 30.0
+API_SSE_HEARTBEAT = 15.0
+
+# Bulk import
+BULK_CHUNK_FRAMES = 500
+BULK_BATCH_ROWS = 5000
+
+# Streaming parser: max characters held while waiting for a frame boundary
+MAX_FRAME_BUFFER = 256 * 1024
+
+# Decoded-result cache for the detail view / report lookups
+RESULT_CACHE_BYTES = 16 * 1024 * 1024
+
+# LIS outbound (HL7 v2 over MLLP)
+LIS_PORT = 2575
+LIS_TIMEOUT = 10.0
+LIS_POOL_SIZE = 2
+OUTBOX_POLL_INTERVAL = 2.0
+OUTBOX_BATCH = 50
+OUTBOX_RETRY_BASE = 5.0
+OUTBOX_RETRY_MAX = 600.0
+OUTBOX_MAX_ATTEMPTS = 50
+# a claimed ('sending') batch is only handed out again after this long (a sender that died mid-batch)
+OUTBOX_LEASE = 300.0
+HL7_SENDING_APP = "CRP_DESKTOP"
+
+# Report rendering: PDFs cached per result id + settings/template hash.
+# Bump REPORT_TEMPLATE_VERSION whenever generate_report_html's output changes.
+REPORT_CACHE_DIR = "report_cache"
+REPORT_CACHE_MAX_FILES = 500
+REPORT_TEMPLATE_VERSION = 2
+
+# Port discovery / baud detection
+PROBE_LISTEN_SECONDS = 3.0
+PROBE_MIN_SCORE = 0.6
+# below this share of printable bytes a running port's first data warns about the baud rate
+PROBE_MIN_PRINTABLE = 0.8
+PROBE_WORKERS = 8
+PROBE_SAMPLE_BYTES = 256
+
+# Change feed: how often each GUI checks PRAGMA data_version for rows
+# written by other processes (own-process results also arrive via signals)
+CHANGE_FEED_INTERVAL_MS = 500
+# most changed rows a GUI applies per tick; a bigger backlog spreads over the next ticks
+CHANGE_FEED_CHUNK = 200
+
+# Replication to a central database
+REPLICATION_BATCH_ROWS = 1000
+REPLICATION_INTERVAL = 60.0
@@ -0,0 +1,106 @@
+import sys
+import json
+from collections import OrderedDict
+from crp_desktop.db import get_result, last_change_seq
+from crp_desktop.record import Result
+from crp_desktop.resources import RESULT_CACHE_BYTES
+
+# past this many changed rows it is cheaper to drop everything than to look them up
+MAX_TRACKED_CHANGES = 1000
+
+class CachedResult:
+    __slots__ = ("row", "record", "payload", "detail", "size")
+
+    def __init__(self, row):
+        self.row = row
+        self.record = Result.from_row(row)
+        raw = row["raw_payload"]
+        try:
+            self.payload = json.loads(raw) if raw else None
+        except ValueError:
+            self.payload = raw
+        self.detail = None
+        self.size = sum(sys.getsizeof(v) for v in row) + sys.getsizeof(raw or "") * 2
+
+class ResultCache:
+    """
+    LRU cache of decoded results keyed by row id, bounded by an estimate of
+    the memory it holds. Before every lookup it checks PRAGMA data_version,
+    which changes whenever another connection commits (the listener, the
+    headless service, an import); if it moved, the rows changed since the
+    last check are read from change_log and only those entries are dropped.
+    A new result from the listener therefore leaves the cache intact. Writes
+    made through the same connection must call invalidate()/clear().
+    """
+    def __init__(self, max_bytes: int = RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.data_version = None
+        self.seq = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, conn, row_id: int):
+        """Cached entry for row_id (fetched on a miss), or None if the row does not exist."""
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.data_version:
+            self.data_version = version
+            self.drop_changed(conn)
+        entry = self.entries.get(row_id)
+        if entry is not None:
+            self.entries.move_to_end(row_id)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        row = get_result(conn, row_id)
+        if row is None:
+            return None
+        entry = CachedResult(row)
+        self.entries[row_id] = entry
+        self.bytes += entry.size
+        self._evict()
+        return entry
+
+    def drop_changed(self, conn):
+        """Invalidate the entries of rows changed (per change_log) since the last call."""
+        if self.seq is None:
+            self.clear()
+            self.seq = last_change_seq(conn)
+            return
+        changed = conn.execute(
+            "SELECT result_id, seq FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+            (self.seq, MAX_TRACKED_CHANGES + 1),
+        ).fetchall()
+        if len(changed) > MAX_TRACKED_CHANGES:
+            self.clear()
+            self.seq = last_change_seq(conn)
+            return
+        for row_id, seq in changed:
+            self.invalidate(row_id)
+            self.seq = seq
+
+    def set_detail(self, row_id: int, text: str):
+        entry = self.entries.get(row_id)
+        if entry is None or entry.detail is not None:
+            return
+        entry.detail = text
+        added = sys.getsizeof(text)
+        entry.size += added
+        self.bytes += added
+        self._evict()
+
+    def _evict(self):
+        # always keep the most recent entry, even if it alone is over budget
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.bytes -= old.size
+
+    def invalidate(self, row_id: int):
+        entry = self.entries.pop(row_id, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
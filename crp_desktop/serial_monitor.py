@@ -0,0 +1,74 @@
+import threading
+from collections import deque
+from crp_desktop.resources import RAW_TAP_MAX_BYTES
+
+class LogBuffer:
+    """
+    Bounded queue of log lines between producers (status signals) and the
+    Serial Monitor widget, which drains it on a timer.
+    Lines beyond `maxlen` are dropped oldest-first and counted.
+    """
+    def __init__(self, maxlen: int):
+        self.lines = deque(maxlen=maxlen)
+        self.dropped = 0
+
+    def push(self, msg: str):
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append(msg)
+
+    def drain(self, max_lines: int):
+        """Return (lines, dropped): at most max_lines newest lines, plus how many were skipped."""
+        dropped = self.dropped + max(0, len(self.lines) - max_lines)
+        lines = list(self.lines)[-max_lines:] if max_lines else []
+        self.lines.clear()
+        self.dropped = 0
+        return lines, dropped
+
+    def __len__(self):
+        return len(self.lines)
+
+class RawTap:
+    """
+    Optional copy of raw serial bytes for the hex/ASCII view.
+    The listener only pays for an attribute check while it is disabled;
+    when enabled, bytes beyond `max_bytes` are discarded oldest-first.
+    """
+    def __init__(self, max_bytes: int):
+        self.enabled = False
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.chunks = deque()
+        self.size = 0
+        self.dropped = 0
+
+    def feed(self, data: bytes):
+        with self.lock:
+            self.chunks.append(data)
+            self.size += len(data)
+            while self.size > self.max_bytes and self.chunks:
+                old = self.chunks.popleft()
+                self.size -= len(old)
+                self.dropped += len(old)
+
+    def drain(self):
+        """Return (data, dropped_bytes) and empty the tap."""
+        with self.lock:
+            data = b"".join(self.chunks)
+            dropped = self.dropped
+            self.chunks.clear()
+            self.size = 0
+            self.dropped = 0
+        return data, dropped
+
+def format_hexdump(data: bytes, offset: int = 0, width: int = 16) -> list:
+    lines = []
+    for i in range(0, len(data), width):
+        chunk = data[i:i + width]
+        hex_part = " ".join(f"{b:02X}" for b in chunk)
+        ascii_part = "".join(chr(b) if 32 <= b <= 126 else "." for b in chunk)
+        lines.append(f"{offset + i:08X}  {hex_part.ljust(width * 3 - 1)}  {ascii_part}")
+    return lines
+
+# shared with serial_reader; the GUI toggles `raw_tap.enabled`
+raw_tap = RawTap(max_bytes=RAW_TAP_MAX_BYTES)
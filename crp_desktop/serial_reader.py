@@ -2,31 +2,57 @@
 import time
 import sqlite3
 import serial
-from crp_desktop.resources import READ_TIMEOUT, BUFFER_RESET_TIMEOUT, BAUD_RATES, DB_PATH
-from crp_desktop.parser import extract_fields_from_block
+from crp_desktop.resources import READ_TIMEOUT, BUFFER_RESET_TIMEOUT, BAUD_RATES, DB_PATH, PROBE_SAMPLE_BYTES, PROBE_MIN_PRINTABLE
+from crp_desktop.parser import extract_fields_from_block, FrameAssembler
 from crp_desktop.db import save_result, get_db
-from crp_desktop import signals as signals_mod
+from crp_desktop.metrics import metrics
+from crp_desktop.serial_monitor import raw_tap
+from crp_desktop.port_probe import printable_fraction
 
 def connect_port_specific(port_name: str, baud: int):
     try:
-        ser = serial.Serial(port_name, baudrate=baud, timeout=READ_TIMEOUT)
+        # serial_for_url opens plain port names like serial.Serial, and also
+        # socket://host:port, rfc2217://... (network serial servers, simulators)
+        ser = serial.serial_for_url(port_name, baudrate=baud, timeout=READ_TIMEOUT)
         return ser, f"Connected to {port_name} @ {baud}"
     except Exception as e:
         return None, f"Could not open {port_name} @ {baud}: {e}"
 
-def read_serial_and_store_results(stop_event, port_name: str, baud: int):
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+def _store_packet(packet: str, conn, bus):
+    with metrics.timer("parser.extract"):
+        parsed = extract_fields_from_block(packet)
+    try:
+        save_result(parsed, conn)
+        metrics.incr("serial.results")
+        if bus:
+            bus.new_result.emit(parsed)
+            bus.status.emit("Saved new result: " + parsed.get("ID", "<no id>"))
+    except Exception as e:
+        if bus:
+            bus.status.emit("DB save error: " + str(e))
+
+def read_serial_and_store_results(stop_event, port_name: str, baud: int, bus=None, db_path: str = DB_PATH):
+    """
+    Listener loop. `bus` is anything with new_result/status .emit()
+    (signals.Signals in the GUI, events.EventBus headless); defaults to the GUI signals.
+    """
+    if bus is None:
+        from crp_desktop import signals as signals_mod
+        bus = signals_mod.signals
+    conn = sqlite3.connect(db_path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     ser, msg = connect_port_specific(port_name, baud)
     if ser is None:
-        if signals_mod.signals:
-            signals_mod.signals.status.emit("Serial: " + msg)
+        if bus:
+            bus.status.emit("Serial: " + msg)
         conn.close()
         return
-    if signals_mod.signals:
-        signals_mod.signals.status.emit("Serial: " + msg)
-    buffer = ""
+    if bus:
+        bus.status.emit("Serial: " + msg)
+    assembler = FrameAssembler()
     last_read_time = time.time()
+    # the first bytes are checked once: a wrong baud rate opens fine but reads noise
+    sample = b""
     try:
         while not stop_event.is_set():
             try:
@@ -35,66 +61,37 @@ def read_serial_and_store_results(stop_event, port_name: str, baud: int):
                 n = 0
             if n:
                 raw = ser.read(n)
-                try:
-                    text = raw.decode('latin1', errors='ignore')
-                except Exception:
-                    text = raw.decode('utf-8', errors='ignore')
-                buffer += text
+                metrics.incr("serial.bytes", len(raw))
+                if sample is not None:
+                    sample += raw
+                    if len(sample) >= PROBE_SAMPLE_BYTES:
+                        if bus and printable_fraction(sample) < PROBE_MIN_PRINTABLE:
+                            bus.status.emit(
+                                f"Serial: data on {port_name} does not look like analyzer output at "
+                                f"{baud} baud; check the rate or use Auto-detect"
+                            )
+                        sample = None
+                if raw_tap.enabled:
+                    raw_tap.feed(raw)
+                with metrics.timer("serial.frame_assembly"):
+                    packets = assembler.feed(raw)
                 last_read_time = time.time()
-
-                while True:
-                    stx_idx = buffer.find('\x02')
-                    etx_idx = buffer.find('\x03')
-                    if stx_idx != -1 and etx_idx != -1 and etx_idx > stx_idx:
-                        packet = buffer[stx_idx + 1:etx_idx]
-                        parsed = extract_fields_from_block(packet)
-                        try:
-                            save_result(parsed, conn)
-                            if signals_mod.signals:
-                                signals_mod.signals.new_result.emit(parsed)
-                                signals_mod.signals.status.emit("Saved new result: " + parsed.get("ID", "<no id>"))
-                        except Exception as e:
-                            if signals_mod.signals:
-                                signals_mod.signals.status.emit("DB save error: " + str(e))
-                        buffer = buffer[etx_idx + 1:]
-                        continue
-                    if '\n$FE' in buffer or ' CRP' in buffer:
-                        last_nl = max(buffer.rfind('\n'), buffer.rfind('\r\n'))
-                        if last_nl > 0:
-                            packet = buffer[:last_nl + 1]
-                            parsed = extract_fields_from_block(packet)
-                            try:
-                                save_result(parsed, conn)
-                                if signals_mod.signals:
-                                    signals_mod.signals.new_result.emit(parsed)
-                                    signals_mod.signals.status.emit("Saved new result: " + parsed.get("ID", "<no id>"))
-                            except Exception as e:
-                                if signals_mod.signals:
-                                    signals_mod.signals.status.emit("DB save error: " + str(e))
-                            buffer = buffer[last_nl + 1:]
-                            continue
-                    break
+                for packet in packets:
+                    _store_packet(packet, conn, bus)
             else:
-                if buffer and (time.time() - last_read_time) > BUFFER_RESET_TIMEOUT:
-                    parsed = extract_fields_from_block(buffer)
-                    try:
-                        save_result(parsed, conn)
-                        if signals_mod.signals:
-                            signals_mod.signals.new_result.emit(parsed)
-                            signals_mod.signals.status.emit("Saved new result: " + parsed.get("ID", "<no id>"))
-                    except Exception as e:
-                        if signals_mod.signals:
-                            signals_mod.signals.status.emit("DB save error: " + str(e))
-                    buffer = ""
+                if assembler.pending() and (time.time() - last_read_time) > BUFFER_RESET_TIMEOUT:
+                    tail = assembler.flush()
+                    if tail:
+                        _store_packet(tail, conn, bus)
                 time.sleep(0.08)
     except Exception as e:
-        if signals_mod.signals:
-            signals_mod.signals.status.emit("Serial listener error: " + str(e))
+        if bus:
+            bus.status.emit("Serial listener error: " + str(e))
     finally:
         try:
             ser.close()
         except Exception:
             pass
         conn.close()
-        if signals_mod.signals:
-            signals_mod.signals.status.emit("Serial listener stopped")
+        if bus:
+            bus.status.emit("Serial listener stopped")
@@ -0,0 +1,125 @@
+"""
+Headless ingestion service: serial listener(s) + parser + DB writer, no Qt.
+
+    python -m crp_desktop.service --listen COM3@9600 --listen COM4@19200 --db crp_results.db
+    python -m crp_desktop.service --listen COM3@9600 --http 127.0.0.1:8765
+    python -m crp_desktop.service --listen COM3@9600 --lis 10.0.0.5:2575
+
+Stops cleanly on Ctrl+C / SIGTERM. GUI instances can read the same
+database at the same time (WAL mode).
+"""
+import sys
+import signal
+import logging
+import argparse
+import threading
+from crp_desktop.db import init_db
+from crp_desktop.events import EventBus
+from crp_desktop.resources import DB_PATH, BAUD_RATES, SERVICE_RECONNECT_DELAY
+
+log = logging.getLogger("crp_desktop.service")
+
+def parse_listen_spec(spec: str) -> tuple:
+    """'COM3@9600' -> ('COM3', 9600); baud defaults to BAUD_RATES[0]."""
+    port, sep, baud = spec.rpartition("@")
+    if not sep:
+        return spec, BAUD_RATES[0]
+    return port, int(baud)
+
+class IngestionService:
+    def __init__(self, listeners: list, db_path: str = DB_PATH, bus: EventBus = None):
+        self.listeners = listeners
+        self.db_path = db_path
+        self.bus = bus or EventBus()
+        self.stop_event = threading.Event()
+        self.threads = {}
+        self.results = 0
+        # the bus calls handlers on the emitting thread: one per listener
+        self.results_lock = threading.Lock()
+        self.bus.new_result.connect(self.on_new_result)
+
+    def on_new_result(self, parsed):
+        with self.results_lock:
+            self.results += 1
+
+    def start_listener(self, port: str, baud: int):
+        from crp_desktop.serial_reader import read_serial_and_store_results
+        t = threading.Thread(
+            target=read_serial_and_store_results,
+            args=(self.stop_event, port, baud, self.bus, self.db_path),
+            name=f"listener-{port}",
+            daemon=True,
+        )
+        t.start()
+        self.threads[(port, baud)] = t
+
+    def run(self):
+        init_db(self.db_path)
+        for port, baud in self.listeners:
+            self.start_listener(port, baud)
+        # supervise: reopen ports whose listener exited (unplugged cable, port error)
+        while not self.stop_event.wait(SERVICE_RECONNECT_DELAY):
+            for (port, baud), t in list(self.threads.items()):
+                if not t.is_alive():
+                    self.bus.status.emit(f"Serial: reopening {port} @ {baud}")
+                    self.start_listener(port, baud)
+        for t in self.threads.values():
+            t.join(timeout=5.0)
+        log.info("Service stopped after %d results", self.results)
+
+    def stop(self, *_):
+        self.stop_event.set()
+
+def install_signal_handlers(service: IngestionService):
+    signal.signal(signal.SIGINT, service.stop)
+    signal.signal(signal.SIGTERM, service.stop)
+    if hasattr(signal, "SIGBREAK"):
+        signal.signal(signal.SIGBREAK, service.stop)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run CRP ingestion without the GUI")
+    ap.add_argument("--listen", action="append", required=True, metavar="PORT[@BAUD]",
+                    help="serial port to listen on, repeatable (e.g. COM3@9600)")
+    ap.add_argument("--db", default=DB_PATH, help="results database (default: %(default)s)")
+    ap.add_argument("--log-file", help="write the log here instead of stderr")
+    ap.add_argument("--http", metavar="HOST:PORT",
+                    help="also serve the read-only HTTP API (e.g. 127.0.0.1:8765)")
+    ap.add_argument("--lis", metavar="HOST[:PORT]",
+                    help="also send results to a LIS as HL7 v2 over MLLP (e.g. 10.0.0.5:2575)")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(
+        filename=args.log_file,
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    service = IngestionService([parse_listen_spec(s) for s in args.listen], args.db)
+    service.bus.status.connect(log.info)
+    install_signal_handlers(service)
+    api = None
+    if args.http:
+        from crp_desktop.api import start_api_server
+        init_db(args.db)
+        host, _, port = args.http.rpartition(":")
+        api = start_api_server(host or "127.0.0.1", int(port), args.db)
+        log.info("HTTP API on http://%s", args.http)
+    lis = None
+    if args.lis:
+        from crp_desktop.lis_export import LisSender, parse_endpoint
+        init_db(args.db)
+        host, port = parse_endpoint(args.lis)
+        lis = LisSender(host, port, args.db, report=log.info)
+        service.bus.new_result.connect(lis.notify)
+        lis.start()
+    try:
+        service.run()
+    finally:
+        if lis:
+            lis.stop()
+        if api:
+            api.shutdown()
+            api.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+In-process settings: read from the settings table once, served from memory.
+
+update() writes every changed key in one transaction and then broadcasts
+the changed keys through `bus.settings_changed` (signals.Signals in the GUI,
+events.EventBus headless), so dependents (report rendering, backups, LIS
+export, serial tab) react without polling or re-reading the table.
+"""
+import sqlite3
+import threading
+from crp_desktop.db import get_db, load_settings, write_settings
+
+class SettingsStore:
+    def __init__(self, conn: sqlite3.Connection = None, bus=None):
+        self.conn = conn
+        self.bus = bus
+        self.lock = threading.Lock()
+        self.values = {}
+        self.reload()
+
+    def reload(self):
+        """Re-read the table (e.g. after another process changed it)."""
+        conn = self.conn or get_db()
+        try:
+            values = load_settings(conn)
+        finally:
+            if conn is not self.conn:
+                conn.close()
+        with self.lock:
+            self.values = values
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.values)
+
+    # --- typed accessors
+    def get(self, key: str, default: str = None) -> str:
+        val = self.values.get(key)
+        return default if val is None else val
+
+    def get_str(self, key: str, default: str = "") -> str:
+        return (self.get(key) or default).strip()
+
+    def get_int(self, key: str, default: int = 0) -> int:
+        try:
+            return int(self.get(key))
+        except (TypeError, ValueError):
+            return default
+
+    def get_float(self, key: str, default: float = 0.0) -> float:
+        try:
+            return float(self.get(key))
+        except (TypeError, ValueError):
+            return default
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        val = self.get(key)
+        if val is None or val == "":
+            return default
+        return val.strip().lower() in ("1", "true", "yes", "on")
+
+    # --- writes
+    def update(self, data: dict) -> dict:
+        """
+        Store the given keys (values become strings, booleans "1"/"0") in one
+        transaction; returns and broadcasts only the keys whose value changed.
+        """
+        changed = {}
+        with self.lock:
+            for k, v in data.items():
+                if isinstance(v, bool):
+                    v = "1" if v else "0"
+                v = "" if v is None else str(v)
+                if self.values.get(k) != v:
+                    changed[k] = v
+            if not changed:
+                return changed
+            conn = self.conn or get_db()
+            try:
+                write_settings(conn, changed)
+            finally:
+                if conn is not self.conn:
+                    conn.close()
+            self.values.update(changed)
+        if self.bus:
+            self.bus.settings_changed.emit(changed)
+        return changed
+
+    def set(self, key: str, value) -> bool:
+        return bool(self.update({key: value}))
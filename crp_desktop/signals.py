@@ -2,8 +2,16 @@
 from PySide6.QtCore import QObject, Signal
 
 class Signals(QObject):
-    new_result = Signal(dict)
+    # carries a record.Result (passed by reference, no per-emit dict copy)
+    new_result = Signal(object)
     status = Signal(str)
+    # dict(result_id, path, error) from report_service when a queued export is written
+    report_ready = Signal(object)
+    # dict of the settings keys that changed -> new value (settings_store.SettingsStore.update)
+    settings_changed = Signal(object)
+    # port_probe results from worker threads: list of PortInfo / list of ProbeResult
+    ports_listed = Signal(object)
+    probe_finished = Signal(object)
 
 # module-level variable to be initialized by main
 signals = None
@@ -0,0 +1,102 @@
+"""
+Cold-start timing harness.
+
+Launches the app (or the packaged executable) several times with
+CRP_STARTUP_PROBE set, collects the in-process marks written at the first
+paint, and prints min / median / max for each.
+
+    python -m crp_desktop.startup_timing --runs 5
+    python -m crp_desktop.startup_timing --exe dist/CRPDesktop/CRPDesktop.exe
+    python -m crp_desktop.startup_timing --importtime
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+PROBE_ENV = "CRP_STARTUP_PROBE"
+MARKS = ["qt_import_s", "gui_import_s", "window_shown_s", "first_paint_s", "wall_s"]
+
+def time_one_start(cmd: list, timeout: float = 60.0) -> dict:
+    fd, probe_path = tempfile.mkstemp(suffix=".json", prefix="crp_startup_")
+    os.close(fd)
+    os.remove(probe_path)
+    env = dict(os.environ)
+    env[PROBE_ENV] = probe_path
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(cmd, env=env, timeout=timeout,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        wall = time.perf_counter() - start
+        if not os.path.exists(probe_path):
+            raise RuntimeError(
+                f"no startup probe written (exit code {proc.returncode}): "
+                + proc.stderr.decode("utf-8", errors="ignore")[-500:]
+            )
+        with open(probe_path, encoding="utf-8") as f:
+            marks = json.load(f)
+    finally:
+        if os.path.exists(probe_path):
+            os.remove(probe_path)
+    marks["wall_s"] = wall
+    return marks
+
+def summarize(samples: list) -> dict:
+    out = {}
+    for key in MARKS:
+        vals = [s[key] for s in samples if key in s]
+        if vals:
+            out[key] = {"min": min(vals), "median": statistics.median(vals), "max": max(vals)}
+    return out
+
+def top_imports(limit: int = 20) -> list:
+    """Return (cumulative_us, module) for the slowest imports of crp_desktop.gui."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import crp_desktop.main, crp_desktop.gui"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    rows = []
+    for line in proc.stderr.decode("utf-8", errors="ignore").splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            rows.append((int(parts[1]), parts[2].strip()))
+        except ValueError:
+            continue
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Measure CRP Desktop cold-start time")
+    ap.add_argument("--exe", help="packaged executable to time (default: python -m crp_desktop.main)")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--json", action="store_true", help="print the summary as JSON")
+    ap.add_argument("--importtime", action="store_true", help="list the slowest imports")
+    args = ap.parse_args(argv)
+
+    if args.importtime:
+        for us, mod in top_imports():
+            print(f"{us / 1000:9.1f} ms  {mod}")
+        return 0
+
+    cmd = [args.exe] if args.exe else [sys.executable, "-m", "crp_desktop.main"]
+    samples = [time_one_start(cmd, args.timeout) for _ in range(args.runs)]
+    summary = summarize(samples)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+    print(f"{'mark':<16}{'min':>10}{'median':>10}{'max':>10}   ({args.runs} runs: {' '.join(cmd)})")
+    for key, s in summary.items():
+        print(f"{key:<16}{s['min']:>10.3f}{s['median']:>10.3f}{s['max']:>10.3f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
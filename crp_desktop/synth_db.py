@@ -0,0 +1,146 @@
+"""
+Seeded synthetic results databases for scale testing.
+
+Rows go through the normal insert path (db.insert_results), so flags,
+raw_payload and measure_datetime look exactly like ingested data. The same
+seed gives the same rows; the date range ends today, so "today" queries
+have data.
+
+    python -m crp_desktop.synth_db big.db --rows 1000000 --seed 7 --days 730
+"""
+import sys
+import math
+import time
+import random
+import sqlite3
+import argparse
+from datetime import date, timedelta
+from crp_desktop.db import init_db, insert_results
+from crp_desktop.record import Result, ANALYTE_SLOTS, SLOT_TO_LABEL
+from crp_desktop.reference import DEFAULT_RANGES
+from crp_desktop.resources import BULK_BATCH_ROWS, IDENTIFIER_MAP
+
+INSTRUMENTS = [("1", "CRP-CBC-A", 0.6), ("2", "CRP-CBC-A", 0.3), ("3", "CRP-CBC-B", 0.1)]
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 0.9, 0.4, 0.15]
+
+# value distribution per analyte: centred in the catch-all reference range,
+# sd a fifth of its width, so about 1% of values fall outside it
+_CATCH_ALL = {r.analyte: r for r in DEFAULT_RANGES if r.sex == "*" and r.age_min is None}
+
+def _unit(slot: str) -> str:
+    return _CATCH_ALL[slot].unit
+
+def _decimals(slot: str) -> int:
+    r = _CATCH_ALL[slot]
+    return 2 if r.high < 2 else 1
+
+def _analyte_value(rng: random.Random, slot: str) -> str:
+    if slot == "crp":
+        # right-skewed: median ~0.2 mg/dL with a long inflammatory tail
+        value = math.exp(rng.gauss(-1.6, 1.2))
+    else:
+        r = _CATCH_ALL[slot]
+        value = max(0.0, rng.gauss((r.low + r.high) / 2, (r.high - r.low) / 5))
+    return f"{value:.{_decimals(slot)}f} {_unit(slot)}"
+
+def _day_counts(rng: random.Random, rows: int, days: int, end: date) -> list:
+    """(day, count) pairs summing to `rows`, weighted by weekday with some noise."""
+    start = end - timedelta(days=days - 1)
+    weights = []
+    for i in range(days):
+        d = start + timedelta(days=i)
+        weights.append(WEEKDAY_WEIGHTS[d.weekday()] * rng.uniform(0.7, 1.3))
+    total = sum(weights)
+    counts = [int(rows * w / total) for w in weights]
+    for i in rng.sample(range(days), rows - sum(counts)) if rows - sum(counts) <= days else []:
+        counts[i] += 1
+    counts[-1] += rows - sum(counts)
+    return [(start + timedelta(days=i), c) for i, c in enumerate(counts)]
+
+def synth_results(rows: int, seed: int = 1, days: int = 365, end: date = None):
+    """Yield `rows` Results, oldest first."""
+    rng = random.Random(seed)
+    end = end or date.today()
+    patients = max(1, rows // 4)
+    inst_ids = [i for i, _, _ in INSTRUMENTS]
+    inst_names = {i: n for i, n, _ in INSTRUMENTS}
+    inst_weights = [w for _, _, w in INSTRUMENTS]
+    for day, count in _day_counts(rng, rows, days, end):
+        # clinic hours, busiest mid-morning
+        seconds = sorted(
+            min(max(int(rng.gauss(10.5 * 3600, 2 * 3600)), 7 * 3600), 19 * 3600) for _ in range(count)
+        )
+        for seq, sec in enumerate(seconds, 1):
+            r = Result()
+            inst = rng.choices(inst_ids, inst_weights)[0]
+            r.instrument_no = inst
+            r.instrument_name = inst_names[inst]
+            r.date = day.strftime("%d/%m/%y")
+            r.time = f"{sec // 3600:02d}:{sec % 3600 // 60:02d}:{sec % 60:02d}"
+            r.patient_id = f"P{int(rng.paretovariate(1.2) * 1000) % patients:06d}"
+            r.sid = str(seq)
+            # most samples are a full CBC + CRP; some are CRP only
+            slots = ANALYTE_SLOTS if rng.random() < 0.8 else ("crp",)
+            for slot in slots:
+                setattr(r, slot, _analyte_value(rng, slot))
+            yield r
+
+_LABEL_TO_CODE = {label: code for code, (label, _) in IDENTIFIER_MAP.items()}
+
+def analyzer_frame(r: Result) -> bytes:
+    """The STX/ETX packet the analyzer would send for this result (input for simulators)."""
+    lines = []
+    if r.instrument_no:
+        lines.append(f"NO. {r.instrument_no}")
+    if r.date and r.time:
+        h, m, sec = r.time.split(":")
+        lines.append(f"{r.date} {h}h{m}mn{sec}s")
+    if r.patient_id:
+        lines.append(f"{_LABEL_TO_CODE['ID']} {r.patient_id}")
+    for slot in ANALYTE_SLOTS:
+        value = getattr(r, slot)
+        if value:
+            lines.append(f"{_LABEL_TO_CODE[SLOT_TO_LABEL[slot]]} {value.split()[0]}")
+    if r.instrument_name:
+        lines.append(f"$FB {r.instrument_name}")
+    return ("\x02\n" + "\n".join(lines) + "\n\x03").encode("latin1")
+
+def build_database(path: str, rows: int, seed: int = 1, days: int = 365, end: date = None,
+                   batch: int = BULK_BATCH_ROWS, progress=None) -> int:
+    init_db(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    written = 0
+    pending = []
+    try:
+        for r in synth_results(rows, seed, days, end):
+            pending.append(r)
+            if len(pending) >= batch:
+                with conn:
+                    written += insert_results(conn, pending)
+                pending = []
+                if progress:
+                    progress(written)
+        if pending:
+            with conn:
+                written += insert_results(conn, pending)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return written
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build a seeded synthetic results database")
+    ap.add_argument("path")
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--days", type=int, default=365)
+    args = ap.parse_args(argv)
+    started = time.perf_counter()
+    n = build_database(args.path, args.rows, args.seed, args.days,
+                       progress=lambda n: print(f"\r{n}/{args.rows} rows", end="", flush=True))
+    print(f"\nWrote {n} rows in {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
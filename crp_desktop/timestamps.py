@@ -0,0 +1,107 @@
+"""
+Timestamp normalization for analyzer DATE/TIME fields.
+
+Analyzers print dates as dd/mm/yy, dd/mm/yyyy or yyyy/mm/dd and times as
+HH:MM:SS, HH:MM or the "10h05mn00s" style (see parser.RE_META_DTIME). An
+instrument keeps one format, so the normalizer remembers which patterns
+matched last time per instrument and tries those first; every pattern is a
+precompiled regex, no strptime/exception round trips.
+
+measure_datetime is always either "YYYY-MM-DD HH:MM:SS" (sorts and works
+with SQLite date()) or None, never the raw printout.
+"""
+import re
+import calendar
+import threading
+from datetime import datetime, timezone
+
+# (name, regex, order of the year/month/day groups)
+DATE_FORMATS = (
+    ("dd/mm/yy", re.compile(r"(\d{1,2})[/.-](\d{1,2})[/.-](\d{2})"), (2, 1, 0)),
+    ("dd/mm/yyyy", re.compile(r"(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})"), (2, 1, 0)),
+    ("yyyy/mm/dd", re.compile(r"(\d{4})[/.-](\d{1,2})[/.-](\d{1,2})"), (0, 1, 2)),
+)
+TIME_FORMATS = (
+    ("HH:MM:SS", re.compile(r"(\d{1,2}):(\d{2}):(\d{2})")),
+    ("HH:MM", re.compile(r"(\d{1,2}):(\d{2})()")),
+    ("HHhMMmnSSs", re.compile(r"(\d{1,2})h(\d{2})mn(\d{2})s?", re.IGNORECASE)),
+)
+# strptime's %y pivot: 69-99 -> 19xx, 00-68 -> 20xx
+YEAR_PIVOT = 69
+
+def _date_parts(groups: tuple, order: tuple):
+    y, m, d = (int(groups[i]) for i in order)
+    if y < 100:
+        y += 1900 if y >= YEAR_PIVOT else 2000
+    if not (1 <= m <= 12 and 1 <= d <= calendar.monthrange(y, m)[1]):
+        return None
+    return y, m, d
+
+def _time_parts(groups: tuple):
+    h, mi, s = int(groups[0]), int(groups[1]), int(groups[2] or 0)
+    if h > 23 or mi > 59 or s > 59:
+        return None
+    return h, mi, s
+
+def _match(formats, text: str, first: int):
+    """Index and groups of the first format that matches, trying `first` before the rest."""
+    order = (first,) + tuple(i for i in range(len(formats)) if i != first) if first is not None else range(len(formats))
+    for i in order:
+        m = formats[i][1].fullmatch(text)
+        if m:
+            return i, m.groups()
+    return None, None
+
+class TimestampNormalizer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # instrument -> (date format index, time format index) that matched last
+        self.formats = {}
+
+    def normalize(self, date_str, time_str, instrument: str = "") -> str:
+        """('01/02/24', '10h05mn00s') -> '2024-02-01 10:05:00'; None when either part is unusable."""
+        date_str = (date_str or "").strip()
+        time_str = (time_str or "").strip()
+        if not date_str or not time_str:
+            return None
+        cached_date, cached_time = self.formats.get(instrument, (None, None))
+        di, dg = _match(DATE_FORMATS, date_str, cached_date)
+        ti, tg = _match(TIME_FORMATS, time_str, cached_time)
+        if di is None or ti is None:
+            return None
+        day = _date_parts(dg, DATE_FORMATS[di][2])
+        tod = _time_parts(tg)
+        if day is None or tod is None:
+            return None
+        if (di, ti) != (cached_date, cached_time):
+            with self.lock:
+                self.formats[instrument] = (di, ti)
+        return "%04d-%02d-%02d %02d:%02d:%02d" % (day + tod)
+
+    def detected(self, instrument: str = "") -> tuple:
+        """(date format, time format) names last seen for an instrument, or None."""
+        found = self.formats.get(instrument)
+        if found is None:
+            return None
+        return DATE_FORMATS[found[0]][0], TIME_FORMATS[found[1]][0]
+
+    def clear(self):
+        with self.lock:
+            self.formats.clear()
+
+def to_epoch(iso: str, utc: bool = False):
+    """
+    '2024-02-01 10:05:00' -> seconds since the epoch; None if not ISO.
+    measure_datetime is analyzer (local) time; pass utc=True for SQLite's created_at.
+    """
+    if not iso:
+        return None
+    try:
+        dt = datetime.fromisoformat(iso)
+    except ValueError:
+        return None
+    if utc:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+timestamps = TimestampNormalizer()
@@ -0,0 +1,272 @@
+"""
+UI responsiveness soak test under simulated ingestion load.
+
+Starts MainWindow headless (QT_QPA_PLATFORM=offscreen) in a scratch
+directory (removed afterwards unless --workdir is given), feeds a simulated analyzer over TCP into the real listener
+(serial_reader via a socket:// URL: framing, parser, DB writer, signals,
+on_new_result), and measures for the whole run:
+
+  - event-loop latency: how late a 10 ms precise QTimer fires
+  - on_new_result handling time (metrics "ui.on_new_result")
+  - resident memory growth after a warm-up period
+  - results sent vs. results that reached the database
+
+    python -m crp_desktop.ui_soak --seconds 600 --rate 2 --burst 50 --burst-every 60
+    python -m crp_desktop.ui_soak --seconds 60 --rate 20 --json soak.json
+
+Exit code 0 when every threshold passes, 1 otherwise.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+from crp_desktop.metrics import percentile
+
+TICK_MS = 10
+MEMORY_SAMPLE_MS = 1000
+# defaults for the pass/fail thresholds
+MAX_LAG_P99_MS = 100.0
+MAX_HANDLER_P95_MS = 100.0
+MAX_GROWTH_MB = 64.0
+WARMUP_S = 10.0
+
+def rss_bytes():
+    """Resident set size of this process, or None when it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class AnalyzerFeeder(threading.Thread):
+    """
+    TCP stand-in for the analyzer: sends `rate` results per second, plus
+    `burst` back-to-back results every `burst_every` seconds (a batch run).
+    """
+    def __init__(self, rate: float, burst: int = 0, burst_every: float = 0.0, seed: int = 1):
+        super().__init__(daemon=True, name="analyzer-feeder")
+        self.rate = rate
+        self.burst = burst
+        self.burst_every = burst_every
+        self.seed = seed
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(1)
+        self.url = f"socket://127.0.0.1:{self.sock.getsockname()[1]}"
+        self.stop_event = threading.Event()
+        self.sent = 0
+
+    def frames(self):
+        from crp_desktop.synth_db import synth_results, analyzer_frame
+        while True:
+            for r in synth_results(10_000, seed=self.seed, days=1):
+                yield analyzer_frame(r)
+
+    def run(self):
+        try:
+            conn, _ = self.sock.accept()
+        except OSError:
+            return
+        frames = self.frames()
+        interval = 1.0 / self.rate if self.rate > 0 else None
+        start = time.monotonic()
+        next_send = start
+        next_burst = start + self.burst_every if self.burst and self.burst_every else None
+        with conn:
+            while not self.stop_event.is_set():
+                now = time.monotonic()
+                try:
+                    if next_burst is not None and now >= next_burst:
+                        conn.sendall(b"".join(next(frames) for _ in range(self.burst)))
+                        self.sent += self.burst
+                        next_burst += self.burst_every
+                    if interval is not None and now >= next_send:
+                        conn.sendall(next(frames))
+                        self.sent += 1
+                        next_send += interval
+                except OSError:
+                    return
+                self.stop_event.wait(0.005)
+
+    def stop(self):
+        self.stop_event.set()
+        self.sock.close()
+
+def lag_stats(lags_ms: list) -> dict:
+    ordered = sorted(lags_ms)
+    return {
+        "ticks": len(ordered),
+        "p50_ms": percentile(ordered, 50),
+        "p99_ms": percentile(ordered, 99),
+        "max_ms": ordered[-1] if ordered else 0.0,
+    }
+
+def memory_growth_mb(samples: list, warmup_s: float):
+    """(t, rss) samples -> MB gained between the first and last post-warm-up tenth of the run."""
+    samples = [(t, m) for t, m in samples if m is not None and t >= warmup_s]
+    if len(samples) < 2:
+        return None
+    n = max(1, len(samples) // 10)
+    head = sum(m for _, m in samples[:n]) / n
+    tail = sum(m for _, m in samples[-n:]) / n
+    return (tail - head) / (1024 * 1024)
+
+def evaluate(report: dict, max_lag_ms: float = MAX_LAG_P99_MS, max_handler_ms: float = MAX_HANDLER_P95_MS,
+             max_growth_mb: float = MAX_GROWTH_MB) -> list:
+    """Failed checks as readable strings; empty when the run passed."""
+    failures = []
+    lag = report["event_loop"]["p99_ms"]
+    if lag > max_lag_ms:
+        failures.append(f"event-loop lag p99 {lag:.1f} ms > {max_lag_ms:.1f} ms")
+    handler = report["on_new_result"]
+    if handler and handler["p95_ms"] > max_handler_ms:
+        failures.append(f"on_new_result p95 {handler['p95_ms']:.1f} ms > {max_handler_ms:.1f} ms")
+    growth = report["memory_growth_mb"]
+    if growth is not None and growth > max_growth_mb:
+        failures.append(f"memory grew {growth:.1f} MB > {max_growth_mb:.1f} MB")
+    if report["results_stored"] < report["results_sent"] - report["in_flight_allowance"]:
+        failures.append(f"only {report['results_stored']} of {report['results_sent']} results were stored")
+    return failures
+
+def run_soak(seconds: float, rate: float, burst: int = 0, burst_every: float = 0.0,
+             warmup_s: float = WARMUP_S, workdir: str = None) -> dict:
+    """
+    MainWindow opens resources.DB_PATH relative to the working directory, so
+    the run chdirs into `workdir` (a fresh temporary directory by default,
+    deleted at the end) and always changes back.
+    """
+    keep = workdir is not None
+    workdir = workdir or tempfile.mkdtemp(prefix="crp_soak_")
+    os.makedirs(workdir, exist_ok=True)
+    old_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        report = _run_in_workdir(seconds, rate, burst, burst_every, warmup_s)
+    finally:
+        os.chdir(old_cwd)
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    report["workdir"] = workdir if keep else None
+    return report
+
+def _run_in_workdir(seconds: float, rate: float, burst: int, burst_every: float, warmup_s: float) -> dict:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTimer, Qt
+    from crp_desktop.db import init_db, get_db
+    from crp_desktop.signals import init_signals
+    from crp_desktop.metrics import metrics
+    from crp_desktop.serial_reader import read_serial_and_store_results
+
+    metrics.enabled = True
+    metrics.reset()
+    app = QApplication.instance() or QApplication([])
+    init_db()
+    init_signals()
+    from crp_desktop.gui import MainWindow
+    window = MainWindow()
+    window.show()
+
+    feeder = AnalyzerFeeder(rate, burst, burst_every)
+    feeder.start()
+    window.listener_thread = threading.Thread(
+        target=read_serial_and_store_results,
+        args=(window.stop_event, feeder.url, 9600),
+        daemon=True,
+    )
+    window.listener_thread.start()
+
+    started = time.perf_counter()
+    lags = []
+    memory = []
+    last_tick = [time.perf_counter()]
+
+    def on_tick():
+        now = time.perf_counter()
+        if now - started >= warmup_s:
+            lags.append(max(0.0, (now - last_tick[0]) * 1000 - TICK_MS))
+        last_tick[0] = now
+
+    def on_memory():
+        memory.append((time.perf_counter() - started, rss_bytes()))
+
+    tick = QTimer()
+    tick.setTimerType(Qt.PreciseTimer)
+    tick.setInterval(TICK_MS)
+    tick.timeout.connect(on_tick)
+    tick.start()
+    mem_timer = QTimer()
+    mem_timer.setInterval(MEMORY_SAMPLE_MS)
+    mem_timer.timeout.connect(on_memory)
+    mem_timer.start()
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec()
+
+    tick.stop()
+    mem_timer.stop()
+    feeder.stop()
+    window.close()
+    conn = get_db()
+    stored = conn.execute("SELECT COUNT(*) FROM crp_results").fetchone()[0]
+    conn.close()
+    handler = next((m for m in metrics.snapshot() if m["name"] == "ui.on_new_result"), None)
+    return {
+        "seconds": seconds,
+        "rate": rate,
+        "burst": burst,
+        "burst_every": burst_every,
+        "event_loop": lag_stats(lags),
+        "on_new_result": handler,
+        "memory_start_mb": memory[0][1] / (1024 * 1024) if memory and memory[0][1] else None,
+        "memory_growth_mb": memory_growth_mb(memory, warmup_s),
+        "results_sent": feeder.sent,
+        "results_stored": stored,
+        # whatever was sent in the last couple of seconds may still be in the pipe
+        "in_flight_allowance": int(rate * 2) + burst,
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Soak-test UI responsiveness under simulated ingestion")
+    ap.add_argument("--seconds", type=float, default=300.0)
+    ap.add_argument("--rate", type=float, default=2.0, help="results per second")
+    ap.add_argument("--burst", type=int, default=0, help="extra results sent back-to-back")
+    ap.add_argument("--burst-every", type=float, default=60.0, help="seconds between bursts")
+    ap.add_argument("--warmup", type=float, default=WARMUP_S)
+    ap.add_argument("--max-lag-ms", type=float, default=MAX_LAG_P99_MS)
+    ap.add_argument("--max-handler-ms", type=float, default=MAX_HANDLER_P95_MS)
+    ap.add_argument("--max-growth-mb", type=float, default=MAX_GROWTH_MB)
+    ap.add_argument("--workdir", help="keep the database and files of the run here")
+    ap.add_argument("--json", help="also write the report here")
+    args = ap.parse_args(argv)
+
+    report = run_soak(args.seconds, args.rate, args.burst, args.burst_every, args.warmup, args.workdir)
+    failures = evaluate(report, args.max_lag_ms, args.max_handler_ms, args.max_growth_mb)
+    report["failures"] = failures
+    lag = report["event_loop"]
+    print(f"Ran {args.seconds:.0f}s at {args.rate}/s (+{args.burst} every {args.burst_every:.0f}s)")
+    print(f"  results sent/stored: {report['results_sent']}/{report['results_stored']}")
+    print(f"  event-loop lag: p50 {lag['p50_ms']:.1f} ms, p99 {lag['p99_ms']:.1f} ms, max {lag['max_ms']:.1f} ms")
+    handler = report["on_new_result"]
+    if handler:
+        print(f"  on_new_result: p50 {handler['p50_ms']:.1f} ms, p95 {handler['p95_ms']:.1f} ms, "
+              f"max {handler['max_ms']:.1f} ms ({handler['count']} calls)")
+    growth = report["memory_growth_mb"]
+    print("  memory growth: " + ("n/a (install psutil)" if growth is None else f"{growth:.1f} MB"))
+    print("FAIL\n  " + "\n  ".join(failures) if failures else "PASS")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+import unittest
+import urllib.request
+import urllib.error
+from crp_desktop.db import init_db, save_result
+from crp_desktop.api import start_api_server
+
+class ApiTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+        init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        for i in range(25):
+            save_result({"ID": f"P{i:02d}", "NO.": "7", "CRP": "0.8 mg/dL"}, conn)
+        conn.close()
+        self.server = start_api_server("127.0.0.1", 0, self.db_path)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def get(self, path, headers=None):
+        req = urllib.request.Request(self.base + path, headers=headers or {})
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return resp.status, resp.headers, json.loads(resp.read() or b"null")
+
+    def test_keyset_pages_cover_all_rows(self):
+        seen = []
+        path = "/results?limit=10"
+        while True:
+            _, _, body = self.get(path)
+            seen.extend(r["id"] for r in body["results"])
+            if not body["next_cursor"]:
+                break
+            path = "/results?limit=10&cursor=" + body["next_cursor"]
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_detail_and_etag(self):
+        status, headers, body = self.get("/results/1")
+        self.assertEqual(body["payload"]["ID"], "P00")
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            self.get("/results/1", {"If-None-Match": headers["ETag"]})
+        self.assertEqual(cm.exception.code, 304)
+
+    def test_long_poll_sees_new_row(self):
+        def write_later():
+            conn = sqlite3.connect(self.db_path)
+            save_result({"ID": "NEW"}, conn)
+            conn.close()
+
+        timer = threading.Timer(0.3, write_later)
+        timer.start()
+        _, _, body = self.get("/results/wait?after_id=25&timeout=10")
+        timer.join()
+        self.assertEqual([r["patient_id"] for r in body["results"]], ["NEW"])
+        self.assertEqual(body["last_id"], 26)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import time
+import gzip
+import sqlite3
+import tempfile
+import threading
+import unittest
+from crp_desktop.db import init_db, save_result
+from crp_desktop.backup import backup_database, BackupCancelled
+
+class BackupTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+        init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        for i in range(300):
+            save_result({"ID": f"P{i}", "CRP": "0.8 mg/dL", "DATE": "01/02/24", "TIME": "10:00:00"}, conn)
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_backup_is_verified_copy(self):
+        dest = os.path.join(self.tmp.name, "copy.db")
+        info = backup_database(dest, self.db_path, pages=4, pause=0)
+        self.assertEqual(info["integrity"], "ok")
+        self.assertGreater(info["steps"], 1)
+        conn = sqlite3.connect(dest)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM crp_results").fetchone()[0], 300)
+        conn.close()
+
+    def test_failed_backup_leaves_no_part_file(self):
+        bad = os.path.join(self.tmp.name, "bad.db")
+        with open(bad, "wb") as f:
+            f.write(b"not a database" * 512)
+        dest = os.path.join(self.tmp.name, "copy.db")
+        with self.assertRaises(sqlite3.DatabaseError):
+            backup_database(dest, bad, pause=0)
+        self.assertFalse(os.path.exists(dest + ".part"))
+        self.assertFalse(os.path.exists(dest))
+
+    def test_cancel_stops_a_running_backup(self):
+        # a slow, stepped copy (a page per step) that the event cuts short
+        cancel = threading.Event()
+        dest = os.path.join(self.tmp.name, "slow.db")
+        threading.Timer(0.2, cancel.set).start()
+        start = time.monotonic()
+        with self.assertRaises(BackupCancelled):
+            backup_database(dest, self.db_path, pages=1, pause=5, cancel=cancel)
+        self.assertLess(time.monotonic() - start, 4)
+        self.assertFalse(os.path.exists(dest + ".part"))
+        self.assertFalse(os.path.exists(dest))
+
+    def test_compressed_backup_while_writing(self):
+        stop = threading.Event()
+
+        def writer():
+            conn = sqlite3.connect(self.db_path)
+            while not stop.is_set():
+                save_result({"ID": "LIVE", "CRP": "1.0 mg/dL"}, conn)
+            conn.close()
+
+        t = threading.Thread(target=writer)
+        t.start()
+        try:
+            info = backup_database(os.path.join(self.tmp.name, "live.db"), self.db_path, compress=True, pause=0)
+        finally:
+            stop.set()
+            t.join()
+        self.assertTrue(info["path"].endswith(".gz"))
+        raw = os.path.join(self.tmp.name, "restored.db")
+        with gzip.open(info["path"], "rb") as f_in, open(raw, "wb") as f_out:
+            f_out.write(f_in.read())
+        conn = sqlite3.connect(raw)
+        self.assertEqual(conn.execute("PRAGMA quick_check").fetchone()[0], "ok")
+        self.assertGreaterEqual(conn.execute("SELECT COUNT(*) FROM crp_results").fetchone()[0], 300)
+        conn.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from crp_desktop.bulk_import import BulkImporter
+from crp_desktop.db import get_read_db, ChangeFeed
+
+def make_capture(n: int, prefix: str) -> bytes:
+    frames = [f"\x02\nu {prefix}{i}\n! 6.{i % 10}\nK 0.{i % 9}\n$FB DEMO\n$FE V1\n\x03" for i in range(n)]
+    return "".join(frames).encode("latin1")
+
+class BulkImportTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+        self.src = os.path.join(self.tmp.name, "captures")
+        os.mkdir(self.src)
+        with open(os.path.join(self.src, "a.cap"), "wb") as f:
+            f.write(make_capture(120, "A"))
+        with open(os.path.join(self.src, "b.txt"), "wb") as f:
+            f.write(b"NO. 3\n! 5.1\nK 0.4\n\fNO. 4\n! 7.0\nK 1.2\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def count(self):
+        conn = sqlite3.connect(self.db_path)
+        n = conn.execute("SELECT COUNT(*) FROM crp_results").fetchone()[0]
+        conn.close()
+        return n
+
+    def test_import_is_resumable_and_idempotent(self):
+        calls = []
+
+        def stop_after_first_batch(msg):
+            calls.append(msg)
+            if len(calls) == 1:
+                raise KeyboardInterrupt
+
+        first = BulkImporter(self.db_path, workers=2, chunk_frames=10, batch_rows=30,
+                             progress=stop_after_first_batch)
+        with self.assertRaises(KeyboardInterrupt):
+            first.run([self.src])
+        partial = self.count()
+        self.assertGreater(partial, 0)
+        self.assertLess(partial, 122)
+
+        BulkImporter(self.db_path, workers=2, chunk_frames=10, batch_rows=30).run([self.src])
+        self.assertEqual(self.count(), 122)
+        BulkImporter(self.db_path, workers=2).run([self.src])
+        self.assertEqual(self.count(), 122)
+
+    def test_grown_file_continues_and_rewritten_file_is_replaced(self):
+        path = os.path.join(self.src, "a.cap")
+        with open(path, "wb") as f:
+            f.write(make_capture(3, "A"))
+        BulkImporter(self.db_path, workers=1).run([path])
+        self.assertEqual(self.count(), 3)
+        # the analyzer appends to its capture log
+        with open(path, "ab") as f:
+            f.write(make_capture(1, "B"))
+        BulkImporter(self.db_path, workers=1).run([path])
+        self.assertEqual(self.count(), 4)
+        # the file is replaced with different content: its old rows go
+        with open(path, "wb") as f:
+            f.write(make_capture(2, "C"))
+        BulkImporter(self.db_path, workers=1).run([path])
+        conn = sqlite3.connect(self.db_path)
+        ids = [r[0] for r in conn.execute("SELECT patient_id FROM crp_results ORDER BY id")]
+        conn.close()
+        self.assertEqual(ids, ["C0", "C1"])
+
+    def test_follower_sees_reimported_rows(self):
+        path = os.path.join(self.src, "a.cap")
+        with open(path, "wb") as f:
+            f.write(make_capture(3, "A"))
+        BulkImporter(self.db_path, workers=1).run([path])
+        reader = get_read_db(self.db_path)
+        feed = ChangeFeed(reader)
+        # the newest rows are deleted and replaced: their seqs must not be reused
+        with open(path, "wb") as f:
+            f.write(make_capture(2, "C"))
+        BulkImporter(self.db_path, workers=1).run([path])
+        changes = [(r["op"], r["result_id"], r["patient_id"]) for r in feed.poll()]
+        reader.close()
+        self.assertEqual(changes, [("D", 1, None), ("D", 2, None), ("D", 3, None), ("I", 4, "C0"), ("I", 5, "C1")])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from crp_desktop.db import (
+    init_db, get_db, get_read_db, save_result, refresh_flags, ChangeFeed, changes_since, last_change_seq,
+)
+
+class ChangeFeedTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+        init_db(self.db_path)
+        self.writer = get_db(self.db_path)
+        self.reader = get_read_db(self.db_path)
+
+    def tearDown(self):
+        self.writer.close()
+        self.reader.close()
+        self.tmp.cleanup()
+
+    def add(self, pid):
+        save_result({"ID": pid, "DATE": "01/02/24", "TIME": "10:05:00", "CRP": "0.3 mg/dL"}, self.writer)
+
+    def log_size(self):
+        return self.writer.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+
+    def test_follows_other_connections(self):
+        self.add("P0")
+        feed = ChangeFeed(self.reader)
+        self.assertEqual(feed.poll(), [])
+        self.add("P1")
+        self.add("P2")
+        rows = feed.poll()
+        self.assertEqual([(r["op"], r["patient_id"]) for r in rows], [("I", "P1"), ("I", "P2")])
+        self.assertEqual(feed.poll(), [])
+        self.writer.execute("UPDATE crp_results SET crp = '9 mg/dL' WHERE patient_id = 'P0'")
+        self.writer.commit()
+        rows = feed.poll()
+        self.assertEqual([(r["op"], r["patient_id"], r["crp"]) for r in rows], [("U", "P0", "9 mg/dL")])
+        self.assertEqual(feed.seq, last_change_seq(self.reader))
+
+    def test_log_is_bounded_by_row_count(self):
+        for i in range(3):
+            self.add(f"P{i}")
+        refresh_flags(self.writer)  # rewrites every row with the same values: nothing logged
+        self.assertEqual(last_change_seq(self.writer), 3)
+        self.writer.execute("UPDATE crp_results SET crp = '1 mg/dL'")
+        self.writer.execute("UPDATE crp_results SET crp = '2 mg/dL' WHERE id = 1")
+        self.writer.commit()
+        self.assertEqual(self.log_size(), 3)
+        self.assertEqual([(r["id"], r["seq"]) for r in changes_since(self.writer, 3)], [(2, 5), (3, 6), (1, 7)])
+
+    def test_one_chunk_per_poll(self):
+        for i in range(5):
+            self.add(f"P{i}")
+        feed = ChangeFeed(self.reader, seq=0, chunk=2)
+        polls = [[r["patient_id"] for r in feed.poll()] for _ in range(4)]
+        self.assertEqual(polls, [["P0", "P1"], ["P2", "P3"], ["P4"], []])
+
+    def test_backfilled_and_migrated(self):
+        for i in range(3):
+            self.add(f"P{i}")
+        # a database from before the change log: existing rows are replayed once
+        self.writer.execute("DROP TABLE change_log")
+        self.writer.commit()
+        init_db(self.db_path)
+        self.assertEqual([r["op"] for r in changes_since(self.writer, 0)], ["I"] * 3)
+        init_db(self.db_path)
+        self.assertEqual(self.log_size(), 3)
+        # the first, append-only layout keeps each row's latest seq
+        self.writer.executescript(
+            "DROP TRIGGER trg_crp_results_insert; DROP TRIGGER trg_crp_results_update; DROP TABLE change_log;"
+            "CREATE TABLE change_log (seq INTEGER PRIMARY KEY AUTOINCREMENT, result_id INTEGER NOT NULL, op TEXT NOT NULL);"
+            "INSERT INTO change_log (result_id, op) VALUES (1,'I'),(2,'I'),(3,'I'),(1,'U'),(2,'U');"
+        )
+        init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute("SELECT result_id, seq FROM change_log ORDER BY seq").fetchall(),
+                         [(3, 3), (1, 4), (2, 5)])
+        conn.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import ast
+import array
+import math
+import zipfile
+import tempfile
+import unittest
+from crp_desktop.db import init_db, get_db, save_result
+from crp_desktop.columnar import export_columnar
+from crp_desktop.timestamps import to_epoch
+
+TYPECODES = {"<f8": "d", "<i8": "q", "<i4": "i", "|u1": "B"}
+
+def read_npy(data: bytes):
+    """Minimal .npy 1.0 reader (numpy is not a dependency)."""
+    assert data[:8] == b"\x93NUMPY\x01\x00"
+    n = int.from_bytes(data[8:10], "little")
+    assert (10 + n) % 64 == 0
+    header = ast.literal_eval(data[10:10 + n].decode("latin-1"))
+    body = data[10 + n:]
+    descr = header["descr"]
+    if descr.startswith("<U"):
+        width = int(descr[2:]) * 4
+        return [body[i:i + width].decode("utf-32-le").rstrip("\0") for i in range(0, len(body), width)]
+    values = array.array(TYPECODES[descr])
+    values.frombytes(body)
+    assert len(values) == header["shape"][0]
+    return list(values)
+
+class ColumnarExportTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+        init_db(self.db_path)
+        conn = get_db(self.db_path)
+        save_result({"ID": "P1", "DATE": "01/02/24", "TIME": "10:05:00", "WBC": "6.3 10^3/uL",
+                     "CRP": "0.3 mg/dL", "InstrumentName": "CRP-A"}, conn)
+        save_result({"ID": "P2", "DATE": "01/02/24", "TIME": "11:00:00", "CRP": "25 mg/dL",
+                     "InstrumentName": "CRP-B"}, conn)
+        save_result({"ID": "P1", "DATE": "02/02/24", "TIME": "09:00:00", "WBC": "bad",
+                     "InstrumentName": "CRP-A"}, conn)
+        self.conn = conn
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_npz_columns(self):
+        path = os.path.join(self.tmp.name, "out.npz")
+        self.assertEqual(export_columnar(self.conn, path, chunk=2), 3)
+        with zipfile.ZipFile(path) as zf:
+            cols = {name[:-4]: read_npy(zf.read(name)) for name in zf.namelist()}
+        self.assertEqual(cols["id"], [3, 2, 1])  # newest first
+        self.assertEqual(cols["ts"][2], to_epoch("2024-02-01 10:05:00"))
+        self.assertTrue(math.isnan(cols["crp"][0]))
+        self.assertEqual(cols["crp"][1:], [25.0, 0.3])
+        self.assertTrue(math.isnan(cols["wbc"][0]))
+        self.assertEqual(cols["wbc"][2], 6.3)
+        self.assertEqual(cols["patient_id_values"], ["P1", "P2"])
+        self.assertEqual(cols["patient_id"], [0, 1, 0])
+        self.assertEqual([cols["instrument_values"][c] for c in cols["instrument"]], ["CRP-A", "CRP-B", "CRP-A"])
+        self.assertEqual(cols["critical"], [0, 1, 0])
+
+    def test_npy_directory(self):
+        path = os.path.join(self.tmp.name, "cols")
+        self.assertEqual(export_columnar(self.conn, path, start="2024-02-02", end="2024-02-02"), 1)
+        with open(os.path.join(path, "id.npy"), "rb") as f:
+            self.assertEqual(read_npy(f.read()), [3])
+
+if __name__ == "__main__":
+    unittest.main()
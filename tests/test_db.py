@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from crp_desktop.db import init_db, get_db, save_result, query_results, iter_results
+
+class PaginationTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+        init_db(self.db_path)
+        self.conn = get_db(self.db_path)
+        # three rows per timestamp so the id tie-breaker matters
+        for i in range(30):
+            save_result({"ID": f"P{i:02d}", "NO.": "7", "DATE": f"{1 + i // 3:02d}/03/24", "TIME": "08:00:00"}, self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_next_and_prev_pages(self):
+        pages = []
+        page = query_results(self.conn, limit=7)
+        self.assertIsNone(page.prev_cursor)
+        pages.append([r["id"] for r in page.rows])
+        while page.next_cursor:
+            page = query_results(self.conn, cursor=page.next_cursor, limit=7)
+            pages.append([r["id"] for r in page.rows])
+        ids = [i for p in pages for i in p]
+        self.assertEqual(ids, list(range(30, 0, -1)))
+        # walk back from the last page
+        back = query_results(self.conn, cursor=page.prev_cursor, direction="prev", limit=7)
+        self.assertEqual([r["id"] for r in back.rows], pages[-2])
+        self.assertIsNotNone(back.next_cursor)
+
+    def test_date_filter_uses_index_range(self):
+        rows = list(iter_results(self.conn, start="2024-03-02", end="2024-03-03", chunk=2))
+        self.assertEqual(sorted(r["patient_id"] for r in rows), ["P03", "P04", "P05", "P06", "P07", "P08"])
+        plan = self.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM crp_results "
+            "WHERE COALESCE(measure_datetime, created_at) >= ? AND COALESCE(measure_datetime, created_at) < ? "
+            "ORDER BY COALESCE(measure_datetime, created_at) DESC, id DESC LIMIT 10",
+            ("2024-03-02", "2024-03-04"),
+        ).fetchall()
+        detail = " ".join(r[3] for r in plan)
+        self.assertIn("idx_crp_results_ts", detail)
+        self.assertNotIn("TEMP B-TREE", detail)
+
+if __name__ == "__main__":
+    unittest.main()
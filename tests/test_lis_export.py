@@ -0,0 +1,167 @@
+import os
+import time
+import socket
+import tempfile
+import threading
+import unittest
+from crp_desktop.db import init_db, get_db, save_result
+from crp_desktop.lis_export import LisSender, build_oru, parse_ack, hl7_escape
+
+class FakeLis(threading.Thread):
+    """Stand-in MLLP listener: ACKs every message with the next code from `codes` (then AA)."""
+    def __init__(self, codes=()):
+        super().__init__(daemon=True)
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        self.codes = list(codes)
+        # cleared: messages are received but not ACKed until it is set
+        self.gate = threading.Event()
+        self.gate.set()
+        self.messages = []
+        self.connections = 0
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def serve(self, conn):
+        buf = b""
+        with conn:
+            while True:
+                data = conn.recv(4096)
+                if not data:
+                    return
+                buf += data
+                while b"\x1c\x0d" in buf:
+                    frame, buf = buf.split(b"\x1c\x0d", 1)
+                    msg = frame.lstrip(b"\x0b").decode("utf-8")
+                    self.messages.append(msg)
+                    control_id = msg.split("\r")[0].split("|")[9]
+                    self.gate.wait()
+                    code = self.codes.pop(0) if self.codes else "AA"
+                    ack = f"MSH|^~\\&|LIS||||||ACK|A{control_id}|P|2.5.1\rMSA|{code}|{control_id}\r"
+                    conn.sendall(b"\x0b" + ack.encode("utf-8") + b"\x1c\x0d")
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # wakes the blocked accept()
+        except OSError:
+            pass
+        self.sock.close()
+
+class LisExportTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+        init_db(self.db_path)
+        self.conn = get_db(self.db_path)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def add(self, n, start=0):
+        for i in range(start, start + n):
+            save_result({"ID": f"P{i}", "DATE": "01/02/24", "TIME": "10:05:00",
+                         "WBC": "6.2 10^3/uL", "CRP": "3.1 mg/dL"}, self.conn)
+
+    def test_build_oru(self):
+        self.add(1)
+        row = self.conn.execute("SELECT * FROM crp_results").fetchone()
+        segments = build_oru(row, "CRP1").rstrip("\r").split("\r")
+        self.assertTrue(segments[0].startswith("MSH|^~\\&|CRP_DESKTOP|"))
+        self.assertEqual(segments[0].split("|")[9], "CRP1")
+        self.assertEqual(segments[1], "PID|1||P0")
+        self.assertIn("|20240201100500", segments[2])
+        self.assertEqual(segments[3], "OBX|1|NM|WBC^WBC||6.2|10\\S\\3/uL|4 - 10||||F|||20240201100500")
+        self.assertEqual(segments[4].split("|")[5:9], ["3.1", "mg/dL", "0 - 0.5", "H"])
+        self.assertEqual(hl7_escape("a|b^c"), "a\\F\\b\\S\\c")
+        self.assertEqual(parse_ack("MSH|x\rMSA|AE|CRP1|bad\r"), ("AE", "CRP1"))
+
+    def test_sends_new_results_in_batches(self):
+        self.add(2)  # already in the database before the sender starts: not sent
+        lis = FakeLis()
+        lis.start()
+        sender = LisSender("127.0.0.1", lis.port, self.db_path, batch=3)
+        try:
+            self.assertEqual(sender.enqueue_new(), 0)
+            self.add(5, start=2)
+            self.assertEqual(sender.enqueue_new(), 5)
+            self.assertEqual(sender.send_due(), 3)
+            self.assertEqual(sender.send_due(), 2)
+            self.assertEqual(sender.send_due(), 0)
+            self.assertEqual(sender.outbox.counts(), {"sent": 5})
+            self.assertEqual([m.split("\r")[1] for m in lis.messages], [f"PID|1||P{i}" for i in range(2, 7)])
+            self.assertEqual(lis.connections, 1)  # pooled connection reused across batches
+        finally:
+            sender.pool.close()
+            sender.outbox.close()
+            sender.read_conn.close()
+            lis.close()
+
+    def test_rejected_and_unreachable_are_retried(self):
+        lis = FakeLis(codes=["AA", "AE"])
+        lis.start()
+        sender = LisSender("127.0.0.1", lis.port, self.db_path, start_id=0)
+        try:
+            self.add(2)
+            sender.enqueue_new()
+            self.assertEqual(sender.send_due(), 1)
+            self.assertEqual(sender.outbox.counts(), {"sent": 1, "pending": 1})
+            self.assertEqual(sender.send_due(), 0)  # backing off
+            row = sender.outbox.conn.execute("SELECT attempts, last_error FROM outbox WHERE status='pending'").fetchone()
+            self.assertEqual(tuple(row), (1, "rejected by LIS: AE"))
+            # the LIS goes away: the message stays queued and backs off again
+            lis.close()
+            sender.pool.close()
+            sender.outbox.conn.execute("UPDATE outbox SET next_attempt_at = 0")
+            self.assertEqual(sender.send_due(), 0)
+            self.assertEqual(sender.outbox.conn.execute("SELECT MAX(attempts) FROM outbox").fetchone()[0], 2)
+        finally:
+            sender.pool.close()
+            sender.outbox.close()
+            sender.read_conn.close()
+
+    def test_restart_mid_batch_does_not_resend(self):
+        lis = FakeLis()
+        lis.gate.clear()
+        lis.start()
+        old = LisSender("127.0.0.1", lis.port, self.db_path, start_id=0, batch=3)
+        new = LisSender("127.0.0.1", lis.port, self.db_path, batch=3)
+        try:
+            self.add(3)
+            old.enqueue_new()
+            sent = []
+            waiting = threading.Thread(target=lambda: sent.append(old.send_due()))
+            waiting.start()
+            deadline = time.monotonic() + 5
+            while not lis.messages and time.monotonic() < deadline:
+                time.sleep(0.01)
+            # the settings changed: a new sender takes over while the old one waits for ACKs
+            old.stop()
+            self.assertEqual(new.enqueue_new(), 0)
+            self.assertEqual(new.send_due(), 0)
+            lis.gate.set()
+            waiting.join(5)
+            self.assertEqual(sent, [3])
+            self.assertEqual(new.send_due(), 0)
+            self.assertEqual(len(lis.messages), 3)
+            self.assertEqual(new.outbox.counts(), {"sent": 3})
+        finally:
+            lis.gate.set()
+            for sender in (old, new):
+                sender.pool.close()
+                sender.outbox.close()
+                if sender.read_conn is not None:
+                    sender.read_conn.close()
+            lis.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import json
+import tempfile
+import unittest
+from crp_desktop.metrics import Metrics, percentile
+
+class MetricsTests(unittest.TestCase):
+    def test_percentiles(self):
+        vals = sorted(float(i) for i in range(1, 101))
+        self.assertEqual(percentile(vals, 50), 50.0)
+        self.assertEqual(percentile(vals, 95), 95.0)
+        self.assertEqual(percentile(vals, 99), 99.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_disabled_records_nothing(self):
+        m = Metrics(enabled=False)
+        with m.timer("x"):
+            pass
+        m.incr("c")
+        m.timed("f")(lambda: None)()
+        self.assertEqual(m.snapshot(), [])
+
+    def test_ring_buffer_and_dump(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "m.jsonl")
+            m = Metrics(enabled=True, ring_size=10, dump_path=path)
+            for i in range(25):
+                m.record("db.save_result", i / 1000.0)
+            m.incr("serial.bytes", 7)
+            m.close_dump()
+            snap = {s["name"]: s for s in m.snapshot()}
+            self.assertEqual(snap["db.save_result"]["count"], 25)
+            self.assertEqual(len(m.samples["db.save_result"]), 10)
+            self.assertAlmostEqual(snap["db.save_result"]["max_ms"], 24.0)
+            self.assertEqual(snap["serial.bytes"]["count"], 7)
+            with open(path, encoding="utf-8") as f:
+                lines = [json.loads(ln) for ln in f]
+            self.assertEqual(len(lines), 25)
+            self.assertEqual(lines[0]["metric"], "db.save_result")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,10 @@
+import os
+import pickle
+import tempfile
 import unittest
-from crp_desktop.parser import extract_fields_from_block
+from crp_desktop.parser import extract_fields_from_block, iter_frames, iter_results, FrameAssembler
+from crp_desktop.record import Result
+from crp_desktop.db import init_db, get_db, save_result
 
 class ParserTests(unittest.TestCase):
     def test_basic_packet(self):
@@ -13,5 +18,50 @@ class ParserTests(unittest.TestCase):
         self.assertEqual(parsed.get('CRP'), '0.8 mg/dL')
         self.assertEqual(parsed.get('InstrumentName'), 'MyInstrument')
 
+    def test_result_record(self):
+        parsed = extract_fields_from_block("! 6.23\nK 0.8\nW 1 2 3\nZ odd\nhello there\n$FB Inst\n")
+        self.assertIsInstance(parsed, Result)
+        self.assertEqual(parsed.wbc, "6.23 10^3/uL")
+        self.assertEqual(parsed["CRP"], parsed.get("crp"))
+        self.assertEqual(parsed.get("WBC_HIST"), "1")
+        self.assertEqual(parsed.get("TOK:Z"), "odd")
+        self.assertEqual(parsed.get("MISC"), ["hello there"])
+        self.assertNotIn("HGB", parsed)
+        self.assertEqual(pickle.loads(pickle.dumps(parsed)), parsed)
+        self.assertEqual(Result.from_mapping(parsed.to_dict()), parsed)
+
+    def test_result_round_trips_through_db(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "crp_results.db")
+            init_db(path)
+            conn = get_db(path)
+            parsed = extract_fields_from_block("NO. 12\n01/02/24 10h05mn00s\nu PAT1\n! 6.2\nK 0.8\nfree text\n")
+            save_result(parsed, conn)
+            self.assertEqual(parsed.id, 1)
+            row = conn.execute("SELECT * FROM crp_results").fetchone()
+            conn.close()
+        back = Result.from_row(row)
+        self.assertEqual(back.get("ID"), "PAT1")
+        self.assertEqual(back.get("CRP"), "0.8 mg/dL")
+        self.assertEqual(back.get("MISC"), ["NO. 12", "01/02/24 10h05mn00s", "free text"])
+        self.assertEqual(row["measure_datetime"], "2024-02-01 10:05:00")
+
+    def test_streaming_matches_whole_input(self):
+        stream = b"noise\x02! 6.3\nK 0.7 CRP\n$FE V1\n\x03\x02! 5.0\nK 1.1\n\x03NO. 9\n! 4.4\n\f"
+        whole = [r.to_dict() for r in iter_results([stream])]
+        byte_by_byte = [r.to_dict() for r in iter_results(stream[i:i + 1] for i in range(len(stream)))]
+        self.assertEqual(whole, byte_by_byte)
+        self.assertEqual([r["CRP"] for r in whole[:2]], ["0.7 mg/dL", "1.1 mg/dL"])
+        self.assertEqual(whole[2]["WBC"], "4.4 10^3/uL")
+        self.assertEqual(len(whole), 3)
+
+    def test_frame_assembler_is_bounded(self):
+        asm = FrameAssembler(max_buffer=100)
+        for _ in range(50):
+            self.assertEqual(asm.feed(b"x" * 10), [])
+        self.assertLessEqual(len(asm.buffer), 100)
+        self.assertEqual(asm.dropped, 400)
+        self.assertEqual(list(iter_frames([b"\x02! 1\n", b"\x03"])), ["! 1\n"])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,68 @@
+import threading
+import unittest
+from crp_desktop.port_probe import score_bytes, probe_port, discover, printable_fraction
+
+SAMPLE = b"\x02\n! 6.23\n2 4.5\n3 13.2\nK 0.8\n$FB MyInstrument\n$FE v1\n\x03"
+
+def garble(data: bytes) -> bytes:
+    # roughly what a wrong baud rate turns text into
+    return bytes((b * 37 + 0x81) & 0xFF for b in data)
+
+class FakeSerial:
+    """Sends SAMPLE when opened at the analyzer's baud rate, noise otherwise."""
+    def __init__(self, baud, right_baud, opened):
+        self.data = SAMPLE if baud == right_baud else garble(SAMPLE)
+        opened.append(baud)
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def read(self, n):
+        out, self.data = self.data[:n], self.data[n:]
+        return out
+
+    def close(self):
+        pass
+
+class PortProbeTests(unittest.TestCase):
+    def test_scoring(self):
+        self.assertEqual(score_bytes(SAMPLE), 1.0)
+        self.assertLess(score_bytes(garble(SAMPLE)), 0.3)
+        self.assertEqual(score_bytes(b""), 0.0)
+        self.assertEqual(printable_fraction(b"ab\xff\xfe"), 0.5)
+        # plain printer output without STX/ETX still scores as a result
+        self.assertGreaterEqual(score_bytes(b"NO. 9\n! 4.4\nK 1.1\n2 4.0\n"), 0.6)
+
+    def test_probe_port_stops_at_the_right_baud(self):
+        opened = []
+        result = probe_port("COM3", [9600, 4800, 19200, 38400], seconds=0.2,
+                            open_port=lambda port, baud: FakeSerial(baud, 19200, opened))
+        self.assertEqual((result.port, result.baud, result.score), ("COM3", 19200, 1.0))
+        self.assertEqual(opened, [9600, 4800, 19200])
+
+    def test_discover_probes_ports_concurrently(self):
+        # COM1 and COM4 each wait at the barrier on their first open; a serial
+        # probe would time out there instead of seeing the other port open
+        barrier = threading.Barrier(2, timeout=5)
+        overlapped = []
+
+        def open_port(port, baud):
+            if port == "COM9":
+                return None  # busy
+            if port not in overlapped:
+                try:
+                    barrier.wait()
+                    overlapped.append(port)
+                except threading.BrokenBarrierError:
+                    pass
+            return FakeSerial(baud, 4800 if port == "COM4" else None, [])
+
+        results = discover(["COM1", "COM4", "COM9"], [9600, 4800], seconds=0.2,
+                           preferred={"COM4": 4800}, open_port=open_port)
+        self.assertEqual((results[0].port, results[0].baud), ("COM4", 4800))
+        self.assertEqual(results[-1].baud, None)
+        self.assertEqual(sorted(overlapped), ["COM1", "COM4"])
+
+if __name__ == "__main__":
+    unittest.main()
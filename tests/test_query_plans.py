@@ -0,0 +1,127 @@
+"""
+Query-plan and latency regression suite on a synthetic database.
+
+    CRP_PERF_ROWS=1000000 python -m pytest tests/test_query_plans.py   # bigger fixture
+    CRP_PERF_DB=big.db python -m pytest tests/test_query_plans.py      # reuse a built one
+    CRP_PERF_UPDATE_BASELINE=1 python -m pytest tests/test_query_plans.py
+
+Every SELECT the list/detail/export code runs is captured with a trace
+callback and checked with EXPLAIN QUERY PLAN: no table scan without an
+index and no temp B-tree for ORDER BY. Latencies are compared with
+query_baseline.json when it was recorded at the same row count; that check
+only runs when one of the CRP_PERF_* variables asks for a perf run, so the
+default test run stays independent of machine speed.
+"""
+import os
+import re
+import json
+import time
+import tempfile
+import unittest
+from datetime import date, timedelta
+from crp_desktop.db import (
+    get_db, today_results, query_results, iter_results, get_result, results_after,
+    max_result_id, flagged_results,
+)
+from crp_desktop.synth_db import build_database
+
+ROWS = int(os.environ.get("CRP_PERF_ROWS", "20000"))
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "query_baseline.json")
+# allowed slowdown against the baseline: factor plus absolute slack for timer noise
+LATENCY_FACTOR = 3.0
+LATENCY_SLACK_MS = 10.0
+PERF_RUN = any(os.environ.get(v) for v in ("CRP_PERF_DB", "CRP_PERF_ROWS", "CRP_PERF_UPDATE_BASELINE"))
+
+BAD_PLAN = re.compile(r"^SCAN \w+( AS \w+)?$|TEMP B-TREE")
+
+def query_catalog(conn) -> dict:
+    """name -> callable running one query path the GUI/API/export use."""
+    today = date.today()
+    week_ago = (today - timedelta(days=6)).isoformat()
+    month_ago = (today - timedelta(days=30)).isoformat()
+    last_id = max_result_id(conn)
+    first_page = query_results(conn, start=week_ago, end=today.isoformat())
+    return {
+        "today": lambda: today_results(conn),
+        "browse_first_page": lambda: query_results(conn),
+        "search_week": lambda: query_results(conn, start=week_ago, end=today.isoformat(), patient="P0001", instrument="1"),
+        "search_next_page": lambda: query_results(conn, start=week_ago, end=today.isoformat(), cursor=first_page.next_cursor),
+        "search_prev_page": lambda: query_results(conn, start=week_ago, end=today.isoformat(),
+                                                  cursor=first_page.next_cursor, direction="prev"),
+        "export_month": lambda: sum(1 for _ in iter_results(conn, start=month_ago, end=today.isoformat())),
+        "detail": lambda: get_result(conn, last_id // 2),
+        "critical_crp_month": lambda: flagged_results(conn, "crp", start=month_ago, end=today.isoformat()),
+        "critical_any_month": lambda: flagged_results(conn, start=month_ago, end=today.isoformat()),
+        "changes_after": lambda: results_after(conn, last_id - 100),
+        "max_id": lambda: max_result_id(conn),
+    }
+
+class QueryPlanTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = None
+        path = os.environ.get("CRP_PERF_DB")
+        if not path:
+            cls.tmp = tempfile.TemporaryDirectory()
+            path = os.path.join(cls.tmp.name, "synthetic.db")
+            build_database(path, ROWS, seed=1)
+        cls.conn = get_db(path)
+        cls.rows = cls.conn.execute("SELECT COUNT(*) FROM crp_results").fetchone()[0]
+        cls.catalog = query_catalog(cls.conn)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        if cls.tmp:
+            cls.tmp.cleanup()
+
+    def traced(self, fn) -> list:
+        statements = []
+        self.conn.set_trace_callback(statements.append)
+        try:
+            fn()
+        finally:
+            self.conn.set_trace_callback(None)
+        return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+    def test_plans_use_indexes(self):
+        for name, fn in self.catalog.items():
+            statements = self.traced(fn)
+            self.assertTrue(statements, name)
+            for sql in statements:
+                plan = [r[3] for r in self.conn.execute("EXPLAIN QUERY PLAN " + sql)]
+                bad = [line for line in plan if BAD_PLAN.search(line)]
+                self.assertFalse(bad, f"{name}: {sql}\n" + "\n".join(plan))
+
+    @unittest.skipUnless(PERF_RUN, "set CRP_PERF_ROWS or CRP_PERF_DB to check latencies")
+    def test_latency_against_baseline(self):
+        timings = {}
+        for name, fn in self.catalog.items():
+            best = None
+            for _ in range(3):
+                start = time.perf_counter()
+                fn()
+                elapsed = (time.perf_counter() - start) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = round(best, 3)
+        if os.environ.get("CRP_PERF_UPDATE_BASELINE"):
+            with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+                json.dump({"rows": self.rows, "queries_ms": timings}, f, indent=2, sort_keys=True)
+                f.write("\n")
+            self.skipTest(f"baseline written for {self.rows} rows")
+        try:
+            with open(BASELINE_PATH, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            self.skipTest("no baseline; run with CRP_PERF_UPDATE_BASELINE=1")
+        if baseline["rows"] != self.rows:
+            self.skipTest(f"baseline is for {baseline['rows']} rows, fixture has {self.rows}")
+        slow = []
+        for name, ms in timings.items():
+            base = baseline["queries_ms"].get(name)
+            if base is not None and ms > base * LATENCY_FACTOR + LATENCY_SLACK_MS:
+                slow.append(f"{name}: {ms:.1f} ms (baseline {base:.1f} ms)")
+        self.assertFalse(slow, "\n".join(slow))
+
+if __name__ == "__main__":
+    unittest.main()
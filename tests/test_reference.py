@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from crp_desktop.db import init_db, get_db, save_result, save_results, flagged_results
+from crp_desktop.reference import ReferenceRanges, parse_value, parse_flags, format_flags
+from crp_desktop.parser import extract_fields_from_block
+
+class ReferenceRangeTests(unittest.TestCase):
+    def test_lookup_prefers_specific_rows(self):
+        ranges = ReferenceRanges()
+        self.assertEqual(ranges.lookup("hgb").low, 12.0)
+        self.assertEqual(ranges.lookup("hgb", "M", 40).low, 13.5)
+        self.assertEqual(ranges.lookup("hgb", "F", 40).low, 12.0)
+        self.assertEqual(ranges.lookup("hgb", "F", 40).high, 15.5)
+        # a child falls back to the catch-all row
+        self.assertEqual(ranges.lookup("hgb", "M", 10).low, 12.0)
+        self.assertIsNone(ranges.lookup("nope"))
+        self.assertEqual(ranges.describe("wbc"), "4 - 10")
+
+    def test_evaluate_and_columns_agree(self):
+        ranges = ReferenceRanges()
+        self.assertEqual(parse_value("6.23 10^3/uL"), 6.23)
+        self.assertIsNone(parse_value("---"))
+        rows = [
+            {"wbc": "2.5 10^3/uL", "crp": "12 mg/dL", "hgb": None},
+            {"wbc": "6.0 10^3/uL", "crp": "0.2 mg/dL", "hgb": "6.1 g/dL"},
+            {"wbc": "1.0", "crp": "0.9", "hgb": "---"},
+        ]
+        batch = ranges.evaluate_columns(rows)
+        self.assertEqual(batch, [ranges.evaluate(r) for r in rows])
+        self.assertEqual(batch[0], {"wbc": "L", "crp": "HH"})
+        self.assertEqual(batch[1], {"hgb": "LL"})
+        self.assertEqual(format_flags(batch[2]), "WBC:LL CRP:H")
+        self.assertEqual(parse_flags("WBC:LL CRP:H"), batch[2])
+
+class FlagStorageTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_flags_stored_at_ingestion(self):
+        init_db(self.db_path)
+        conn = get_db(self.db_path)
+        parsed = extract_fields_from_block("01/02/24 10h05mn00s\n! 6.2\nK 15.0\n")
+        save_result(parsed, conn)
+        self.assertEqual(parsed.flags, "CRP:HH")
+        save_results([
+            {"DATE": "01/02/24", "TIME": "11:00:00", "CRP": "0.7 mg/dL"},
+            {"DATE": "02/02/24", "TIME": "09:00:00", "CRP": "0.1 mg/dL", "WBC": "1.0 10^3/uL"},
+        ], conn)
+        row = conn.execute("SELECT flags, abnormal, critical FROM crp_results WHERE id = 1").fetchone()
+        self.assertEqual(tuple(row), ("CRP:HH", 1, 1))
+        crit_crp = flagged_results(conn, "crp", start="2024-02-01", end="2024-02-01")
+        self.assertEqual([r["id"] for r in crit_crp], [1])
+        high_crp = flagged_results(conn, "crp", flags=("H", "HH"))
+        self.assertEqual([r["id"] for r in high_crp], [2, 1])
+        self.assertEqual([r["id"] for r in flagged_results(conn)], [3, 1])
+        plan = " ".join(r[3] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT result_id FROM result_flags "
+            "WHERE analyte = 'crp' AND flag = 'HH' AND ts >= '2024-02-01' AND ts < '2024-02-02'"
+        ))
+        self.assertIn("idx_result_flags_analyte", plan)
+        conn.close()
+
+    def test_batch_insert_assigns_ids_and_flags(self):
+        init_db(self.db_path)
+        conn = get_db(self.db_path)
+        save_result({"CRP": "0.1 mg/dL"}, conn)
+        batch = [extract_fields_from_block(f"u P{i}\nK {v}\n") for i, v in enumerate(("0.1", "15.0", "0.7"))]
+        self.assertEqual(save_results(batch, conn), 3)
+        self.assertEqual([(r.id, r.flags) for r in batch], [(2, ""), (3, "CRP:HH"), (4, "CRP:H")])
+        rows = conn.execute("SELECT id, patient_id FROM crp_results WHERE id > 1 ORDER BY id").fetchall()
+        self.assertEqual([tuple(r) for r in rows], [(2, "P0"), (3, "P1"), (4, "P2")])
+        flags = conn.execute("SELECT result_id, flag FROM result_flags ORDER BY result_id").fetchall()
+        self.assertEqual([tuple(r) for r in flags], [(3, "HH"), (4, "H")])
+        conn.close()
+
+    def test_old_database_is_backfilled(self):
+        # a database from before flags existed: same table without the flag columns
+        init_db(self.db_path)
+        conn = get_db(self.db_path)
+        save_result({"CRP": "3.0 mg/dL"}, conn)
+        conn.execute("DELETE FROM result_flags")
+        conn.execute("DROP INDEX idx_crp_results_critical")
+        conn.execute("DROP TRIGGER trg_crp_results_update")  # the change log came later too
+        for col in ("flags", "abnormal", "critical"):
+            conn.execute(f"ALTER TABLE crp_results DROP COLUMN {col}")
+        conn.commit()
+        conn.close()
+        init_db(self.db_path)
+        conn = get_db(self.db_path)
+        self.assertEqual(tuple(conn.execute("SELECT flags, critical FROM crp_results").fetchone()), ("CRP:H", 0))
+        self.assertEqual(len(flagged_results(conn, "crp", flags=("H",))), 1)
+        conn.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from crp_desktop.db import init_db, get_db, save_result
+from crp_desktop.replication import (
+    DirectoryTransport, ReplicationSource, CentralReplica, decode_batch, state_path,
+)
+
+class ReplicationTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.transport = DirectoryTransport(os.path.join(self.tmp.name, "sync"))
+        self.central = CentralReplica(os.path.join(self.tmp.name, "central.db"), self.transport)
+        self.sources = {}
+
+    def tearDown(self):
+        for source, conn in self.sources.values():
+            source.close()
+            conn.close()
+        self.central.close()
+        self.tmp.cleanup()
+
+    def source(self, name, batch_rows=1000):
+        path = os.path.join(self.tmp.name, f"{name}.db")
+        init_db(path)
+        src = ReplicationSource(name, self.transport, path, batch_rows=batch_rows)
+        self.sources[name] = (src, get_db(path))
+        return src, self.sources[name][1]
+
+    def add(self, conn, n, start=0):
+        for i in range(start, start + n):
+            save_result({"ID": f"P{i}", "DATE": "01/02/24", "TIME": "10:05:00", "CRP": "0.3 mg/dL"}, conn)
+
+    def central_rows(self):
+        return self.central.conn.execute(
+            "SELECT source_id, source_row_id, patient_id, crp FROM central_results ORDER BY source_id, source_row_id"
+        ).fetchall()
+
+    def test_ships_only_changes(self):
+        a, conn_a = self.source("a", batch_rows=2)
+        b, conn_b = self.source("b")
+        self.add(conn_a, 3)
+        self.add(conn_b, 1)
+        self.assertEqual(a.ship(), 3)
+        self.assertEqual(b.ship(), 1)
+        self.assertEqual(len(self.transport.pending("a")), 2)
+        self.assertEqual(self.central.apply_pending(), {"a": 3, "b": 1})
+        self.assertEqual(len(self.central_rows()), 4)
+        self.assertEqual(a.ship(), 0)
+
+        conn_a.execute("UPDATE crp_results SET crp = '9 mg/dL' WHERE id = 2")
+        conn_a.commit()
+        self.add(conn_a, 1, start=3)
+        self.assertEqual(a.ship(), 2)
+        batch = decode_batch(self.transport.read(self.transport.pending("a")[0]))
+        self.assertEqual(sorted(r[0] for r in batch["rows"]), [2, 4])
+        self.central.apply_pending()
+        rows = [tuple(r) for r in self.central_rows()]
+        self.assertIn(("a", 2, "P1", "9 mg/dL"), rows)
+        self.assertEqual(len(rows), 5)
+        lag = {r["source_id"]: r for r in self.central.lag_report()}
+        self.assertEqual((lag["a"]["seq_behind"], lag["a"]["pending_batches"], lag["a"]["rows_applied"]), (0, 0, 5))
+
+    def test_deletes_are_replicated(self):
+        a, conn_a = self.source("a")
+        self.add(conn_a, 3)
+        a.ship()
+        self.central.apply_pending()
+        conn_a.execute("DELETE FROM crp_results WHERE id = 3")
+        conn_a.commit()
+        self.add(conn_a, 1, start=3)
+        self.assertEqual(a.ship(), 2)
+        batch = decode_batch(self.transport.read(self.transport.pending("a")[0]))
+        self.assertEqual(([r[0] for r in batch["rows"]], batch["deleted"]), ([4], [3]))
+        self.assertEqual(self.central.apply_pending(), {"a": 2})
+        self.assertEqual([r["source_row_id"] for r in self.central_rows()], [1, 2, 4])
+
+    def test_restored_or_replaced_database_is_reshipped(self):
+        a, conn_a = self.source("a")
+        self.add(conn_a, 3)
+        a.ship()
+        snapshot = sqlite3.connect(":memory:")
+        conn_a.backup(snapshot)
+        self.add(conn_a, 2, start=3)
+        a.ship()
+        self.central.apply_pending()
+        self.assertEqual(len(self.central_rows()), 5)
+
+        # restored from the backup: the log is behind the mark, rows 4 and 5 are gone
+        snapshot.backup(conn_a)
+        snapshot.close()
+        self.add(conn_a, 1, start=9)
+        self.assertEqual(a.ship(), 4)
+        self.assertEqual(self.central.apply_pending(), {"a": 4})
+        self.assertEqual([(r["source_row_id"], r["patient_id"]) for r in self.central_rows()],
+                         [(1, "P0"), (2, "P1"), (3, "P2"), (4, "P9")])
+
+        # a different database under the same mark, already past it
+        other = os.path.join(self.tmp.name, "other.db")
+        init_db(other)
+        conn = get_db(other)
+        self.add(conn, 6, start=20)
+        conn.close()
+        b = ReplicationSource("a", self.transport, other, state_db=state_path(os.path.join(self.tmp.name, "a.db")))
+        self.assertEqual(b.ship(), 6)
+        b.close()
+        self.central.apply_pending()
+        self.assertEqual([r["patient_id"] for r in self.central_rows()], [f"P{i}" for i in range(20, 26)])
+
+    def test_reapply_and_gaps(self):
+        a, conn_a = self.source("a", batch_rows=2)
+        self.add(conn_a, 4)
+        a.ship()
+        first, second = self.transport.pending("a")
+        data = self.transport.read(first)
+        # the second batch alone waits for the first
+        os.rename(first, first + ".held")
+        self.assertEqual(self.central.apply_pending(), {})
+        os.rename(first + ".held", first)
+        self.assertEqual(self.central.apply_pending(), {"a": 4})
+        # a batch delivered twice changes nothing
+        self.transport.send("a", os.path.basename(first), data)
+        self.assertEqual(self.central.apply_pending(), {"a": 0})
+        self.assertEqual(len(self.central_rows()), 4)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import threading
+import unittest
+from crp_desktop.db import init_db, get_db, save_result
+from crp_desktop.report_service import ReportRenderService, report_fingerprint
+
+class ReportServiceTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        init_db(self.db_path)
+        conn = get_db(self.db_path)
+        for i in range(3):
+            save_result({"ID": f"P{i}", "CRP": "0.8 mg/dL"}, conn)
+        conn.close()
+        self.renders = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fake_render(self, row, settings, out_path):
+        self.renders.append(row["id"])
+        with open(out_path, "wb") as f:
+            f.write(f"{row['patient_id']} {settings['clinic_name']}".encode("utf-8"))
+
+    def service(self, **kw):
+        return ReportRenderService({"clinic_name": "A"}, self.db_path, self.cache_dir,
+                                   render=self.fake_render, **kw)
+
+    def test_fingerprint_ignores_unrelated_settings(self):
+        base = report_fingerprint({"clinic_name": "A"})
+        self.assertEqual(base, report_fingerprint({"clinic_name": "A", "backup_dir": "x"}))
+        self.assertNotEqual(base, report_fingerprint({"clinic_name": "B"}))
+
+    def test_prerender_then_export_is_a_copy(self):
+        done = []
+        finished = threading.Event()
+        svc = self.service(done=lambda info: (done.append(info), finished.set()))
+        svc.prerender(2)
+        dest = os.path.join(self.tmp.name, "out.pdf")
+        self.assertFalse(svc.export(1, dest))  # not cached yet: rendered ahead of the pre-render
+        svc.stop()
+        svc.start()
+        self.assertTrue(finished.wait(5))
+        svc.join(5)
+        self.assertEqual(done, [{"result_id": 1, "path": dest, "error": None}])
+        self.assertEqual(self.renders, [1])  # the queued pre-render was dropped on stop
+        with open(dest, "rb") as f:
+            self.assertEqual(f.read(), b"P0 A")
+
+        svc = self.service()
+        svc.render_one(2)
+        self.assertTrue(svc.export(2, dest))
+        self.assertTrue(svc.export(2, dest))
+        self.assertEqual(self.renders, [1, 2])
+        svc.set_settings({"clinic_name": "B"})
+        self.assertIsNone(svc.cached(2))
+        with self.assertRaises(LookupError):
+            svc.render_one(99)
+        svc.close()
+
+    def test_cache_is_pruned(self):
+        svc = self.service(max_files=2)
+        for i in (1, 2, 3):
+            svc.render_one(i)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        svc.close()
+
+    def test_edited_row_is_rendered_again(self):
+        svc = self.service()
+        first = svc.render_one(1)
+        self.assertEqual(svc.cached(1), first)
+        conn = get_db(self.db_path)
+        conn.execute("UPDATE crp_results SET patient_id = 'P9' WHERE id = 1")
+        conn.commit()
+        conn.close()
+        self.assertIsNone(svc.cached(1))
+        second = svc.render_one(1)
+        self.assertNotEqual(first, second)
+        with open(second, "rb") as f:
+            self.assertEqual(f.read(), b"P9 A")
+        svc.close()
+
+    def test_failed_render_leaves_no_part_file(self):
+        def broken(row, settings, out_path):
+            with open(out_path, "wb") as f:
+                f.write(b"half")
+            raise RuntimeError("printer setup failed")
+        svc = ReportRenderService({"clinic_name": "A"}, self.db_path, self.cache_dir, render=broken)
+        with self.assertRaises(RuntimeError):
+            svc.render_one(1)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        svc.close()
+
+if __name__ == "__main__":
+    unittest.main()
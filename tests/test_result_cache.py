@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from crp_desktop.db import init_db, get_db, save_result
+from crp_desktop.result_cache import ResultCache
+
+class ResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+        init_db(self.db_path)
+        writer = get_db(self.db_path)
+        for i in range(20):
+            save_result({"ID": f"P{i}", "CRP": "0.8 mg/dL", "MISC": ["x" * 200]}, writer)
+        writer.close()
+        self.conn = get_db(self.db_path)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_hits_and_detail(self):
+        cache = ResultCache()
+        entry = cache.get(self.conn, 3)
+        self.assertEqual(entry.record.get("ID"), "P2")
+        self.assertEqual(entry.payload["CRP"], "0.8 mg/dL")
+        cache.set_detail(3, "rendered")
+        self.assertIs(cache.get(self.conn, 3), entry)
+        self.assertEqual(cache.get(self.conn, 3).detail, "rendered")
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertIsNone(cache.get(self.conn, 999))
+
+    def test_bounded_by_memory(self):
+        cache = ResultCache(max_bytes=4000)
+        for i in range(1, 21):
+            cache.get(self.conn, i)
+        self.assertLessEqual(cache.bytes, 4000)
+        self.assertIn(20, cache.entries)
+        self.assertNotIn(1, cache.entries)
+
+    def test_other_connection_write_invalidates(self):
+        cache = ResultCache()
+        cache.get(self.conn, 1)
+        writer = get_db(self.db_path)
+        writer.execute("UPDATE crp_results SET crp = '9.9 mg/dL' WHERE id = 1")
+        writer.commit()
+        writer.close()
+        self.assertEqual(cache.get(self.conn, 1).record.get("CRP"), "9.9 mg/dL")
+
+    def test_new_results_keep_unrelated_entries(self):
+        cache = ResultCache()
+        entry = cache.get(self.conn, 2)
+        cache.get(self.conn, 3)
+        writer = get_db(self.db_path)
+        save_result({"ID": "P99", "CRP": "0.8 mg/dL"}, writer)
+        writer.execute("UPDATE crp_results SET crp = '9.9 mg/dL' WHERE id = 3")
+        writer.commit()
+        writer.close()
+        self.assertIs(cache.get(self.conn, 2), entry)
+        self.assertEqual(cache.get(self.conn, 3).record.get("CRP"), "9.9 mg/dL")
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+if __name__ == "__main__":
+    unittest.main()
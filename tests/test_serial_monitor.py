@@ -0,0 +1,31 @@
+import unittest
+from crp_desktop.serial_monitor import LogBuffer, RawTap, format_hexdump
+
+class SerialMonitorTests(unittest.TestCase):
+    def test_log_buffer_is_bounded(self):
+        buf = LogBuffer(maxlen=100)
+        for i in range(250):
+            buf.push(f"msg {i}")
+        lines, dropped = buf.drain(20)
+        self.assertEqual(lines[-1], "msg 249")
+        self.assertEqual(len(lines), 20)
+        self.assertEqual(dropped, 230)
+        self.assertEqual(len(buf), 0)
+
+    def test_raw_tap_keeps_newest_bytes(self):
+        tap = RawTap(max_bytes=10)
+        tap.feed(b"12345")
+        tap.feed(b"67890")
+        tap.feed(b"abc")
+        data, dropped = tap.drain()
+        self.assertEqual(data, b"67890abc")
+        self.assertEqual(dropped, 5)
+
+    def test_hexdump(self):
+        lines = format_hexdump(b"\x02! 6.3\n\x03", offset=16)
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith("00000010  02 21 20 36 2E 33 0A 03"))
+        self.assertTrue(lines[0].endswith(".! 6.3.."))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import time
+import socket
+import sqlite3
+import tempfile
+import threading
+import unittest
+import importlib.util
+from crp_desktop.events import EventBus
+from crp_desktop.service import IngestionService, parse_listen_spec
+from crp_desktop.synth_db import synth_results, analyzer_frame
+from crp_desktop.resources import BAUD_RATES
+
+class FakeAnalyzer:
+    """TCP stand-in for an analyzer: sends `n` result frames to the first client, then stays connected."""
+    def __init__(self, n: int, seed: int):
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(1)
+        self.url = f"socket://127.0.0.1:{self.sock.getsockname()[1]}"
+        self.data = b"".join(analyzer_frame(r) for r in synth_results(n, seed=seed, days=1))
+        self.conn = None
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        try:
+            self.conn, _ = self.sock.accept()
+            # pyserial's socket:// open discards whatever already arrived
+            time.sleep(0.3)
+            self.conn.sendall(self.data)
+        except OSError:
+            pass
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+        self.sock.close()
+
+class ServiceTests(unittest.TestCase):
+    def test_event_bus_matches_signal_api(self):
+        bus = EventBus()
+        got = []
+        bus.new_result.connect(got.append)
+        bus.status.connect(got.append)
+        bus.new_result.emit({"ID": "A"})
+        bus.status.emit("hello")
+        bus.status.disconnect(got.append)
+        bus.status.emit("ignored")
+        self.assertEqual(got, [{"ID": "A"}, "hello"])
+
+    def test_parse_listen_spec(self):
+        self.assertEqual(parse_listen_spec("COM3@19200"), ("COM3", 19200))
+        self.assertEqual(parse_listen_spec("/dev/ttyUSB0"), ("/dev/ttyUSB0", BAUD_RATES[0]))
+
+@unittest.skipUnless(importlib.util.find_spec("serial"), "needs pyserial for socket:// listeners")
+class IngestionServiceTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_listeners_store_results_and_stop_cleanly(self):
+        analyzers = [FakeAnalyzer(20, seed=1), FakeAnalyzer(30, seed=2)]
+        service = IngestionService([(a.url, 9600) for a in analyzers], self.db_path)
+        runner = threading.Thread(target=service.run)
+        runner.start()
+        try:
+            deadline = time.monotonic() + 10
+            while service.results < 50 and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            service.stop()
+            runner.join(10)
+            for a in analyzers:
+                a.close()
+        self.assertFalse(runner.is_alive())
+        self.assertEqual(len(service.threads), 2)
+        self.assertFalse(any(t.is_alive() for t in service.threads.values()))
+        self.assertEqual(service.results, 50)
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM crp_results").fetchone()[0], 50)
+        conn.close()
+
+if __name__ == "__main__":
+    unittest.main()
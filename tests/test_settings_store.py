@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from crp_desktop.db import init_db, get_db, get_settings
+from crp_desktop.events import EventBus
+from crp_desktop.settings_store import SettingsStore
+
+class SettingsStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "crp_results.db")
+        init_db(self.db_path)
+        self.conn = get_db(self.db_path)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_typed_accessors_and_broadcast(self):
+        bus = EventBus()
+        seen = []
+        bus.settings_changed.connect(seen.append)
+        store = SettingsStore(self.conn, bus)
+        self.assertEqual(store.get_str("clinic_name"), "Your Clinic Name")
+        self.assertEqual(store.get_int("backup_interval_min", 60), 60)
+        self.assertFalse(store.get_bool("backup_compress"))
+
+        changed = store.update({"clinic_name": "Your Clinic Name", "backup_interval_min": 15,
+                                "backup_compress": True})
+        self.assertEqual(changed, {"backup_interval_min": "15", "backup_compress": "1"})
+        self.assertEqual(seen, [changed])
+        self.assertEqual(store.get_int("backup_interval_min"), 15)
+        self.assertTrue(store.get_bool("backup_compress"))
+        self.assertEqual(get_settings(self.conn)["backup_interval_min"], "15")
+
+        self.assertEqual(store.update({"backup_compress": True}), {})
+        self.assertEqual(len(seen), 1)  # nothing changed, nothing broadcast
+
+    def test_reads_are_served_from_memory(self):
+        store = SettingsStore(self.conn)
+        self.conn.execute("INSERT INTO settings (key, value) VALUES ('lis_host', 'elsewhere')")
+        self.conn.commit()
+        self.assertEqual(store.get_str("lis_host"), "")
+        store.reload()
+        self.assertEqual(store.get_str("lis_host"), "elsewhere")
+
+if __name__ == "__main__":
+    unittest.main()
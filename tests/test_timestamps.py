@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from crp_desktop.db import init_db, get_db, save_result
+from crp_desktop.timestamps import TimestampNormalizer, to_epoch
+
+class TimestampTests(unittest.TestCase):
+    def test_formats(self):
+        ts = TimestampNormalizer()
+        self.assertEqual(ts.normalize("01/02/24", "10:05:00"), "2024-02-01 10:05:00")
+        self.assertEqual(ts.normalize("01/02/2024", "10h05mn07s"), "2024-02-01 10:05:07")
+        self.assertEqual(ts.normalize("2024/02/01", "9:05"), "2024-02-01 09:05:00")
+        self.assertEqual(ts.normalize("31/12/99", "23:59:59"), "1999-12-31 23:59:59")
+        for bad in (("31/02/24", "10:00:00"), ("01/02/24", "25:00:00"), ("tomorrow", "10:00"), ("01/02/24", "")):
+            self.assertIsNone(ts.normalize(*bad))
+        self.assertAlmostEqual(to_epoch("2024-02-01 10:05:00") - to_epoch("2024-02-01 10:00:00"), 300)
+        self.assertIsNone(to_epoch("01/02/24 10:05"))
+
+    def test_format_is_remembered_per_instrument(self):
+        ts = TimestampNormalizer()
+        ts.normalize("2024/02/01", "10:05", "A")
+        ts.normalize("01/02/24", "10h05mn00s", "B")
+        self.assertEqual(ts.detected("A"), ("yyyy/mm/dd", "HH:MM"))
+        self.assertEqual(ts.detected("B"), ("dd/mm/yy", "HHhMMmnSSs"))
+        self.assertIsNone(ts.detected("C"))
+        # a changed format is still parsed and replaces the cached one
+        self.assertEqual(ts.normalize("01/02/2024", "10:05:00", "A"), "2024-02-01 10:05:00")
+        self.assertEqual(ts.detected("A"), ("dd/mm/yyyy", "HH:MM:SS"))
+
+    def test_old_rows_are_normalized_on_open(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "crp_results.db")
+            init_db(path)
+            conn = get_db(path)
+            save_result({"ID": "P1", "DATE": "2024/02/01", "TIME": "10:05", "CRP": "3.1 mg/dL"}, conn)
+            save_result({"ID": "P2", "DATE": "??", "TIME": "10:05"}, conn)
+            rows = conn.execute("SELECT measure_datetime FROM crp_results ORDER BY id").fetchall()
+            self.assertEqual([r[0] for r in rows], ["2024-02-01 10:05:00", None])
+            # what an older version stored when strptime failed
+            conn.execute("UPDATE crp_results SET measure_datetime = '2024/02/01 10:05' WHERE id = 1")
+            conn.execute("UPDATE result_flags SET ts = '2024/02/01 10:05'")
+            conn.execute("PRAGMA user_version = 0")
+            conn.commit()
+            conn.close()
+            init_db(path)
+            conn = sqlite3.connect(path)
+            self.assertEqual(conn.execute("SELECT measure_datetime FROM crp_results WHERE id = 1").fetchone()[0],
+                             "2024-02-01 10:05:00")
+            self.assertEqual(conn.execute("SELECT DISTINCT ts FROM result_flags").fetchall(), [("2024-02-01 10:05:00",)])
+            conn.close()
+
+if __name__ == "__main__":
+    unittest.main()
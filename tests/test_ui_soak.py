@@ -0,0 +1,55 @@
+import os
+import unittest
+import importlib.util
+from crp_desktop.parser import iter_results
+from crp_desktop.synth_db import synth_results, analyzer_frame
+from crp_desktop.ui_soak import lag_stats, memory_growth_mb, evaluate
+
+MB = 1024 * 1024
+HAVE_QT_AND_SERIAL = all(importlib.util.find_spec(m) for m in ("PySide6", "serial"))
+
+class UiSoakTests(unittest.TestCase):
+    def report(self, **kw):
+        report = {
+            "event_loop": lag_stats([1.0] * 99 + [50.0]),
+            "on_new_result": {"p95_ms": 5.0},
+            "memory_growth_mb": 2.0,
+            "results_sent": 100,
+            "results_stored": 99,
+            "in_flight_allowance": 4,
+        }
+        report.update(kw)
+        return report
+
+    def test_simulated_frames_parse_like_analyzer_output(self):
+        results = list(synth_results(5, seed=3))
+        parsed = list(iter_results(analyzer_frame(r) for r in results))
+        self.assertEqual(len(parsed), 5)
+        for r, p in zip(results, parsed):
+            self.assertEqual(p.patient_id, r.patient_id)
+            self.assertEqual(p.crp, r.crp)
+
+    def test_stats(self):
+        self.assertEqual(lag_stats([3.0, 1.0, 2.0]), {"ticks": 3, "p50_ms": 2.0, "p99_ms": 3.0, "max_ms": 3.0})
+        samples = [(t, 100 * MB + t * MB) for t in range(0, 30)]
+        self.assertEqual(memory_growth_mb(samples, warmup_s=10), 18.0)
+        self.assertIsNone(memory_growth_mb([(20, None), (21, None)], warmup_s=10))
+
+    def test_evaluate(self):
+        self.assertEqual(evaluate(self.report()), [])
+        failures = evaluate(self.report(on_new_result={"p95_ms": 250.0}, memory_growth_mb=80.0, results_stored=50))
+        self.assertEqual(len(failures), 3)
+        self.assertIn("on_new_result", failures[0])
+        self.assertEqual(len(evaluate(self.report(event_loop=lag_stats([500.0])))), 1)
+
+    @unittest.skipUnless(HAVE_QT_AND_SERIAL, "needs PySide6 and pyserial")
+    def test_short_soak_stores_results(self):
+        from crp_desktop.ui_soak import run_soak
+        cwd = os.getcwd()
+        report = run_soak(seconds=3, rate=5, warmup_s=0)
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertGreater(report["results_stored"], 0)
+        self.assertIsNone(report["workdir"])
+
+if __name__ == "__main__":
+    unittest.main()